@@ -1,19 +1,16 @@
 """
 桌面应用主入口 - 集成 PyWebView 和 FastAPI
 """
-import webview
-import uvicorn
 import threading
+import multiprocessing
 import os
 import sys
+import time
+import json
 from pathlib import Path
 
-# 设置日志系统（必须在最开始，在任何导入之前）
-try:
-    from backend.logger import setup_logging
-    setup_logging()
-except Exception as e:
-    print(f"Failed to setup logging: {e}")
+# 启动计时基准（用于 benchmarks/startup.py 的分段统计）
+PROCESS_STARTED = time.perf_counter()
 
 # 确定资源路径（支持打包后的 exe）
 if getattr(sys, 'frozen', False):
@@ -26,20 +23,31 @@ else:
     RESOURCE_DIR = Path(__file__).parent
     WORK_DIR = Path(__file__).parent
 
-# 设置工作目录为 exe 所在目录（让 uploads 在 exe 旁边）
-os.chdir(WORK_DIR)
-
 # 添加资源目录到 Python 路径
 sys.path.insert(0, str(RESOURCE_DIR))
 
-from backend.main import app
-
 # 全局变量
 server_thread = None
 should_stop = False
+server_ready = threading.Event()
+backend_server = None
+startup_timings = {}
 
 def start_backend():
-    """在后台线程启动 FastAPI"""
+    """在后台线程导入并启动 FastAPI，启动完成后设置 server_ready"""
+    global backend_server
+    started = time.perf_counter()
+    import uvicorn
+    from backend.main import app
+    startup_timings['backend_import'] = time.perf_counter() - started
+    boot_started = time.perf_counter()
+
+    class ReadyServer(uvicorn.Server):
+        async def startup(self, sockets=None):
+            await super().startup(sockets=sockets)
+            startup_timings['server_boot'] = time.perf_counter() - boot_started
+            server_ready.set()
+
     config = uvicorn.Config(
         app, 
         host="127.0.0.1", 
@@ -47,65 +55,71 @@ def start_backend():
         log_level="error",  # 减少日志输出
         access_log=False
     )
-    server = uvicorn.Server(config)
-    server.run()
+    backend_server = ReadyServer(config)
+    try:
+        backend_server.run()
+    finally:
+        # 启动失败时也要唤醒主线程
+        server_ready.set()
 
 def on_closing():
     """窗口关闭时的回调"""
     global should_stop
     should_stop = True
+    try:
+        from backend.logger import shutdown
+        shutdown()  # 写出队列中剩余的日志
+    except Exception:
+        pass
     os._exit(0)  # 强制退出所有线程
 
+def setup():
+    """
+    日志系统和工作目录，只在主进程中设置
+
+    进程池（质检、预热、命令行导出）的子进程以 spawn 方式启动时会重新导入本模块，
+    放在模块顶层会让每个子进程各自打开 app.log、写启动信息并轮转日志。
+    """
+    # 设置日志系统（在导入后端之前，后端模块的 print 输出也进入日志）
+    try:
+        from backend.logger import setup_logging
+        setup_logging()
+    except Exception as e:
+        print(f"Failed to setup logging: {e}")
+
+    # 设置工作目录为 exe 所在目录（让 uploads 在 exe 旁边）
+    os.chdir(WORK_DIR)
+
 def main():
     """主函数"""
     global server_thread
+    setup()
     
-    # 启动后端服务器（后台线程）
+    # 启动后端服务器（后台线程），同时在主线程导入 GUI 库
     server_thread = threading.Thread(target=start_backend, daemon=True)
     server_thread.start()
     
-    # 等待服务器启动 - 通过实际检测而不是固定等待
-    import time
-    import requests
-    max_wait = 20  # 最多等待20秒
-    wait_interval = 0.2
-    total_waited = 0
+    started = time.perf_counter()
+    import webview
+    startup_timings['webview_import'] = time.perf_counter() - started
     
+    # 等待服务器启动 - 使用 uvicorn 启动完成事件，而不是轮询 HTTP
     print("等待后端服务器启动...")
-    while total_waited < max_wait:
-        try:
-            response = requests.get("http://127.0.0.1:8000", timeout=1)
-            print("后端服务器已就绪")
-            break
-        except:
-            time.sleep(wait_interval)
-            total_waited += wait_interval
+    if server_ready.wait(timeout=20) and backend_server is not None and backend_server.started:
+        print("后端服务器已就绪")
     else:
         print("警告: 后端服务器启动超时，但继续启动GUI...")
     
-    # 获取屏幕尺寸并计算居中位置
-    import tkinter as tk
-    root = tk.Tk()
-    screen_width = root.winfo_screenwidth()
-    screen_height = root.winfo_screenheight()
-    root.destroy()
-    
-    # 窗口尺寸
+    # 窗口尺寸（不指定 x/y 时 pywebview 自动居中）
     window_width = 1275
     window_height = 780
     
-    # 计算居中位置
-    x = (screen_width - window_width) // 2
-    y = (screen_height - window_height) // 2
-    
     # 创建窗口
     window = webview.create_window(
         title='双语字幕编辑器',
         url='http://127.0.0.1:8000',
         width=window_width,
         height=window_height,
-        x=x,
-        y=y,
         resizable=True,
         min_size=(1000, 600)
     )
@@ -113,8 +127,19 @@ def main():
     # 设置窗口关闭回调
     window.events.closing += on_closing
     
+    def on_loaded():
+        startup_timings['window_open'] = time.perf_counter() - PROCESS_STARTED
+        print(f"Startup timings: {json.dumps(startup_timings)}")
+        if os.environ.get('DQS_STARTUP_BENCH'):
+            sys.stdout.flush()
+            window.destroy()
+    
+    window.events.loaded += on_loaded
+    
     # 启动 GUI（阻塞直到窗口关闭）
     webview.start()
 
 if __name__ == '__main__':
+    # 打包后的 exe 中，质检进程池的子进程从这里启动
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,374 @@
+"""
+命令行批处理 - 不启动窗口，直接调用 backend 完成导入、匹配、预热、换行、AI 修正、质检和导出
+
+用法:
+    python -m backend.cli --zh zh.zip --en es.zip --format srt --output out/
+    python -m backend.cli --project s02 --zh zh/ --en es/ --videos /media/show \\
+        --reflow --correct --concurrency 4 --lint --format srt --format ass_bilingual --output out/
+
+--zh/--en 可以是 zip 或目录（不给时沿用项目中已有的字幕）。各阶段按顺序执行：
+导入 -> 匹配 -> 预热（进程池解析、对齐、合并）-> 换行 -> AI 修正（最多 --concurrency 集同时请求）
+-> 质检 -> 导出（各集在进程池中并行写出，输出到 <output>/<格式>/）。
+换行和修正结果写回项目中的外语字幕，之后在编辑器中打开同一项目即可看到。
+
+日志全部写到 stderr，结束时把各阶段耗时和统计以 JSON 写到 stdout（或 --summary 指定的文件）。
+某一集失败不会中断整批处理，错误记在 JSON 的 errors 中，此时退出码为 1。
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+try:
+    from backend import main as server
+    from backend.config import get_api_config
+    from backend.corrector import correct_text_with_gpt, load_rules, split_long_line
+    from backend.lint import CHECKS
+    from backend.serializers import SERIALIZERS, dumps, get_serializer, write_file
+    from backend.srt_parser import parse_srt
+    from backend.warmup import WARMUP_WORKERS, MIN_POOL_EPISODES, parse_subtitle_file, prepare_episode
+except ImportError:
+    import main as server
+    from config import get_api_config
+    from corrector import correct_text_with_gpt, load_rules, split_long_line
+    from lint import CHECKS
+    from serializers import SERIALIZERS, dumps, get_serializer, write_file
+    from srt_parser import parse_srt
+    from warmup import WARMUP_WORKERS, MIN_POOL_EPISODES, parse_subtitle_file, prepare_episode
+
+DEFAULT_CONCURRENCY = 4   # 同时进行的 AI 修正请求数
+REFLOW_THRESHOLD = 40     # 与 AI 修正后的本地换行相同
+
+
+def log_progress(job: str):
+    """progress(stage, **info) callback printing to stderr"""
+    def progress(stage, **info):
+        if 'done' in info and 'total' in info:
+            print(f"[{job}] {stage} {info['done']}/{info['total']}", file=sys.stderr)
+        else:
+            print(f"[{job}] {stage} {info or ''}", file=sys.stderr)
+    return progress
+
+
+class Summary:
+    """Timing and counts of each stage, written as JSON at the end"""
+
+    def __init__(self, project_id: str):
+        self.started = time.perf_counter()
+        self.data = {'project': project_id, 'episodes': 0, 'stages': {}, 'errors': []}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        info = {}
+        started = time.perf_counter()
+        print(f"\n=== [cli] {name} ===")
+        try:
+            yield info
+        finally:
+            info['seconds'] = round(time.perf_counter() - started, 3)
+            self.data['stages'][name] = info
+
+    def error(self, stage: str, error, episode: Optional[int] = None):
+        print(f"✗ {stage} failed{'' if episode is None else f' for episode {episode}'}: {error}")
+        self.data['errors'].append({'stage': stage, 'episode': episode, 'error': str(error)})
+
+    def finish(self) -> Dict:
+        self.data['total_seconds'] = round(time.perf_counter() - self.started, 3)
+        return self.data
+
+
+# ---------- 导入 ----------
+
+def import_subtitles(proj, kind: str, source: str):
+    """
+    Replace the project's zh/en subtitles with a zip file or a directory
+
+    Raises:
+        ValueError: if source is not a valid zip file or directory
+    """
+    if os.path.isdir(source):
+        target_dir = proj.subtitle_dir(kind)
+        with proj.lock:
+            if os.path.exists(target_dir):
+                shutil.rmtree(target_dir)
+            shutil.copytree(source, target_dir)
+            proj.forget_files(kind)
+        return
+    with open(source, 'rb') as f:
+        if not server.extract_zip(f, proj, kind):
+            raise ValueError(f"invalid zip file: {source}")
+
+
+# ---------- 换行和 AI 修正（写回项目中的外语字幕） ----------
+
+def foreign_file(proj, index: int):
+    match = proj.matches[index]
+    return server.language_file_path(proj, match, 'en') if match.get('en_sub') else None
+
+
+def reflow_episode(proj, index: int, threshold: int) -> int:
+    """Split long foreign lines of one episode; returns the number of cues changed"""
+    path = foreign_file(proj, index)
+    if not path:
+        return 0
+    blocks = server.load_subtitle_blocks(proj, 'en', path)
+    reflowed = []
+    for block in blocks:
+        lines = block['text'].replace('\\N', '\n').splitlines()
+        reflowed.append(dict(block, text='\n'.join(split_long_line(line, threshold) for line in lines)))
+    changed = sum(1 for old, new in zip(blocks, reflowed) if old['text'] != new['text'])
+    if changed:
+        server.save_language_blocks(proj, index, 'en', path, reflowed)
+    return changed
+
+
+def read_rules(path: str) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def episode_sources(proj, index: int, blocks: List[Dict]) -> Optional[List[str]]:
+    """Chinese text of each foreign block (merged view with primary=en), or None if they do not line up"""
+    merged = server.load_merged_episode(proj, index, 'en')['blocks']
+    if len(merged) != len(blocks):
+        return None
+    return [b.get('zh_text', '') for b in merged]
+
+
+def correct_episode(proj, index: int, rules: str) -> int:
+    """
+    AI-correct the foreign file of one episode; returns the number of cues changed
+
+    Raises:
+        RuntimeError: if the correction failed or changed the number of cues
+    """
+    path = foreign_file(proj, index)
+    if not path:
+        return 0
+    blocks = server.load_subtitle_blocks(proj, 'en', path)
+    if not blocks:
+        return 0
+    content = dumps('srt', [dict(b, index=i + 1) for i, b in enumerate(blocks)])
+    sources = episode_sources(proj, index, blocks)
+    keep = server.approved_parts(proj, content, sources) if sources else None
+    # 流式读取：某一块出错时立即重试，不必等整集生成完
+    corrected = correct_text_with_gpt(content, rules, None, keep, stream=True)
+    if not corrected:
+        raise RuntimeError("correction failed")
+    new_blocks = parse_srt(corrected)
+    if len(new_blocks) != len(blocks):
+        raise RuntimeError(f"expected {len(blocks)} cues, got {len(new_blocks)}")
+    # 时间轴以原文件为准，只取修正后的文本
+    updated = [dict(old, text=new['text']) for old, new in zip(blocks, new_blocks)]
+    changed = sum(1 for old, new in zip(blocks, updated) if old['text'] != new['text'])
+    if changed:
+        server.save_language_blocks(proj, index, 'en', path, updated)
+    return changed
+
+
+# ---------- 导出（子进程中执行） ----------
+
+def export_episode(zh_path: Optional[str], en_path: Optional[str], name: str, lang: str, primary: str,
+                   out_path: str) -> int:
+    """
+    Write one episode in a registered format straight from its subtitle files
+
+    Same output as main.export_source, but without the project database so it
+    can run in a worker process. Returns the number of cues written.
+    """
+    serializer = get_serializer(name)
+    if serializer.bilingual:
+        result = prepare_episode(zh_path, en_path, (primary,))
+        blocks = result['merged'][primary]
+        header = result['zh'][1] if result['zh'] else None
+    else:
+        blocks, header = parse_subtitle_file(zh_path if lang == 'zh' else en_path)
+        blocks = [dict(b, index=i + 1) for i, b in enumerate(blocks)]
+    write_file(out_path, blocks, header, name)
+    return len(blocks)
+
+
+def export_jobs(proj, formats: List[str], lang: str, primary: str, output: str) -> Dict:
+    """(format, episode) -> export_episode arguments for every episode with the needed files"""
+    jobs = {}
+    for name in formats:
+        serializer = get_serializer(name)
+        out_dir = os.path.join(output, name)
+        os.makedirs(out_dir, exist_ok=True)
+        names = set()
+        for index, match in enumerate(proj.matches):
+            zh_path, en_path, _ = server.episode_stamp(proj, match)
+            source = (zh_path or en_path) if serializer.bilingual else (zh_path if lang == 'zh' else en_path)
+            if not source:
+                continue
+            base = match.get('zh_sub') if serializer.bilingual and zh_path else os.path.basename(source)
+            filename = os.path.splitext(base)[0] + serializer.extension
+            if filename in names:
+                filename = f"{index + 1:02d}_{filename}"
+            names.add(filename)
+            jobs[(name, index)] = (zh_path, en_path, name, lang, primary, os.path.join(out_dir, filename))
+    return jobs
+
+
+def run_exports(jobs: Dict, workers: int):
+    """
+    Run export_episode for every job, in a process pool when there are enough of them
+
+    Yields:
+        (key, cue count or None, error or None) in completion order
+    """
+    pending = dict(jobs)
+    if len(jobs) >= MIN_POOL_EPISODES and workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                futures = {pool.submit(export_episode, *args): key for key, args in jobs.items()}
+                for future in as_completed(futures):
+                    key = futures[future]
+                    del pending[key]
+                    try:
+                        yield key, future.result(), None
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        yield key, None, e
+        except BrokenProcessPool as e:
+            print(f"Export pool broken ({e}), finishing in-process")
+    for key, args in list(pending.items()):
+        try:
+            yield key, export_episode(*args), None
+        except Exception as e:
+            yield key, None, e
+
+
+# ---------- 流水线 ----------
+
+def run(args) -> Dict:
+    proj = server.projects.get(args.project)
+    summary = Summary(proj.id)
+
+    with summary.stage('import') as info:
+        for kind, source in (('zh', args.zh), ('en', args.en)):
+            if source:
+                import_subtitles(proj, kind, source)
+                info[kind] = source
+
+    with summary.stage('match') as info:
+        matches, cache_status = server.match_season(proj, args.videos, log_progress('match'))
+        info.update(episodes=len(matches), cache=cache_status)
+    summary.data['episodes'] = len(proj.matches)
+    indices = range(len(proj.matches))
+
+    with summary.stage('warmup'):
+        server.warm_season(proj, log_progress('warmup'))
+
+    if args.reflow:
+        with summary.stage('reflow') as info:
+            cues = 0
+            for index in indices:
+                try:
+                    cues += reflow_episode(proj, index, args.reflow)
+                except Exception as e:
+                    summary.error('reflow', e, index)
+            info.update(threshold=args.reflow, cues=cues)
+
+    if args.correct:
+        rules = read_rules(args.rules) if args.rules else load_rules()
+        with summary.stage('correct') as info:
+            cues, corrected = 0, 0
+            try:
+                get_api_config()
+            except Exception as e:
+                # 没有配置时每一集都会失败，只记一次
+                summary.error('correct', e)
+                indices = []
+            with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix='correct') as pool:
+                futures = {pool.submit(correct_episode, proj, index, rules): index for index in indices}
+                for future in as_completed(futures):
+                    try:
+                        cues += future.result()
+                        corrected += 1
+                    except Exception as e:
+                        summary.error('correct', e, futures[future])
+            info.update(concurrency=args.concurrency, episodes=corrected, cues=cues)
+
+    if args.lint:
+        with summary.stage('lint') as info:
+            checks = tuple(c for c in CHECKS if c in args.lint.split(',')) if args.lint != 'all' else CHECKS
+            report = server.lint_season(proj, checks, log_progress('lint'))
+            info.update(issues=len(report['issues']), summary=report['summary'])
+            if args.output:
+                os.makedirs(args.output, exist_ok=True)
+                with open(os.path.join(args.output, 'lint.json'), 'w', encoding='utf-8') as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.format:
+        with summary.stage('export') as info:
+            jobs = export_jobs(proj, args.format, args.lang, args.primary, args.output)
+            files, cues = 0, 0
+            for (name, index), count, error in run_exports(jobs, args.workers):
+                if error is not None:
+                    summary.error('export', f"{name}: {error}", index)
+                    continue
+                files += 1
+                cues += count
+            info.update(formats=args.format, files=files, cues=cues, workers=args.workers, output=args.output)
+
+    return summary.finish()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m backend.cli', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--project', default='batch', help='project id (default batch)')
+    parser.add_argument('--zh', help='Chinese subtitles: zip file or directory')
+    parser.add_argument('--en', help='foreign subtitles: zip file or directory')
+    parser.add_argument('--videos', default='', help='video directory to match against')
+    parser.add_argument('--reflow', type=int, nargs='?', const=REFLOW_THRESHOLD, default=0, metavar='CHARS',
+                        help=f'split foreign lines longer than CHARS (default {REFLOW_THRESHOLD})')
+    parser.add_argument('--correct', action='store_true', help='AI-correct the foreign subtitles')
+    parser.add_argument('--rules', help='correction rules file (default rules.txt)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'episodes corrected at the same time (default {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--lint', nargs='?', const='all', metavar='CHECKS',
+                        help=f'run the QA report (comma-separated subset of {",".join(CHECKS)})')
+    parser.add_argument('--format', action='append', choices=list(SERIALIZERS), help='export format (repeatable)')
+    parser.add_argument('--lang', default='en', choices=['zh', 'en'], help='language of single-language exports')
+    parser.add_argument('--primary', default='zh', choices=['zh', 'en', 'union'], help='merge order of bilingual exports')
+    parser.add_argument('--output', help='output directory for exports and lint.json')
+    parser.add_argument('--workers', type=int, default=WARMUP_WORKERS, help='export worker processes')
+    parser.add_argument('--summary', help='write the JSON summary to this file instead of stdout')
+    args = parser.parse_args(argv)
+    if args.format and not args.output:
+        parser.error('--format needs --output')
+    if args.concurrency < 1 or args.workers < 1:
+        parser.error('--concurrency and --workers must be at least 1')
+
+    # stdout 只留给 JSON 结果，backend 的日志改写到 stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            result = run(args)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            result = {'project': args.project, 'errors': [{'stage': 'fatal', 'episode': None, 'error': str(e)}]}
+            code = 2
+        else:
+            code = 1 if result['errors'] else 0
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
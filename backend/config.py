@@ -0,0 +1,61 @@
+"""
+配置加载 - 首次使用AI功能时才读取 config.ini
+
+没有 config.ini 时编辑器照常启动，只有调用AI功能时才报错。
+"""
+import configparser
+import os
+import sys
+import threading
+
+_lock = threading.Lock()
+_api_config = None
+
+
+def get_base_dir():
+    """exe 所在目录（打包后）或项目根目录（开发环境）"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_config_path():
+    return os.path.join(get_base_dir(), 'config.ini')
+
+
+def get_api_config():
+    """
+    Load the [API] section on first use
+
+    Returns:
+        (endpoint, api_key)
+
+    Raises:
+        FileNotFoundError: config.ini does not exist
+    """
+    global _api_config
+    if _api_config is not None:
+        return _api_config
+
+    with _lock:
+        if _api_config is None:
+            config_path = get_config_path()
+            print(f"[config.py] Loading config from: {config_path}")
+            if not os.path.exists(config_path):
+                raise FileNotFoundError(f"请创建配置文件: {config_path}\n可以复制 config.ini.example 并填入你的API密钥")
+
+            config = configparser.ConfigParser()
+            config.read(config_path, encoding='utf-8')
+            endpoint = config.get('API', 'chatgpt_endpoint')
+            api_key = config.get('API', 'api_key')
+            print(f"[config.py] Loaded endpoint: {endpoint}")
+            print("[config.py] API key loaded" if api_key else "[config.py] API key is empty!")
+            _api_config = (endpoint, api_key)
+    return _api_config
+
+
+def set_api_config(endpoint, api_key=''):
+    """Use endpoint instead of config.ini (benchmarks against a local stand-in)"""
+    global _api_config
+    with _lock:
+        _api_config = (endpoint, api_key)
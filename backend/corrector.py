@@ -1,31 +1,15 @@
-import requests
 import json
 import re
 import os
-import configparser
 import sys
+import time
 
-# --- Load Configuration from INI file ---
-config = configparser.ConfigParser()
-# Determine config file path
-if getattr(sys, 'frozen', False):
-    config_path = os.path.join(os.path.dirname(sys.executable), 'config.ini')
-else:
-    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.ini')
-
-print(f"[corrector.py] Loading config from: {config_path}")
-print(f"[corrector.py] sys.frozen = {getattr(sys, 'frozen', False)}")
-print(f"[corrector.py] Config file exists: {os.path.exists(config_path)}")
-
-if not os.path.exists(config_path):
-    raise FileNotFoundError(f"请创建配置文件: {config_path}\n可以复制 config.ini.example 并填入你的API密钥")
-
-config.read(config_path, encoding='utf-8')
-CHATGPT_ENDPOINT = config.get('API', 'chatgpt_endpoint')
-API_KEY = config.get('API', 'api_key')
-
-print(f"[corrector.py] Loaded endpoint: {CHATGPT_ENDPOINT}")
-print(f"[corrector.py] API key loaded: {API_KEY[:10]}..." if API_KEY else "[corrector.py] API key is empty!")
+try:
+    from backend.config import get_api_config
+    from backend.metrics import metrics, span, inc
+except ImportError:
+    from config import get_api_config
+    from metrics import metrics, span, inc
 
 # --- Spanish articles and object pronouns for line splitting ---
 ARTICLES = {
@@ -67,6 +51,28 @@ def is_valid_srt(content):
 
     return last_pos == len(content)
 
+def srt_parts(content):
+    """Raw SRT blocks of content (split on blank lines)"""
+    return [p for p in re.split(r'\r?\n\s*\r?\n', content.strip()) if p.strip()]
+
+def part_number(part):
+    """Subtitle number on the first line of an SRT block, or None"""
+    first = part.strip().split('\n', 1)[0].strip()
+    return int(first) if first.isdigit() else None
+
+def restore_kept(original_parts, corrected, keep):
+    """Rebuild the full SRT: kept blocks get their approved text, the rest come from corrected by number"""
+    by_number = {part_number(p): p for p in srt_parts(corrected)}
+    parts = []
+    for part in original_parts:
+        number = part_number(part)
+        if number in keep:
+            lines = part.strip().split('\n')
+            parts.append('\n'.join(lines[:2] + [keep[number]]))
+        else:
+            parts.append(by_number.get(number, part).strip())
+    return '\n\n'.join(parts) + '\n\n'
+
 def split_long_line(text, threshold=40):
     """Split long subtitle lines intelligently, avoiding breaks at articles/pronouns"""
     text = text.strip()
@@ -108,6 +114,115 @@ def apply_line_split_to_srt(srt_content, threshold=40):
         new_blocks.append(f"{header.strip()}\n{new_text}")
     return '\n\n'.join(new_blocks) + '\n\n'
 
+class CueMismatch(ValueError):
+    """A streamed block does not match the subtitle expected at its position"""
+
+    def __init__(self, number, got, received):
+        super().__init__(f"expected subtitle {number}, got {got!r}")
+        self.number = number      # 应出现的字幕序号（None 表示多出来的块）
+        self.received = received  # 出错前收到的全部文本
+
+class StreamError(Exception):
+    """Malformed or failed SSE stream"""
+
+class CueStream:
+    """
+    Incremental parser of an SRT completion that arrives in pieces
+
+    A block is complete once the blank line after it arrives. It is checked
+    against the subtitle number expected at its position right away, so a
+    merged, dropped or renumbered block fails the attempt early instead of
+    after the whole completion. Valid blocks are reported as
+    progress('cue', cue=number, text=text, done=, total=) with the same line
+    splitting apply_line_split_to_srt applies to the final text.
+    """
+
+    def __init__(self, numbers, progress=None, threshold=40):
+        self.numbers = numbers    # 按顺序应出现的字幕序号
+        self.progress = progress or (lambda stage, **info: None)
+        self.threshold = threshold
+        self.received = ''
+        self.count = 0
+        self._buffer = ''
+        self._started = time.perf_counter()
+
+    def feed(self, delta):
+        """
+        Raises:
+            CueMismatch: a completed block is not the expected one
+        """
+        self.received += delta
+        self._buffer += delta.replace('\r', '')
+        while True:
+            end = re.search(r'\n[ \t]*\n', self._buffer)
+            if not end:
+                break
+            part, self._buffer = self._buffer[:end.start()], self._buffer[end.end():]
+            self._emit(part)
+
+    def finish(self):
+        """Parse the last block and return the whole completion"""
+        self._emit(self._buffer)
+        self._buffer = ''
+        return self.received
+
+    def _emit(self, part):
+        # markdown 代码块标记单独成行，直接丢弃
+        lines = [l for l in part.strip().split('\n') if l.strip() and not l.strip().startswith('```')]
+        if not lines:
+            return
+        if self.count >= len(self.numbers):
+            raise CueMismatch(None, lines[0].strip(), self.received)
+        number = self.numbers[self.count]
+        if lines[0].strip() != str(number) or len(lines) < 2 or '-->' not in lines[1]:
+            raise CueMismatch(number, lines[0].strip(), self.received)
+        if self.count == 0:
+            metrics.observe('llm_first_cue_seconds', time.perf_counter() - self._started, caller='correct')
+        self.count += 1
+        text = '\n'.join(split_long_line(line, self.threshold) for line in lines[2:])
+        self.progress('cue', cue=number, text=text, done=self.count, total=len(self.numbers))
+
+def stream_completion(endpoint, headers, data, cues):
+    """
+    POST a chat completion with stream=True and feed it to cues as it arrives
+
+    Endpoints that ignore "stream" and answer with plain JSON are handled too
+    (the whole content is fed at once).
+
+    Returns:
+        the complete text of the completion
+
+    Raises:
+        requests.exceptions.RequestException: HTTP or connection errors
+        StreamError: malformed stream or an error reported inside it
+        CueMismatch: see CueStream.feed
+    """
+    import requests
+    with requests.post(endpoint, headers=headers, data=json.dumps(dict(data, stream=True)),
+                       stream=True, timeout=180) as response:
+        print(f"Response status: {response.status_code} ({response.headers.get('Content-Type', '')})")
+        response.raise_for_status()
+        if 'text/event-stream' not in response.headers.get('Content-Type', ''):
+            cues.feed(response.json()['choices'][0]['message']['content'])
+            return cues.finish()
+        for line in response.iter_lines():
+            if not line.startswith(b'data:'):
+                continue
+            payload = line[5:].strip()
+            if payload == b'[DONE]':
+                break
+            try:
+                chunk = json.loads(payload)
+            except ValueError:
+                raise StreamError(f"invalid SSE data: {payload[:200]!r}")
+            if chunk.get('error'):
+                raise StreamError(f"provider error: {chunk['error']}")
+            choices = chunk.get('choices') or []
+            delta = (choices[0].get('delta') or {}).get('content') if choices else None
+            if delta:
+                cues.feed(delta)
+    return cues.finish()
+
 def load_rules():
     """Load correction rules from file"""
     print("\n=== Loading correction rules ===")
@@ -160,9 +275,27 @@ def load_rules():
 4. Do not translate, keep original language."""
     return default_rules
 
-def correct_text_with_gpt(text, rules=None):
-    """Corrects the entire SRT content using the Gemini API based on the provided rules."""
+def correct_text_with_gpt(text, rules=None, progress=None, keep=None, stream=False):
+    """Corrects the entire SRT content using the Gemini API based on the provided rules.
+
+    progress, if given, is called as progress(stage, **info) before each API attempt
+    and while the response is validated.
+    keep maps subtitle numbers to approved translations (translation memory);
+    those blocks are not sent to the model and come back with the approved text.
+    With stream, the completion is read as an SSE stream and every block is
+    checked and reported as progress('cue', ...) as soon as it arrives (see CueStream).
+    """
+    progress = progress or (lambda stage, **info: None)
     print("\n=== Starting subtitle correction ===")
+
+    if keep:
+        original_parts = srt_parts(text)
+        rest = [p for p in original_parts if part_number(p) not in keep]
+        print(f"Keeping {len(original_parts) - len(rest)} blocks with approved translations")
+        if not rest:
+            return restore_kept(original_parts, '', keep)
+        corrected = correct_text_with_gpt('\n\n'.join(rest) + '\n\n', rules, progress, stream=stream)
+        return restore_kept(original_parts, corrected, keep) if corrected else None
     
     if rules is None or rules == '':
         print("No rules provided, loading from file...")
@@ -176,10 +309,14 @@ def correct_text_with_gpt(text, rules=None):
     # Count original subtitle blocks
     original_block_count = count_srt_blocks(text)
     print(f"Original subtitle blocks: {original_block_count}")
+    numbers = [part_number(p) for p in srt_parts(text)]
     
+    # 首次调用时才加载配置和网络库
+    import requests
+    endpoint, api_key = get_api_config()
     headers = {
         "Content-Type": "application/json",
-        "Authorization": f"Bearer {API_KEY}"
+        "Authorization": f"Bearer {api_key}"
     }
     prompt = (
         "Please correct the subtitle text in the following SRT file content based on these rules. "
@@ -200,11 +337,19 @@ def correct_text_with_gpt(text, rules=None):
     for attempt in range(max_retries):
         try:
             print(f"Sending request to API (attempt {attempt + 1}/{max_retries})...")
-            response = requests.post(CHATGPT_ENDPOINT, headers=headers, data=json.dumps(data), timeout=180)
-            print(f"Response status: {response.status_code}")
-            response.raise_for_status()
-            result = response.json()
-            corrected = result['choices'][0]['message']['content'].strip()
+            progress('request', attempt=attempt + 1, max_attempts=max_retries, blocks=original_block_count)
+            if attempt > 0:
+                inc('llm_retries_total', caller='correct')
+            if stream:
+                with span('llm_call', caller='correct', stream='1'):
+                    corrected = stream_completion(endpoint, headers, data, CueStream(numbers, progress)).strip()
+            else:
+                with span('llm_call', caller='correct'):
+                    response = requests.post(endpoint, headers=headers, data=json.dumps(data), timeout=180)
+                print(f"Response status: {response.status_code}")
+                response.raise_for_status()
+                result = response.json()
+                corrected = result['choices'][0]['message']['content'].strip()
             print(f"Received corrected text: {len(corrected)} characters")
             print(f"First 100 chars of corrected: {corrected[:100]}...")
             
@@ -226,6 +371,7 @@ def correct_text_with_gpt(text, rules=None):
             
             # Validate and fix SRT format
             print("Validating SRT format...")
+            progress('validate', attempt=attempt + 1)
             if not is_valid_srt(corrected):
                 if is_valid_srt(corrected + "\n\n"):
                     corrected += "\n\n"
@@ -241,6 +387,7 @@ def correct_text_with_gpt(text, rules=None):
             
             if corrected_block_count != original_block_count:
                 print(f"✗ Block count mismatch! Expected {original_block_count}, got {corrected_block_count}")
+                progress('mismatch', attempt=attempt + 1, expected=original_block_count, got=corrected_block_count)
                 if attempt < max_retries - 1:
                     print(f"Retrying... ({attempt + 2}/{max_retries})")
                     # Update prompt to emphasize block count requirement
@@ -262,7 +409,22 @@ def correct_text_with_gpt(text, rules=None):
             print("=== Correction completed successfully ===\n")
             return corrected
             
-        except requests.exceptions.RequestException as e:
+        except CueMismatch as e:
+            # 流式结果中某一块不对时立即放弃本次回答并重试，不必等整段生成完
+            print(f"✗ Invalid block in stream: {e}")
+            progress('invalid', attempt=attempt + 1, cue=e.number)
+            if attempt < max_retries - 1:
+                print(f"Retrying... ({attempt + 2}/{max_retries})")
+                position = f"subtitle {e.number}" if e.number is not None else "an extra block"
+                data['messages'].append({"role": "assistant", "content": e.received})
+                data['messages'].append({
+                    "role": "user",
+                    "content": f"Error: the result went wrong at {position}. Return all {original_block_count} subtitle blocks with their original numbers and timestamps, in order, and only change the text."
+                })
+                continue
+            print(f"✗ Failed after {max_retries} attempts. Returning None.")
+            return None
+        except (requests.exceptions.RequestException, StreamError) as e:
             print(f"✗ API call failed: {e}")
             import traceback
             traceback.print_exc()
@@ -0,0 +1,76 @@
+"""
+字幕全文检索 - 把字幕文本切分为检索词，并把用户输入转换为 SQLite FTS5 查询
+
+中文没有空格分词，连续的汉字按相邻两字（bigram）切分，查询时同样切分后按短语匹配，
+因此 "林悠悠" 会匹配包含 "林悠 悠悠" 的字幕。其他文字按单词切分，大小写和重音由
+FTS5 的 unicode61 分词器统一处理（vosotros / Vosotros / vósotros 视为相同）。
+单个汉字无法用 bigram 索引查到，这类查询退回到正则扫描。
+"""
+import re
+from typing import List, Optional
+
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'  # 假名和汉字
+TOKEN_RE = re.compile(f'[{CJK_CHARS}]+|[^\\W_{CJK_CHARS}]+')
+CJK_RE = re.compile(f'[{CJK_CHARS}]')
+MARKUP_RE = re.compile(r'\{[^}]*\}|<[^>]*>|\\[Nnh]')
+QUERY_TERM_RE = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+def tokenize(text: str) -> List[str]:
+    """Search tokens of a cue: words, and overlapping bigrams of CJK runs"""
+    tokens = []
+    for word in TOKEN_RE.findall(MARKUP_RE.sub(' ', text or '').lower()):
+        if CJK_RE.match(word) and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def index_text(text: str) -> str:
+    """Token string stored in the full-text index for one cue"""
+    return ' '.join(tokenize(text))
+
+
+def query_terms(query: str) -> List[tuple]:
+    """(text, is_phrase, is_prefix) for each quoted phrase or bare word of a query"""
+    terms = []
+    for quoted, bare in QUERY_TERM_RE.findall(query or ''):
+        text = quoted if quoted else bare
+        prefix = text.endswith('*')
+        text = text.rstrip('*').strip()
+        if text:
+            terms.append((text, bool(quoted), prefix))
+    return terms
+
+
+def build_query(query: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression for a search box query
+
+    "quoted words" match as a phrase, a trailing * matches a prefix, and all terms
+    must occur in the same cue.
+
+    Returns:
+        the expression, or None if the query needs the regex fallback
+        (a single CJK character, or nothing searchable)
+    """
+    parts = []
+    for text, _, prefix in query_terms(query):
+        tokens = tokenize(text)
+        if not tokens:
+            continue
+        if any(len(t) == 1 and CJK_RE.match(t) for t in tokens):
+            return None
+        # 一个词切出多个检索词（中文、带连字符的词）时也按短语匹配
+        parts.append('"' + ' '.join(tokens) + '"' + (' *' if prefix else ''))
+    return ' AND '.join(parts) if parts else None
+
+
+def fallback_pattern(query: str) -> str:
+    """Case-insensitive regex requiring every term of query, used when build_query gives None"""
+    terms = [re.escape(text) for text, _, _ in query_terms(query)]
+    if len(terms) == 1:
+        return '(?i)' + terms[0]
+    # 锚定在开头，否则每个起始位置都会重新执行前瞻
+    return r'(?is)\A' + ''.join(f'(?=.*?{t})' for t in terms)
@@ -0,0 +1,158 @@
+"""
+剧集增量修改 - 把有序的编辑操作应用到合并后的字幕块列表
+
+操作作用于客户端加载的合并视图（与 /api/episode 返回的块一一对应），按顺序执行:
+    {"op": "edit",   "index": i, "zh_text"?: str, "en_text"?: str}
+    {"op": "retime", "index": i, "start": "00:00:01,000", "end": "00:00:02,000"}
+    {"op": "split",  "index": i, "parts": [{"start", "end", "zh_text", "en_text"}, ...]}
+    {"op": "merge",  "index": i, "count": 2}
+    {"op": "insert", "index": i, "block": {"start", "end", "zh_text", "en_text"}}
+    {"op": "delete", "index": i}
+"""
+import re
+from typing import Dict, List, Set, Tuple
+
+LANGS = ('zh', 'en')
+_TIME = re.compile(r'^\d{2}:\d{2}:\d{2},\d{3}$')
+
+
+def _check_index(blocks, index, allow_end=False):
+    limit = len(blocks) + (1 if allow_end else 0)
+    if not isinstance(index, int) or not 0 <= index < limit:
+        raise ValueError(f"index {index!r} out of range (0..{limit - 1})")
+
+
+def _check_time(value, field):
+    if not isinstance(value, str) or not _TIME.match(value):
+        raise ValueError(f"{field} must look like 00:00:01,000, got {value!r}")
+    return value
+
+
+def _check_text(value, field):
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{field} must be a string, got {value!r}")
+    return value or ''
+
+
+def _text_langs(*blocks) -> Set[str]:
+    """Languages with text in any of the given blocks (their files change if the blocks do)"""
+    return {lang for b in blocks for lang in LANGS if (b.get(f'{lang}_text') or '').strip()}
+
+
+def _new_block(data) -> Dict:
+    if not isinstance(data, dict):
+        raise ValueError("block must be an object")
+    return {
+        'index': 0,
+        'start': _check_time(data.get('start'), 'start'),
+        'end': _check_time(data.get('end'), 'end'),
+        'zh_text': _check_text(data.get('zh_text'), 'zh_text'),
+        'en_text': _check_text(data.get('en_text'), 'en_text'),
+    }
+
+
+def apply_op(blocks: List[Dict], op: Dict) -> Set[str]:
+    """
+    Apply one op to blocks in place
+
+    Returns:
+        languages whose subtitle file is affected
+
+    Raises:
+        ValueError: for unknown ops or invalid arguments
+    """
+    kind = op.get('op')
+    index = op.get('index')
+
+    if kind == 'edit':
+        _check_index(blocks, index)
+        block = blocks[index]
+        changed = set()
+        for lang in LANGS:
+            key = f'{lang}_text'
+            if key in op and op[key] != block.get(key):
+                text = _check_text(op[key], key)
+                changed.add(lang)
+                block[key] = text
+        return changed
+
+    if kind == 'retime':
+        _check_index(blocks, index)
+        block = blocks[index]
+        block['start'] = _check_time(op.get('start', block['start']), 'start')
+        block['end'] = _check_time(op.get('end', block['end']), 'end')
+        return _text_langs(block)
+
+    if kind == 'split':
+        _check_index(blocks, index)
+        parts = op.get('parts')
+        if not isinstance(parts, list) or not parts:
+            raise ValueError("split needs a non-empty parts list")
+        new_blocks = [_new_block(p) for p in parts]
+        old = blocks[index]
+        blocks[index:index + 1] = new_blocks
+        return _text_langs(old, *new_blocks)
+
+    if kind == 'merge':
+        _check_index(blocks, index)
+        count = op.get('count', 2)
+        if not isinstance(count, int) or count < 2 or index + count > len(blocks):
+            raise ValueError(f"cannot merge {count!r} blocks at {index}")
+        group = blocks[index:index + count]
+        merged = {
+            'index': 0,
+            'start': group[0]['start'],
+            'end': group[-1]['end'],
+        }
+        for lang in LANGS:
+            key = f'{lang}_text'
+            merged[key] = '\n'.join(b[key] for b in group if (b.get(key) or '').strip())
+        blocks[index:index + count] = [merged]
+        return _text_langs(*group)
+
+    if kind == 'insert':
+        _check_index(blocks, index, allow_end=True)
+        block = _new_block(op.get('block'))
+        blocks.insert(index, block)
+        return _text_langs(block)
+
+    if kind == 'delete':
+        _check_index(blocks, index)
+        return _text_langs(blocks.pop(index))
+
+    raise ValueError(f"unknown op {kind!r}")
+
+
+def apply_ops(blocks: List[Dict], ops: List[Dict]) -> Tuple[List[Dict], Set[str]]:
+    """
+    Apply ops in order to a copy of blocks; the input is left untouched
+
+    Returns:
+        (new blocks reindexed from 1, affected languages)
+
+    Raises:
+        ValueError: naming the first op that failed
+    """
+    result = [dict(b) for b in blocks]
+    affected = set()
+    for n, op in enumerate(ops):
+        if not isinstance(op, dict):
+            raise ValueError(f"op {n}: must be an object")
+        try:
+            affected |= apply_op(result, op)
+        except ValueError as e:
+            raise ValueError(f"op {n} ({op.get('op')}): {e}")
+    for i, block in enumerate(result):
+        block['index'] = i + 1
+    return result, affected
+
+
+def language_blocks(blocks: List[Dict], lang: str) -> List[Dict]:
+    """SRT blocks of one language from merged blocks (blocks without text are dropped)"""
+    key = f'{lang}_text'
+    out = []
+    for block in blocks:
+        text = block.get(key, block.get('text', ''))
+        if text and text.strip():
+            out.append({'index': len(out) + 1, 'start': block['start'], 'end': block['end'], 'text': text})
+    return out
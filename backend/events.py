@@ -0,0 +1,127 @@
+"""
+事件总线 - 通过 /ws 推送给前端的任务进度、剧集修改和磁盘文件变化通知
+
+publish() 可以在任意线程调用（匹配、AI修正在线程池中运行），
+事件在订阅者所在的事件循环里放入其队列，由 WebSocket 连接发送。
+"""
+import asyncio
+import os
+import threading
+from typing import Dict, Set
+
+QUEUE_SIZE = 256       # 每个连接最多积压的事件数，超出时丢弃最旧的
+WATCH_INTERVAL = 2.0   # 轮询字幕目录的间隔（秒）
+SUBTITLE_EXTENSIONS = ('.srt', '.ass')
+
+
+class Subscriber:
+    def __init__(self, project_id: str, loop: asyncio.AbstractEventLoop):
+        self.project_id = project_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._put(event)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._put, event)
+
+
+def snapshot_dir(path: str) -> Dict[str, tuple]:
+    """Subtitle file name -> (mtime_ns, size) for every subtitle under path"""
+    result = {}
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            if name.endswith(SUBTITLE_EXTENSIONS):
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                result[name] = (st.st_mtime_ns, st.st_size)
+    return result
+
+
+class DirectoryWatcher:
+    """Polls a project's zh/en directories and publishes files_changed events"""
+
+    def __init__(self, bus: 'EventBus', project, interval: float = WATCH_INTERVAL):
+        self.bus = bus
+        self.project = project
+        self.interval = interval
+
+    def _snapshot(self):
+        return {lang: snapshot_dir(self.project.subtitle_dir(lang)) for lang in ('zh', 'en')}
+
+    async def run(self):
+        previous = await asyncio.to_thread(self._snapshot)
+        while True:
+            await asyncio.sleep(self.interval)
+            current = await asyncio.to_thread(self._snapshot)
+            for lang, files in current.items():
+                before = previous.get(lang, {})
+                changed = {n for n in files.keys() | before.keys() if files.get(n) != before.get(n)}
+                if changed:
+                    self.bus.publish(self.project.id, {'type': 'files_changed', 'lang': lang, 'files': sorted(changed)})
+            previous = current
+
+
+class EventBus:
+    """Per-project fan-out of events to WebSocket subscribers
+
+    A directory watcher runs for a project only while it has subscribers.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._watchers: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, project) -> Subscriber:
+        """Register a subscriber on the running loop (call from the WebSocket handler)"""
+        loop = asyncio.get_running_loop()
+        sub = Subscriber(project.id, loop)
+        with self._lock:
+            self._subscribers.setdefault(project.id, set()).add(sub)
+            if project.id not in self._watchers:
+                self._watchers[project.id] = loop.create_task(DirectoryWatcher(self, project).run())
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            subs = self._subscribers.get(sub.project_id)
+            if subs is None:
+                return
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.project_id]
+                watcher = self._watchers.pop(sub.project_id, None)
+                if watcher is not None:
+                    watcher.cancel()
+
+    def publish(self, project_id: str, event: dict):
+        with self._lock:
+            subs = list(self._subscribers.get(project_id, ()))
+        for sub in subs:
+            sub.deliver(event)
+
+    def subscriber_count(self, project_id: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(project_id, ()))
+
+    def progress(self, project_id: str, job: str, source: str = None):
+        """Callback publishing progress events of one job: progress(stage, **info)"""
+        def report(stage, **info):
+            self.publish(project_id, {'type': 'progress', 'job': job, 'stage': stage, 'source': source, **info})
+        return report
+
+
+bus = EventBus()
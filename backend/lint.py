@@ -0,0 +1,196 @@
+"""
+字幕质检 - 在进程池中检查整季字幕的阅读速度、行长、时间轴、未翻译条目和脏话
+
+阈值与前端一致：CPS 达到 15 开始提示、27 以上为错误（getCpsColor），
+每行最多 40 个字符（split_long_line）。脏话列表来自 rules.txt 中 "脏话：" 一行。
+主进程只读取字幕（数据库命中时无需解析），检查在子进程中按集并行执行。
+"""
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+try:
+    from backend.srt_parser import merge_blocks_by_time
+    from backend.project_db import time_to_ms
+except ImportError:
+    from srt_parser import merge_blocks_by_time
+    from project_db import time_to_ms
+
+CPS_WARNING = 15
+CPS_ERROR = 27
+MAX_LINE_CHARS = 40
+MIN_GAP_MS = 80          # 小于约两帧的间隔会让字幕看起来在闪
+LINT_WORKERS = min(4, os.cpu_count() or 1)
+MIN_POOL_JOBS = 3        # 少于这么多集（或只有一个 CPU）时直接在当前线程检查，不启动子进程
+CHECKS = ('cps', 'line_length', 'overlap', 'zero_length', 'gap', 'untranslated', 'profanity')
+
+TAG_RE = re.compile(r'\{[^}]*\}|<[^>]*>')
+PROFANITY_RE = re.compile(r'脏话\s*[:：](.*?)(?:请|\n\s*\n|$)', re.S)
+PROFANITY_SPLIT_RE = re.compile(r'[；;/,，、\n]')
+
+
+def profanity_terms(rules: str) -> List[str]:
+    """Words listed after "脏话：" in rules.txt (the list may continue on the next line)"""
+    m = PROFANITY_RE.search(rules or '')
+    if not m:
+        return []
+    terms = []
+    for term in PROFANITY_SPLIT_RE.split(m.group(1)):
+        term = term.strip().lower()
+        if term and term.rstrip('.') != 'etc' and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def profanity_pattern(terms: List[str]) -> Optional[str]:
+    """Whole-word, case-insensitive regex for the terms (longest first), or None"""
+    if not terms:
+        return None
+    words = [re.escape(t).replace(r'\ ', r'\s+') for t in sorted(terms, key=len, reverse=True)]
+    return r'(?i)(?<!\w)(?:' + '|'.join(words) + r')(?!\w)'
+
+
+def _issue(check, severity, lang, cue, block, start_ms, end_ms, detail=None):
+    return {'check': check, 'severity': severity, 'lang': lang, 'cue': cue, 'index': block.get('index', cue + 1),
+            'start_ms': start_ms, 'end_ms': end_ms, 'detail': detail, 'text': block.get('text', '')}
+
+
+def lint_blocks(blocks: List[Dict], lang: str, checks=CHECKS, profanity: Optional[str] = None) -> List[Dict]:
+    """Per-cue and timeline checks of one subtitle file"""
+    issues = []
+    pattern = re.compile(profanity) if profanity and 'profanity' in checks else None
+    timeline = []
+    for cue, block in enumerate(blocks):
+        start_ms, end_ms = time_to_ms(block['start']), time_to_ms(block['end'])
+        text = TAG_RE.sub('', block.get('text', ''))
+        timeline.append((start_ms, end_ms, cue))
+        duration = end_ms - start_ms
+
+        if duration <= 0:
+            if 'zero_length' in checks:
+                issues.append(_issue('zero_length', 'error', lang, cue, block, start_ms, end_ms, duration))
+        elif 'cps' in checks:
+            cps = len(text) / (duration / 1000)
+            if cps >= CPS_WARNING:
+                severity = 'error' if cps >= CPS_ERROR else 'warning'
+                issues.append(_issue('cps', severity, lang, cue, block, start_ms, end_ms, round(cps, 1)))
+
+        if 'line_length' in checks:
+            longest = max((len(line) for line in text.split('\n')), default=0)
+            if longest > MAX_LINE_CHARS:
+                issues.append(_issue('line_length', 'warning', lang, cue, block, start_ms, end_ms, longest))
+
+        if pattern is not None:
+            found = sorted({' '.join(w.lower().split()) for w in pattern.findall(text)})
+            if found:
+                issues.append(_issue('profanity', 'warning', lang, cue, block, start_ms, end_ms, ', '.join(found)))
+
+    if 'overlap' in checks or 'gap' in checks:
+        timeline.sort()
+        for (_, prev_end, _), (start_ms, end_ms, cue) in zip(timeline, timeline[1:]):
+            gap = start_ms - prev_end
+            if gap < 0 and 'overlap' in checks:
+                issues.append(_issue('overlap', 'error', lang, cue, blocks[cue], start_ms, end_ms, -gap))
+            elif 0 < gap < MIN_GAP_MS and 'gap' in checks:
+                issues.append(_issue('gap', 'warning', lang, cue, blocks[cue], start_ms, end_ms, gap))
+    return issues
+
+
+def untranslated_cues(zh_blocks: List[Dict], en_blocks: List[Dict], alignment: Optional[Dict] = None) -> List[Dict]:
+    """
+    Chinese cues whose merged view (primary=zh) has an empty en_text
+
+    Args:
+        alignment: track_align estimate of the foreign track, applied before merging
+            like the episode view does (an offset track would otherwise look untranslated)
+    """
+    # track_align -> retime -> lint 已构成导入链，这里在用到时再导入
+    try:
+        from backend.track_align import align_blocks
+    except ImportError:
+        from track_align import align_blocks
+    issues = []
+    en_blocks = align_blocks(en_blocks, alignment)
+    for cue, block in enumerate(merge_blocks_by_time(zh_blocks, en_blocks, primary='zh')):
+        if block['zh_text'].strip() and not block['en_text'].strip():
+            issues.append(_issue('untranslated', 'warning', 'en', cue, dict(block, text=block['zh_text']),
+                                 time_to_ms(block['start']), time_to_ms(block['end'])))
+    return issues
+
+
+def lint_episode(zh_blocks: List[Dict], en_blocks: List[Dict], checks=CHECKS,
+                 profanity: Optional[str] = None, alignment: Optional[Dict] = None) -> List[Dict]:
+    """
+    All issues of one episode, ordered by time (runs in a worker process)
+
+    Args:
+        profanity: regex from profanity_pattern(), matched against the foreign text only
+        alignment: foreign track estimate for the untranslated check (see untranslated_cues)
+
+    The untranslated check is skipped for episodes without a foreign file.
+    """
+    issues = lint_blocks(zh_blocks, 'zh', checks) + lint_blocks(en_blocks, 'en', checks, profanity)
+    if 'untranslated' in checks and en_blocks:
+        issues += untranslated_cues(zh_blocks, en_blocks, alignment)
+    issues.sort(key=lambda i: (i['start_ms'], i['lang'], i['cue']))
+    return issues
+
+
+class LintPool:
+    """Process pool for lint_episode, created on first use and rebuilt if a worker dies"""
+
+    def __init__(self, workers: int = LINT_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _reset(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def run(self, jobs: Dict, checks=CHECKS, profanity: Optional[str] = None, progress=None) -> Dict:
+        """
+        Lint several episodes in parallel
+
+        Args:
+            jobs: key -> (zh_blocks, en_blocks, alignment estimate or None)
+            progress: optional callback progress('check', done=, total=)
+
+        Returns:
+            key -> issues
+        """
+        results = {}
+        total = len(jobs)
+        if total < MIN_POOL_JOBS or self.workers < 2:
+            for done, (key, (zh, en, alignment)) in enumerate(jobs.items(), 1):
+                results[key] = lint_episode(zh, en, checks, profanity, alignment)
+                if progress:
+                    progress('check', done=done, total=total)
+            return results
+        try:
+            pool = self._executor()
+            futures = {pool.submit(lint_episode, zh, en, checks, profanity, alignment): key
+                       for key, (zh, en, alignment) in jobs.items()}
+            for done, future in enumerate(as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                if progress:
+                    progress('check', done=done, total=total)
+        except BrokenProcessPool as e:
+            # 子进程异常退出（被杀、内存不足）：重建进程池，剩余的在当前线程完成
+            print(f"Lint pool broken ({e}), finishing in-process")
+            self._reset()
+            for key, (zh, en, alignment) in jobs.items():
+                if key not in results:
+                    results[key] = lint_episode(zh, en, checks, profanity, alignment)
+        return results
@@ -1,65 +1,232 @@
 """
 日志系统 - 用于exe无控制台模式
+
+print 输出进入队列，由后台线程批量写入 app.log；日志超过大小上限时轮转，
+不再在启动时删除旧日志。逐文件的调试输出使用 debug()，非 DEBUG 级别时直接返回。
+
+队列有长度上限，写入跟不上时丢弃新行而不是无限占用内存；日志文件无法打开或写入时
+改为输出到原始 stderr（无控制台时丢弃），下一批再尝试重新打开。
 """
 import sys
 import os
+import atexit
+import queue
+import threading
 from datetime import datetime
 
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+# 日志级别：环境变量 DQS_LOG_LEVEL=DEBUG/INFO/WARNING/ERROR
+_level = LEVELS.get(os.environ.get('DQS_LOG_LEVEL', 'INFO').upper(), LEVELS['INFO'])
+
+MAX_LOG_BYTES = 5 * 1024 * 1024  # 单个日志文件上限
+LOG_BACKUPS = 3                  # 保留 app.log.1 ~ app.log.3
+BATCH_SIZE = 256                 # 每次最多合并写入的行数
+QUEUE_LINES = 10000              # 队列中最多等待写入的行数，超出时丢弃
+
+_writer = None
+
+
+def set_level(name):
+    global _level
+    _level = LEVELS[name.upper()]
+
+
+def is_debug():
+    return _level <= LEVELS['DEBUG']
+
+
+def debug(message, *args):
+    """Debug-level output; returns before formatting unless DEBUG is enabled"""
+    if _level > LEVELS['DEBUG']:
+        return
+    _emit('DEBUG', message % args if args else message)
+
+
+def _emit(level, message):
+    stream = sys.stdout
+    if isinstance(stream, Logger):
+        stream.log(level, message)
+    else:
+        print(f"[{level}] {message}")
+
+
+class _LogWriter(threading.Thread):
+    """Background thread that drains the queue and appends to the log in batches"""
+
+    def __init__(self, log_file, max_bytes=MAX_LOG_BYTES, backups=LOG_BACKUPS):
+        super().__init__(name='log-writer', daemon=True)
+        self.log_file = log_file
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.Queue(maxsize=QUEUE_LINES)
+        self.dropped = 0
+        self._stopped = threading.Event()
+        self._file = None
+        self._size = 0
+
+    def put(self, line):
+        """Queue a line for writing; dropped (and counted) when the queue is full"""
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def _open(self):
+        self._file = open(self.log_file, 'a', encoding='utf-8')
+        self._size = self._file.tell()
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _fallback(self, data):
+        # sys.stderr 已被重定向到队列，直接写原始 stderr；无控制台（exe）时为 None，只能丢弃
+        stream = sys.__stderr__
+        if stream is None:
+            return
+        try:
+            stream.write(data)
+            stream.flush()
+        except Exception:
+            pass
+
+    def _rotate(self):
+        self._close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.log_file}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.log_file}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.log_file, f"{self.log_file}.1")
+        else:
+            os.remove(self.log_file)
+        self._open()
+
+    def _write_batch(self, lines):
+        data = ''.join(lines)
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            data += f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [WARNING] Log queue full, dropped {dropped} lines\n"
+        size = len(data.encode('utf-8'))
+        try:
+            if self._file is None:
+                self._open()
+            elif self._size and self._size + size > self.max_bytes:
+                try:
+                    self._rotate()
+                except OSError:
+                    if self._file is None:
+                        self._open()
+            self._file.write(data)
+            self._file.flush()
+            self._size += size
+        except Exception:
+            self._close()
+            self._fallback(data)
+
+    def run(self):
+        while True:
+            line = self.queue.get()
+            if line is None:
+                break
+            lines = [line]
+            stop = False
+            while len(lines) < BATCH_SIZE:
+                try:
+                    line = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if line is None:
+                    stop = True
+                    break
+                lines.append(line)
+            self._write_batch(lines)
+            if stop:
+                break
+        self._close()
+        self._stopped.set()
+
+    def stop(self, timeout=2.0):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._stopped.wait(timeout)
+
+
 class Logger:
-    def __init__(self, log_file):
+    def __init__(self, log_file, level='INFO', writer=None, terminal=None):
         self.log_file = log_file
-        self.terminal = sys.stdout
-        
+        self.level = level
+        self.terminal = terminal
+        self.writer = writer
+
     def write(self, message):
         if message.strip():  # 忽略空行
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            formatted = f"[{timestamp}] {message}"
-            # 写入文件
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(formatted)
-                if not message.endswith('\n'):
-                    f.write('\n')
-            # 同时输出到终端（如果有）
-            if self.terminal:
-                try:
-                    self.terminal.write(message)
-                except:
-                    pass
-    
+            self.log(self.level, message)
+
+    def log(self, level, message):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        formatted = f"[{timestamp}] [{level}] {message}"
+        if not message.endswith('\n'):
+            formatted += '\n'
+        # 放入队列，由后台线程写入文件
+        self.writer.put(formatted)
+        # 同时输出到终端（如果有）
+        if self.terminal:
+            try:
+                self.terminal.write(message if message.endswith('\n') else message + '\n')
+            except:
+                pass
+
     def flush(self):
         if self.terminal:
             try:
                 self.terminal.flush()
             except:
                 pass
-    
+
     def isatty(self):
         """uvicorn需要此方法"""
         return False
 
-def setup_logging():
+
+def shutdown():
+    """Flush queued lines to disk; call before os._exit"""
+    if _writer is not None:
+        _writer.stop()
+
+
+def setup_logging(level=None):
     """设置日志输出到文件"""
+    global _writer
+    if level:
+        set_level(level)
+
     if getattr(sys, 'frozen', False):
         # 打包后：日志文件在exe目录
         log_dir = os.path.dirname(sys.executable)
     else:
         # 开发环境：日志在项目根目录
         log_dir = os.path.dirname(os.path.dirname(__file__))
-    
+
     log_file = os.path.join(log_dir, 'app.log')
-    
-    # 清空旧日志
-    if os.path.exists(log_file):
-        try:
-            os.remove(log_file)
-        except:
-            pass
-    
+
+    _writer = _LogWriter(log_file)
+    _writer.start()
+    atexit.register(shutdown)
+
     # 重定向标准输出和错误输出
-    sys.stdout = Logger(log_file)
-    sys.stderr = Logger(log_file)
-    
+    sys.stdout = Logger(log_file, 'INFO', _writer, terminal=sys.stdout)
+    sys.stderr = Logger(log_file, 'ERROR', _writer, terminal=sys.stderr)
+
     print(f"=== Application started at {datetime.now()} ===")
     print(f"Log file: {log_file}")
+    print(f"Log level: {[name for name, value in LEVELS.items() if value == _level][0]}")
     print(f"sys.frozen: {getattr(sys, 'frozen', False)}")
     print(f"sys.executable: {sys.executable}")
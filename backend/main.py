@@ -1,29 +1,76 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Response
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Response, Depends, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, StreamingResponse
-import uvicorn
 import shutil
 import os
 import zipfile
+import io
 from typing import List, Optional, Dict
 from pydantic import BaseModel
 import json
+import asyncio
+import re
+import uuid
+from bisect import bisect_left, bisect_right
+from contextlib import ExitStack
+from functools import partial
+from urllib.parse import quote
 
 # Import local modules
 # Assuming the script is run from the root directory
 try:
     from backend.matcher import match_files
-    from backend.corrector import correct_text_with_gpt
-    from backend.srt_parser import parse_srt, parse_ass, blocks_to_srt, blocks_to_ass, time_to_seconds, merge_blocks_by_time
+    from backend.match_cache import cached_match, index_by_episode
+    from backend.projects import Project, ProjectStore, DEFAULT_PROJECT, MERGED_CACHE_SIZE
+    from backend.project_db import ass_header
+    from backend.video_index import scan_videos
+    from backend.logger import debug
+    from backend.metrics import metrics, span, inc, TimingMiddleware
+    from backend.profiler import install_profiler, list_profiles, profile_file_path
+    from backend.corrector import correct_text_with_gpt, load_rules, srt_parts, part_number
+    from backend.episode_patch import LANGS, apply_ops, language_blocks
+    from backend.events import bus
+    from backend.prefetch import Prefetcher, VideoHeadCache, PREFETCH_NEIGHBOURS
+    from backend.video_container import VideoLayoutCache
+    from backend.cue_search import build_query, fallback_pattern
+    from backend.retime import validate_ops, retime_blocks
+    from backend.warmup import decode_subtitle, parse_files, prepare_episodes
+    from backend.track_align import estimate_alignment, align_blocks, alignment_steps
+    from backend.lint import CHECKS, CPS_WARNING, CPS_ERROR, MAX_LINE_CHARS, MIN_GAP_MS, LintPool, profanity_pattern, profanity_terms
+    from backend.serializers import SERIALIZERS, get_serializer, serializer_for_path, write_file
+    from backend.srt_parser import parse_srt, parse_ass, time_to_seconds, merge_blocks_by_time
 except ImportError:
     # Fallback if run from backend directory
     from matcher import match_files
-    from corrector import correct_text_with_gpt
-    from srt_parser import parse_srt, parse_ass, blocks_to_srt, blocks_to_ass, time_to_seconds, merge_blocks_by_time
+    from match_cache import cached_match, index_by_episode
+    from projects import Project, ProjectStore, DEFAULT_PROJECT, MERGED_CACHE_SIZE
+    from project_db import ass_header
+    from video_index import scan_videos
+    from logger import debug
+    from metrics import metrics, span, inc, TimingMiddleware
+    from profiler import install_profiler, list_profiles, profile_file_path
+    from corrector import correct_text_with_gpt, load_rules, srt_parts, part_number
+    from episode_patch import LANGS, apply_ops, language_blocks
+    from events import bus
+    from prefetch import Prefetcher, VideoHeadCache, PREFETCH_NEIGHBOURS
+    from video_container import VideoLayoutCache
+    from cue_search import build_query, fallback_pattern
+    from retime import validate_ops, retime_blocks
+    from warmup import decode_subtitle, parse_files, prepare_episodes
+    from track_align import estimate_alignment, align_blocks, alignment_steps
+    from lint import CHECKS, CPS_WARNING, CPS_ERROR, MAX_LINE_CHARS, MIN_GAP_MS, LintPool, profanity_pattern, profanity_terms
+    from serializers import SERIALIZERS, get_serializer, serializer_for_path, write_file
+    from srt_parser import parse_srt, parse_ass, time_to_seconds, merge_blocks_by_time
 
 app = FastAPI()
 
+# 记录每个路由的耗时
+app.add_middleware(TimingMiddleware)
+# 按需性能分析（仅在设置 DQS_PROFILE 时安装）
+install_profiler(app)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -43,10 +90,7 @@ else:
     BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 UPLOAD_DIR = os.path.join(BASE_PATH, "uploads")
-ZH_DIR = os.path.join(UPLOAD_DIR, "zh")
-EN_DIR = os.path.join(UPLOAD_DIR, "en")
-os.makedirs(ZH_DIR, exist_ok=True)
-os.makedirs(EN_DIR, exist_ok=True)
+os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # Frontend 静态文件目录
 if getattr(sys, 'frozen', False):
@@ -54,9 +98,25 @@ if getattr(sys, 'frozen', False):
 else:
     FRONTEND_DIR = os.path.join(BASE_PATH, "frontend")
 
-# Global state
-current_matches = []
-video_base_path = ""
+# 项目工作区（默认项目使用 uploads/zh、uploads/en）
+projects = ProjectStore(UPLOAD_DIR)
+
+# 相邻剧集的后台预取，以及最近打开的视频文件开头
+prefetcher = Prefetcher()
+video_heads = VideoHeadCache()
+# 视频容器的顶层 box 位置和 moov（首次打开时读取）
+video_layouts = VideoLayoutCache()
+# 整季质检的进程池（首次使用时启动）
+lint_pool = LintPool()
+# 匹配后预热时构建的合并顺序：'union' 是编辑器默认视图，'zh' 用于翻译记忆
+WARMUP_PRIMARIES = ('union', 'zh')
+
+def get_project(project: str = DEFAULT_PROJECT) -> Project:
+    """Project selected by the ?project= query parameter"""
+    try:
+        return projects.get(project)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 class MatchRequest(BaseModel):
     video_path: str
@@ -69,6 +129,8 @@ class SaveRequest(BaseModel):
 class CorrectRequest(BaseModel):
     content: str
     rules: str
+    sources: Optional[List[str]] = None  # 每个 SRT 块对应的中文原文，有已确认译文的块不发送给模型
+    stream: bool = False                 # 流式读取模型输出，每校验完一块就通过 /ws 推送（progress 的 'cue' 阶段）
 
 class UpdateBlockRequest(BaseModel):
     episode_index: int
@@ -83,119 +145,154 @@ class SaveAllBlocksRequest(BaseModel):
     blocks: List[Dict]
     type: str  # 'zh' or 'en'
 
-@app.post("/api/upload/zh")
-async def upload_zh(file: UploadFile = File(...)):
-    print(f"\n=== Uploading Chinese subtitles ===")
+class RetimeRequest(BaseModel):
+    ops: List[Dict]
+    episodes: Optional[List[int]] = None  # 默认整季
+    langs: List[str] = ['zh', 'en']
+    from_ms: Optional[int] = None         # 只调整在此区间内开始的字幕
+    to_ms: Optional[int] = None
+
+class AlignRequest(BaseModel):
+    episodes: Optional[List[int]] = None  # 默认整季
+    write: bool = False                   # 把需要对齐的外语字幕按估计结果写回文件
+
+class FillRequest(BaseModel):
+    episode_index: int
+    base_version: int
+    min_score: float = 1.0  # 1.0 只填完全相同的原文；更低时也接受模糊匹配
+
+class PatchRequest(BaseModel):
+    base_version: int
+    ops: List[Dict]
+    langs: Optional[List[str]] = None  # 只写入这些语言的文件（默认写入所有受影响的语言）
+
+def extract_upload(file: UploadFile, proj: Project, kind: str, label: str):
+    """Replace the project's zh/en directory with the contents of an uploaded zip"""
+    print(f"\n=== Uploading {label} subtitles (project {proj.id}) ===")
     print(f"Filename: {file.filename}")
-    
-    if os.path.exists(ZH_DIR):
-        shutil.rmtree(ZH_DIR)
-    os.makedirs(ZH_DIR)
-    
-    file_path = os.path.join(UPLOAD_DIR, "zh.zip")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    print(f"Saved to: {file_path}")
-    
-    try:
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            zip_ref.extractall(ZH_DIR)
-        print(f"Extracted to: {ZH_DIR}")
-        
-        # List extracted files
-        for root, dirs, files in os.walk(ZH_DIR):
-            for f in files:
-                print(f"  - {f}")
-    except zipfile.BadZipFile:
-        print("ERROR: Invalid zip file")
+    return extract_zip(file.file, proj, kind)
+
+def extract_zip(source, proj: Project, kind: str):
+    """Replace the project's zh/en directory with the contents of a zip read from a binary file object"""
+    target_dir = proj.subtitle_dir(kind)
+    with proj.lock:
+        if os.path.exists(target_dir):
+            shutil.rmtree(target_dir)
+        os.makedirs(target_dir)
+        proj.forget_files(kind)
+
+        file_path = os.path.join(proj.root, f"{kind}.zip")
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(source, buffer)
+
+        print(f"Saved to: {file_path}")
+
+        try:
+            with zipfile.ZipFile(file_path, 'r') as zip_ref:
+                zip_ref.extractall(target_dir)
+            print(f"Extracted to: {target_dir}")
+
+            # List extracted files
+            for root, dirs, files in os.walk(target_dir):
+                for f in files:
+                    debug("  - %s", f)
+        except zipfile.BadZipFile:
+            print("ERROR: Invalid zip file")
+            return False
+    return True
+
+@app.post("/api/upload/zh")
+async def upload_zh(file: UploadFile = File(...), proj: Project = Depends(get_project)):
+    if not extract_upload(file, proj, 'zh', 'Chinese'):
         return {"error": "Invalid zip file"}
-    
+    prefetcher.submit(('index', proj.id, 'zh'), index_subtitles, proj, 'zh')
     return {"message": "Chinese subtitles uploaded"}
 
 @app.post("/api/upload/en")
-async def upload_en(file: UploadFile = File(...)):
-    print(f"\n=== Uploading Foreign subtitles ===")
-    print(f"Filename: {file.filename}")
-    
-    if os.path.exists(EN_DIR):
-        shutil.rmtree(EN_DIR)
-    os.makedirs(EN_DIR)
-    
-    file_path = os.path.join(UPLOAD_DIR, "en.zip")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    print(f"Saved to: {file_path}")
-    
-    try:
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            zip_ref.extractall(EN_DIR)
-        print(f"Extracted to: {EN_DIR}")
-        
-        # List extracted files
-        for root, dirs, files in os.walk(EN_DIR):
-            for f in files:
-                print(f"  - {f}")
-    except zipfile.BadZipFile:
-        print("ERROR: Invalid zip file")
+async def upload_en(file: UploadFile = File(...), proj: Project = Depends(get_project)):
+    if not extract_upload(file, proj, 'en', 'Foreign'):
         return {"error": "Invalid zip file"}
-        
+    prefetcher.submit(('index', proj.id, 'en'), index_subtitles, proj, 'en')
     return {"message": "English subtitles uploaded"}
 
+def list_subtitles(search_dir, label):
+    """Names of .srt/.ass files under search_dir"""
+    found = []
+    with span('dir_walk', target='subtitles'):
+        for root, dirs, files in os.walk(search_dir):
+            for file in files:
+                if file.endswith(".srt") or file.endswith(".ass"):
+                    found.append(file)
+                    debug("Found %s subtitle: %s", label, file)
+    return found
+
+def match_season(proj: Project, video_base_path: str, progress):
+    """
+    Match the project's subtitles (and videos under video_base_path, if it exists) into episodes
+
+    Returns:
+        (matches, match cache status)
+    """
+    zh_files = list_subtitles(proj.zh_dir, "Chinese")
+    en_files = list_subtitles(proj.en_dir, "Foreign")
+
+    video_files = []
+    video_index = None
+    if video_base_path and os.path.exists(video_base_path):
+        print(f"Video path exists, scanning...")
+        progress('scan')
+        with span('dir_walk', target='video'):
+            video_files, video_index = scan_videos(video_base_path)
+    else:
+        print(f"Video path does not exist: {video_base_path}")
+
+    print(f"Total: {len(zh_files)} Chinese, {len(en_files)} Foreign, {len(video_files)} videos")
+
+    matcher = partial(match_files, video_index=video_index, progress=progress)
+    matches, cache_status = cached_match(proj.match_cache, zh_files, en_files, video_files, video_base_path, matcher)
+    inc('match_cache_total', status=cache_status)
+    with proj.lock:
+        proj.matches = matches
+        proj.video_base_path = video_base_path
+        proj.reset_episodes()
+    proj.save_state()
+    print(f"Match result ({cache_status}): {len(matches)} episodes")
+    debug("Match result: %s", matches)
+    return matches, cache_status
+
 @app.post("/api/match")
-async def match(req: MatchRequest):
-    global current_matches, video_base_path
+async def match(req: MatchRequest, client: Optional[str] = None, proj: Project = Depends(get_project)):
     video_base_path = req.video_path
+    # 进度通过 /ws 推送给发起请求的页面（client 为其连接 ID）
+    progress = bus.progress(proj.id, 'match', client)
     
-    print(f"\n=== Match request received ===")
+    print(f"\n=== Match request received (project {proj.id}) ===")
     print(f"Video path: {video_base_path}")
-    print(f"ZH_DIR: {ZH_DIR}")
-    print(f"EN_DIR: {EN_DIR}")
+    print(f"ZH_DIR: {proj.zh_dir}")
+    print(f"EN_DIR: {proj.en_dir}")
     
     try:
-        zh_files = []
-        for root, dirs, files in os.walk(ZH_DIR):
-            for file in files:
-                if file.endswith(".srt") or file.endswith(".ass"):
-                    zh_files.append(file)
-                    print(f"Found Chinese subtitle: {file}")
-                    
-        en_files = []
-        for root, dirs, files in os.walk(EN_DIR):
-            for file in files:
-                if file.endswith(".srt") or file.endswith(".ass"):
-                    en_files.append(file)
-                    print(f"Found Foreign subtitle: {file}")
-
-        video_files = []
-        if os.path.exists(video_base_path):
-            print(f"Video path exists, scanning...")
-            for root, dirs, files in os.walk(video_base_path):
-                for file in files:
-                    if file.lower().endswith(('.mp4', '.mkv', '.avi', '.mov')):
-                        video_files.append(file)
-                        print(f"Found video: {file}")
-        else:
-            print(f"Video path does not exist: {video_base_path}")
-        
-        print(f"Total: {len(zh_files)} Chinese, {len(en_files)} Foreign, {len(video_files)} videos")
-        
-        current_matches = match_files(zh_files, en_files, video_files)
-        print(f"Match result: {current_matches}")
-        return current_matches
+        # 匹配可能要调用AI数分钟，放到线程池里执行，不阻塞其他请求和 WebSocket
+        matches, cache_status = await run_in_threadpool(match_season, proj, video_base_path, progress)
+        progress('done', episodes=len(matches), cache=cache_status)
+        # 后台解析整季，之后打开任一集和整季功能都直接读数据库
+        prefetcher.submit(('warmup', proj.id), warm_season, proj, bus.progress(proj.id, 'warmup', client))
+        return matches
     except Exception as e:
         print(f"ERROR in match endpoint: {e}")
         import traceback
         traceback.print_exc()
+        progress('failed', error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/rematch-videos")
-async def rematch_videos():
+async def rematch_videos(client: Optional[str] = None, proj: Project = Depends(get_project)):
     """重新匹配视频文件，不影响已有字幕"""
-    global current_matches, video_base_path
+    video_base_path = proj.video_base_path
+    progress = bus.progress(proj.id, 'match', client)
+    current_matches = proj.matches
     
-    print(f"\n=== Rematch videos request ===")
+    print(f"\n=== Rematch videos request (project {proj.id}) ===")
     
     if not video_base_path:
         raise HTTPException(status_code=400, detail="No video path set. Please run initial match first.")
@@ -207,14 +304,11 @@ async def rematch_videos():
     print(f"Current matches: {len(current_matches)} episodes")
     
     # 重新扫描视频文件夹
-    video_files = []
     if os.path.exists(video_base_path):
         print(f"Scanning video folder...")
-        for root, dirs, files in os.walk(video_base_path):
-            for file in files:
-                if file.lower().endswith(('.mp4', '.mkv', '.avi', '.mov')):
-                    video_files.append(file)
-                    print(f"Found video: {file}")
+        progress('scan')
+        with span('dir_walk', target='video'):
+            video_files, video_index = await run_in_threadpool(scan_videos, video_base_path)
     else:
         print(f"Video path does not exist: {video_base_path}")
         raise HTTPException(status_code=404, detail="Video path not found")
@@ -222,171 +316,353 @@ async def rematch_videos():
     print(f"Found {len(video_files)} videos")
     
     # 获取字幕文件列表（用于AI识别剧名）
-    zh_files = []
-    for root, dirs, files in os.walk(ZH_DIR):
-        for file in files:
-            if file.endswith(".srt") or file.endswith(".ass"):
-                zh_files.append(file)
-    
-    en_files = []
-    for root, dirs, files in os.walk(EN_DIR):
-        for file in files:
-            if file.endswith(".srt") or file.endswith(".ass"):
-                en_files.append(file)
-    
-    # 调用matcher重新匹配
-    new_matches = match_files(zh_files, en_files, video_files)
-    
-    # 更新全局匹配结果（只更新视频字段，保留字幕）
+    zh_files = list_subtitles(proj.zh_dir, "Chinese")
+    en_files = list_subtitles(proj.en_dir, "Foreign")
+    
+    # 调用matcher重新匹配（文件列表未变化时直接命中缓存）
+    matcher = partial(match_files, video_index=video_index, progress=progress)
+    new_matches, cache_status = await run_in_threadpool(
+        cached_match, proj.match_cache, zh_files, en_files, video_files, video_base_path, matcher)
+    inc('match_cache_total', status=cache_status)
+    print(f"Rematch result: {cache_status}")
+    
+    # 更新匹配结果（只更新视频字段，保留字幕）
     print(f"\nUpdating video associations...")
-    for i, match in enumerate(current_matches):
-        # 找到对应集数的新匹配
-        episode = match.get('episode')
-        for new_match in new_matches:
-            if new_match.get('episode') == episode:
+    new_by_episode = index_by_episode(new_matches)
+    with proj.lock:
+        for match in current_matches:
+            episode = match.get('episode')
+            new_match = new_by_episode.get(episode)
+            if new_match is not None:
                 old_video = match.get('video', 'None')
                 new_video = new_match.get('video', 'None')
-                current_matches[i]['video'] = new_video
+                match['video'] = new_video
                 if old_video != new_video:
                     print(f"  Episode {episode}: {old_video} → {new_video}")
-                break
-    
-    # 检查是否有新集数（只在视频中有，字幕中没有）
-    existing_episodes = {m.get('episode') for m in current_matches}
-    for new_match in new_matches:
-        ep = new_match.get('episode')
-        if ep not in existing_episodes and new_match.get('video'):
-            print(f"  New episode found: {ep} (video only)")
-            current_matches.append(new_match)
-    
-    # 重新排序
-    current_matches.sort(key=lambda x: x.get('episode', ''))
+        
+        # 检查是否有新集数（只在视频中有，字幕中没有）
+        existing_episodes = index_by_episode(current_matches)
+        for ep, new_match in new_by_episode.items():
+            if ep not in existing_episodes and new_match.get('video'):
+                print(f"  New episode found: {ep} (video only)")
+                current_matches.append(new_match)
+        
+        # 重新排序
+        current_matches.sort(key=lambda x: x.get('episode', ''))
+        proj.reset_episodes()
+    proj.save_state()
     
     print(f"=== Rematch completed: {len(current_matches)} episodes ===\n")
+    progress('done', episodes=len(current_matches), cache=cache_status)
     return current_matches
 
 def find_file(name, search_dir):
-    for root, dirs, files in os.walk(search_dir):
-        if name in files:
-            return os.path.join(root, name)
+    with span('find_file'):
+        for root, dirs, files in os.walk(search_dir):
+            if name in files:
+                return os.path.join(root, name)
     return None
 
-@app.get("/api/episode/{index}")
-async def get_episode(index: int, primary: str = 'zh'):
+def read_subtitle_file(path):
+    """Read a subtitle file as UTF-8, falling back to GBK"""
+    with span('decode'):
+        return decode_subtitle(path)
+
+def parse_subtitle(path, content):
+    with span('parse', format='ass' if path.endswith('.ass') else 'srt'):
+        if path.endswith('.ass'):
+            return parse_ass(content)
+        return parse_srt(content)
+
+def load_subtitle_blocks(proj: Project, kind: str, path):
+    """Blocks of a subtitle file: parsed on first use, then read from the project database"""
+    try:
+        st = os.stat(path)
+        with span('db_read'):
+            cached = proj.db.file_cues(path, st)
+        if cached is not None:
+            return cached[0]
+        content = read_subtitle_file(path)
+        blocks = parse_subtitle(path, content)
+        header = ass_header(content) if path.endswith('.ass') else None
+        with span('db_write'):
+            proj.db.store_file(proj.id, kind, path, st, blocks, header)
+        return blocks
+    except Exception as e:
+        print(f"Failed to load {path}: {e}")
+        return []
+
+def index_subtitles(proj: Project, kind: str):
     """
-    Get episode data with merged subtitles
-    
+    Import every subtitle of an uploaded directory into the project database
+    (and its search index); files are decoded and parsed in the warm-up process pool
+    """
+    pending = {}
+    with span('index_subtitles', lang=kind):
+        for root, dirs, files in os.walk(proj.subtitle_dir(kind)):
+            for name in files:
+                if not name.endswith(('.srt', '.ass')):
+                    continue
+                path = os.path.join(root, name)
+                st = os.stat(path)
+                if not proj.db.file_current(path, st):
+                    pending[path] = st
+        for path, parsed in parse_files(list(pending)):
+            if parsed is not None:
+                with span('db_write'):
+                    proj.db.store_file(proj.id, kind, path, pending[path], *parsed)
+    print(f"Indexed {len(pending)} {kind} subtitle files (project {proj.id})")
+
+def file_stamp(path):
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (path, st.st_mtime_ns, st.st_size)
+
+def episode_stamp(proj: Project, match):
+    """Paths of an episode's subtitle files and a stamp that changes when either file does"""
+    zh_path = proj.find_subtitle('zh', match['zh_sub']) if match.get('zh_sub') else None
+    en_path = proj.find_subtitle('en', match['en_sub']) if match.get('en_sub') else None
+    stamp = (match.get('zh_sub'), match.get('en_sub'), file_stamp(zh_path), file_stamp(en_path))
+    return zh_path, en_path, stamp
+
+def load_merged_episode(proj: Project, index: int, primary: str, prefetch: bool = False):
+    """
+    Merged blocks of one episode, reused until either subtitle file changes
+
     Args:
-        index: Episode index
-        primary: 'zh' or 'en' - which language to use as primary ordering
+        prefetch: background load; counted separately in episode_cache_total
+
+    Returns:
+        dict with 'blocks', 'starts' and 'ends' (seconds) and the match entry
     """
-    if index >= len(current_matches):
-        raise HTTPException(status_code=404, detail="Episode not found")
-    
-    match = current_matches[index]
-    
+    match = proj.matches[index]
+    zh_path, en_path, stamp = episode_stamp(proj, match)
+    key = (index, primary)
+
+    entry = proj.cached_episode(key, stamp)
+    if entry is not None:
+        if not prefetch:
+            inc('episode_cache_total', status='hit')
+        return entry
+    inc('episode_cache_total', status='prefetch' if prefetch else 'miss')
+
     print(f"\n=== Loading episode {index} with primary={primary} ===")
-    
+
     zh_blocks = []
-    if match.get('zh_sub'):
-        path = find_file(match['zh_sub'], ZH_DIR)
-        if path:
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if path.endswith('.ass'):
-                        zh_blocks = parse_ass(content)
-                    else:
-                        zh_blocks = parse_srt(content)
-                    print(f"Loaded {len(zh_blocks)} Chinese blocks")
-            except UnicodeDecodeError:
-                try:
-                    with open(path, 'r', encoding='gbk', errors='ignore') as f:
-                        content = f.read()
-                        if path.endswith('.ass'):
-                            zh_blocks = parse_ass(content)
-                        else:
-                            zh_blocks = parse_srt(content)
-                except:
-                    pass
+    if zh_path:
+        zh_blocks = load_subtitle_blocks(proj, 'zh', zh_path)
+        print(f"Loaded {len(zh_blocks)} Chinese blocks")
 
     en_blocks = []
-    if match.get('en_sub'):
-        path = find_file(match['en_sub'], EN_DIR)
-        if path:
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if path.endswith('.ass'):
-                        en_blocks = parse_ass(content)
-                    else:
-                        en_blocks = parse_srt(content)
-                    print(f"Loaded {len(en_blocks)} Foreign blocks")
-            except UnicodeDecodeError:
-                try:
-                    with open(path, 'r', encoding='gbk', errors='ignore') as f:
-                        content = f.read()
-                        if path.endswith('.ass'):
-                            en_blocks = parse_ass(content)
-                        else:
-                            en_blocks = parse_srt(content)
-                except:
-                    pass
+    if en_path:
+        en_blocks = load_subtitle_blocks(proj, 'en', en_path)
+        print(f"Loaded {len(en_blocks)} Foreign blocks")
+
+    # 外语轨道整体偏移或漂移时先映射到中文时间轴，否则按时间合并会错位
+    alignment = episode_alignment(proj, index, stamp, zh_blocks, en_blocks)
+    if alignment and alignment['apply']:
+        print(f"Aligning foreign track: offset {alignment['offset_ms']} ms, drift {alignment['drift_ppm']} ppm")
     
     # Merge blocks by time instead of index
-    merged_blocks = merge_blocks_by_time(zh_blocks, en_blocks, primary=primary)
+    with span('merge', mode=primary):
+        merged_blocks = merge_blocks_by_time(zh_blocks, align_blocks(en_blocks, alignment), primary=primary)
     print(f"Merged to {len(merged_blocks)} blocks")
-                    
+
+    entry = episode_entry(stamp, merged_blocks, proj.episode_version(index))
+    proj.store_episode(key, entry)
+    return entry
+
+def warm_season(proj: Project, progress):
+    """
+    Align and merge every matched episode in a process pool (see warmup.py)
+
+    Files not in the project database yet are decoded and parsed by the
+    workers; files already imported (e.g. by the upload's index_subtitles job)
+    are read from the database here and only aligned and merged there. The
+    first MERGED_CACHE_SIZE episodes go into the merged cache for the orders in
+    WARMUP_PRIMARIES; zh-primary pairs also feed the translation memory.
+    """
+    matches = list(proj.matches)
+    paths, stamps, stats, jobs = {}, {}, {}, {}
+    parsed = 0
+    for i, m in enumerate(matches):
+        zh_path, en_path, stamp = episode_stamp(proj, m)
+        if not zh_path and not en_path:
+            continue
+        paths[i] = (zh_path, en_path)
+        stamps[i] = stamp
+        sources = []
+        for path in (zh_path, en_path):
+            if not path:
+                sources.append(None)
+                continue
+            stats[path] = os.stat(path)
+            cached = proj.db.file_cues(path, stats[path])
+            # 已入库的文件直接交出条目，未入库的交给子进程解析
+            sources.append(cached[0] if cached is not None else path)
+            parsed += cached is None
+        jobs[i] = tuple(sources)
+
+    with span('warmup', episodes=len(jobs)):
+        for i, result in prepare_episodes(jobs, WARMUP_PRIMARIES, progress=progress):
+            zh_path, en_path = paths[i]
+            with proj.episode_lock(i):
+                # 预热期间重新匹配或修改了文件：结果已过时，留给正常加载
+                if i >= len(proj.matches) or episode_stamp(proj, proj.matches[i])[2] != stamps[i]:
+                    continue
+                for lang, path in (('zh', zh_path), ('en', en_path)):
+                    if result[lang] is not None:
+                        proj.db.store_file(proj.id, lang, path, stats[path], *result[lang])
+                proj.store_alignment(i, stamps[i], result['alignment'])
+                if i < MERGED_CACHE_SIZE:
+                    for primary, blocks in result['merged'].items():
+                        proj.store_episode((i, primary), episode_entry(stamps[i], blocks, proj.episode_version(i)))
+            if zh_path and en_path:
+                pairs = [(b['zh_text'], b['en_text']) for b in result['merged']['zh']
+                         if b['zh_text'].strip() and b['en_text'].strip()]
+                proj.tm.replace_episode(i, stamps[i], pairs)
+    print(f"Warm-up: merged {len(jobs)} of {len(matches)} episodes, parsed {parsed} files (project {proj.id})")
+    progress('done', episodes=len(matches), merged=len(jobs), parsed=parsed)
+
+def episode_alignment(proj: Project, index: int, stamp, zh_blocks, en_blocks):
+    """Offset/drift estimate of an episode's foreign track (see track_align.py), cached per file stamp"""
+    if not zh_blocks or not en_blocks:
+        return None
+    found, estimate = proj.cached_alignment(index, stamp)
+    if not found:
+        with span('align'):
+            estimate = estimate_alignment(zh_blocks, en_blocks)
+        proj.store_alignment(index, stamp, estimate)
+    return estimate
+
+def prefetch_episode(proj: Project, index: int, primary: str):
+    # 与修改操作互斥，避免用旧文件的合并结果覆盖刚修改过的视图
+    with proj.episode_lock(index):
+        if index < len(proj.matches):
+            load_merged_episode(proj, index, primary, prefetch=True)
+
+def prefetch_neighbours(proj: Project, index: int, primary: str):
+    """Queue background loads of the episodes next to index"""
+    for step in PREFETCH_NEIGHBOURS:
+        neighbour = index + step
+        if 0 <= neighbour < len(proj.matches):
+            prefetcher.submit((proj.id, neighbour, primary), prefetch_episode, proj, neighbour, primary)
+
+def episode_entry(stamp, blocks, version, patched=False):
     return {
-        "blocks": merged_blocks,
-        "video_path": match.get('video'),
-        "zh_file": match.get('zh_sub'),
-        "en_file": match.get('en_sub')
+        'stamp': stamp,
+        'version': version,
+        'patched': patched,
+        'blocks': blocks,
+        'starts': [time_to_seconds(b['start']) for b in blocks],
+        'ends': [time_to_seconds(b['end']) for b in blocks],
     }
 
+def time_window(entry, start: Optional[float], end: Optional[float]):
+    """Index range [lo, hi) of blocks overlapping the time window start..end (seconds)"""
+    starts, ends = entry['starts'], entry['ends']
+    lo, hi = 0, len(starts)
+    if end is not None:
+        hi = bisect_right(starts, end)
+    if start is not None:
+        lo = bisect_left(starts, start)
+        # 向前包含仍在播放中的字幕
+        while lo > 0 and ends[lo - 1] > start:
+            lo -= 1
+    return lo, max(lo, hi)
+
+@app.get("/api/episode/{index}")
+async def get_episode(index: int, primary: str = 'zh', offset: int = 0, limit: Optional[int] = None,
+                      start: Optional[float] = None, end: Optional[float] = None,
+                           proj: Project = Depends(get_project)):
+    """
+    Get episode data with merged subtitles
+    
+    Args:
+        index: Episode index
+        primary: 'zh' or 'en' - which language to use as primary ordering
+        offset, limit: block range to return (all blocks by default)
+        start, end: only blocks overlapping this time window (seconds);
+                    offset/limit then apply within the window
+    """
+    if index >= len(proj.matches):
+        raise HTTPException(status_code=404, detail="Episode not found")
+    if offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=400, detail="offset and limit must not be negative")
+    
+    match = proj.matches[index]
+    entry = load_merged_episode(proj, index, primary)
+    merged_blocks = entry['blocks']
+
+    lo, hi = 0, len(merged_blocks)
+    if start is not None or end is not None:
+        lo, hi = time_window(entry, start, end)
+    lo = min(hi, lo + offset)
+    if limit is not None:
+        hi = min(hi, lo + limit)
+    
+    with span('serialize'):
+        body = json.dumps({
+            "blocks": merged_blocks[lo:hi],
+            "offset": lo,
+            "total": len(merged_blocks),
+            "version": proj.episode_version(index),
+            "alignment": proj.cached_alignment(index, entry['stamp'])[1],
+            "video_path": match.get('video'),
+            "zh_file": match.get('zh_sub'),
+            "en_file": match.get('en_sub')
+        }, ensure_ascii=False)
+    # 首屏请求时开始准备相邻剧集
+    if offset == 0 and start is None and end is None:
+        prefetch_neighbours(proj, index, primary)
+    return Response(content=body, media_type="application/json")
+
 @app.post("/api/save")
-async def save_subtitle(req: SaveRequest):
-    search_dir = ZH_DIR if req.type == 'zh' else EN_DIR
-    path = find_file(req.filename, search_dir)
+async def save_subtitle(req: SaveRequest, proj: Project = Depends(get_project)):
+    search_dir = proj.subtitle_dir(req.type)
+    path = proj.find_subtitle(req.type, req.filename)
     
     if not path:
         path = os.path.join(search_dir, req.filename)
         
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(req.content)
+    with proj.file_lock(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(req.content)
         
     return {"message": "Saved"}
 
 @app.post("/api/update-block")
-async def update_block(req: UpdateBlockRequest):
+async def update_block(req: UpdateBlockRequest, proj: Project = Depends(get_project)):
     """Update a single subtitle block"""
-    if req.episode_index >= len(current_matches):
+    if req.episode_index >= len(proj.matches):
         raise HTTPException(status_code=404, detail="Episode not found")
     
-    match = current_matches[req.episode_index]
+    match = proj.matches[req.episode_index]
     file_key = 'zh_sub' if req.type == 'zh' else 'en_sub'
     
     if not match.get(file_key):
         raise HTTPException(status_code=404, detail="Subtitle file not found")
     
-    search_dir = ZH_DIR if req.type == 'zh' else EN_DIR
-    path = find_file(match[file_key], search_dir)
+    path = proj.find_subtitle(req.type, match[file_key])
     
     if not path:
         raise HTTPException(status_code=404, detail="File not found on disk")
     
-    # Read existing content
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except UnicodeDecodeError:
-        with open(path, 'r', encoding='gbk', errors='ignore') as f:
-            content = f.read()
-    
-    blocks = parse_srt(content)
-    
-    # Update the specific block
-    if req.block_index < len(blocks):
+    # 同一文件的读改写串行执行，其他文件和其他项目不受影响
+    with proj.file_lock(path):
+        # Read existing content
+        content = read_subtitle_file(path)
+        
+        blocks = parse_subtitle(path, content)
+        
+        # Update the specific block
+        if req.block_index >= len(blocks):
+            raise HTTPException(status_code=404, detail="Block index out of range")
+
         blocks[req.block_index]['text'] = req.text
         # Update time if provided
         if req.start is not None:
@@ -394,78 +670,365 @@ async def update_block(req: UpdateBlockRequest):
         if req.end is not None:
             blocks[req.block_index]['end'] = req.end
         
-        # Write back
-        new_content = blocks_to_srt(blocks)
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-        
-        return {"message": "Block updated"}
-    else:
-        raise HTTPException(status_code=404, detail="Block index out of range")
+        # Write back in the file's own format
+        header = ass_header(content) if path.endswith('.ass') else None
+        with span('write', format=serializer_for_path(path).name):
+            write_file(path, blocks, header)
+    version = proj.bump_episode(req.episode_index)
+    
+    return {"message": "Block updated", "version": version}
+
+def language_file_path(proj: Project, match, lang):
+    """Path an episode's subtitle file of one language is saved to (rewritten in its own format)"""
+    return proj.find_subtitle(lang, match[f'{lang}_sub'])
+
+def subtitle_header(proj: Project, path):
+    """ASS header to keep when rewriting path (None for SRT files)"""
+    if not path.endswith('.ass'):
+        return None
+    header = proj.db.file_header(path)
+    if header is None and os.path.exists(path):
+        header = ass_header(read_subtitle_file(path))
+    return header
+
+def save_language_blocks(proj: Project, index: int, lang: str, path: str, blocks: List[Dict]) -> int:
+    """Rewrite one subtitle file of an episode in its own format (SRT or ASS); returns the new version"""
+    with span('write', format=serializer_for_path(path).name), proj.file_lock(path):
+        header = subtitle_header(proj, path)
+        write_file(path, blocks, header)
+        proj.db.store_file(proj.id, lang, path, os.stat(path), blocks, header)
+    print(f"Saved {len(blocks)} blocks to {path}")
+    return proj.bump_episode(index)
 
 @app.post("/api/save-all-blocks")
-async def save_all_blocks(req: SaveAllBlocksRequest):
+async def save_all_blocks(req: SaveAllBlocksRequest, proj: Project = Depends(get_project)):
     """Save all blocks for an episode (used when splitting/reorganizing)"""
-    if req.episode_index >= len(current_matches):
+    if req.episode_index >= len(proj.matches):
         raise HTTPException(status_code=404, detail="Episode not found")
     
-    match = current_matches[req.episode_index]
+    match = proj.matches[req.episode_index]
     file_key = 'zh_sub' if req.type == 'zh' else 'en_sub'
     
     if not match.get(file_key):
         raise HTTPException(status_code=404, detail="Subtitle file not found")
     
-    search_dir = ZH_DIR if req.type == 'zh' else EN_DIR
-    path = find_file(match[file_key], search_dir)
-    
+    path = language_file_path(proj, match, req.type)
     if not path:
         raise HTTPException(status_code=404, detail="File not found on disk")
     
-    # Ensure output path is .srt format
-    if not path.endswith('.srt'):
-        # Change extension to .srt
-        base_path = os.path.splitext(path)[0]
-        path = base_path + '.srt'
-    
-    # Convert blocks to SRT format
     # The blocks from frontend have: index, start, end, zh_text, en_text
-    # We need to extract the appropriate text field and reindex
-    srt_blocks = []
-    for i, block in enumerate(req.blocks):
-        text_field = 'zh_text' if req.type == 'zh' else 'en_text'
-        text = block.get(text_field, block.get('text', ''))
-        
-        # Only include blocks that have content
-        if text and text.strip():
-            srt_blocks.append({
-                'index': len(srt_blocks) + 1,  # Sequential indexing starting from 1
-                'start': block['start'],
-                'end': block['end'],
-                'text': text
-            })
-    
-    # Write to file in SRT format
-    new_content = blocks_to_srt(srt_blocks)
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(new_content)
-    
-    print(f"Saved {len(srt_blocks)} blocks to {path}")
+    # Only blocks with text in this language are kept, reindexed from 1
+    srt_blocks = language_blocks(req.blocks, req.type)
+    version = save_language_blocks(proj, req.episode_index, req.type, path, srt_blocks)
     
-    return {"message": "All blocks saved", "count": len(srt_blocks), "path": path}
-    
-    return {"message": "All blocks saved"}
+    return {"message": "All blocks saved", "count": len(srt_blocks), "path": path, "version": version}
+
+def patch_episode_blocks(proj: Project, index: int, primary: str, base_version: int, ops: List[Dict],
+                         langs: Optional[List[str]] = None, source: Optional[str] = None, approve: bool = True):
+    """
+    Apply ordered edit ops to the merged episode view loaded with the same primary
+
+    Shared by the HTTP patch route and the WebSocket channel. Ops are applied
+    all-or-nothing; only the files of languages they touch are rewritten.
+    With approve, foreign text saved by edit ops becomes the approved
+    translation of its Chinese line in the translation memory.
+
+    Raises:
+        HTTPException: 404 for unknown episodes or files, 409 if base_version is
+            stale, 400 for invalid ops
+    """
+    if index < 0 or index >= len(proj.matches):
+        raise HTTPException(status_code=404, detail="Episode not found")
+    match = proj.matches[index]
+
+    with proj.episode_lock(index):
+        entry = load_merged_episode(proj, index, primary)
+        current = proj.episode_version(index)
+        if base_version != current:
+            raise HTTPException(status_code=409, detail={"message": "Episode changed since it was loaded", "version": current})
+
+        with span('patch', ops=len(ops)):
+            try:
+                blocks, affected = apply_ops(entry['blocks'], ops)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        # 先确定所有目标文件，逐个写入临时文件后再统一替换
+        targets = []
+        for lang in LANGS:
+            if lang not in affected or (langs is not None and lang not in langs):
+                continue
+            if not match.get(f'{lang}_sub'):
+                raise HTTPException(status_code=400, detail=f"Episode has no {lang} subtitle file")
+            path = language_file_path(proj, match, lang)
+            if not path:
+                raise HTTPException(status_code=404, detail=f"{lang} subtitle file not found on disk")
+            targets.append((lang, path, language_blocks(blocks, lang)))
+
+        with ExitStack() as stack, span('write'):
+            for lang, path, lang_blocks in targets:
+                stack.enter_context(proj.file_lock(path))
+            headers = {}
+            for lang, path, lang_blocks in targets:
+                headers[path] = subtitle_header(proj, path)
+                with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                    serializer_for_path(path).write(f, lang_blocks, headers[path])
+            for lang, path, lang_blocks in targets:
+                os.replace(path + '.tmp', path)
+            # 写入的字幕同时更新数据库，下次加载无需重新解析
+            for lang, path, lang_blocks in targets:
+                proj.db.store_file(proj.id, lang, path, os.stat(path), lang_blocks, headers[path])
+        if approve and 'en' in [lang for lang, _, _ in targets]:
+            approve_edits(proj, blocks, ops)
+
+        version = proj.bump_episode(index) if targets else current
+        _, _, stamp = episode_stamp(proj, match)
+        proj.store_episode((index, primary), episode_entry(stamp, blocks, version, patched=bool(targets) or entry['patched']))
+
+    inc('episode_patch_ops_total', len(ops))
+    written = [lang for lang, _, _ in targets]
+    if written:
+        # 其他打开同一集的页面据此提示重新加载
+        bus.publish(proj.id, {"type": "episode_changed", "episode": index, "version": version,
+                              "langs": written, "source": source})
+    return {"version": version, "count": len(blocks), "written": written}
+
+def approve_edits(proj: Project, blocks: List[Dict], ops: List[Dict]):
+    """Record the foreign text of edited blocks as approved translations"""
+    # 拆分、合并、插入、删除会移动后续块的位置，此时无法确定编辑操作对应的块
+    if any(op.get('op') not in ('edit', 'retime') for op in ops):
+        return
+    load_tm_approved(proj)
+    approved = {}
+    for op in ops:
+        if op.get('op') == 'edit' and 'en_text' in op:
+            block = blocks[op['index']]
+            key = proj.tm.approve(block.get('zh_text', ''), block.get('en_text', ''))
+            if key:
+                approved[key] = (key, block['zh_text'].strip(), (block.get('en_text') or '').strip())
+    if approved:
+        proj.db.approve_translations(proj.id, list(approved.values()))
+
+@app.post("/api/episode/{index}/patch")
+async def patch_episode(index: int, req: PatchRequest, primary: str = 'zh', client: Optional[str] = None,
+                        proj: Project = Depends(get_project)):
+    """
+    Apply ordered edit ops to the merged episode view loaded with the same primary
+
+    A base_version other than the current one is rejected with 409.
+    """
+    return await run_in_threadpool(patch_episode_blocks, proj, index, primary, req.base_version, req.ops, req.langs,
+                                   source=client)
+
+def retime_episode(proj: Project, index: int, steps, langs, from_ms=None, to_ms=None, source=None):
+    """
+    Retime the subtitle files of one episode, one atomic write per file
+
+    Returns:
+        dict with the new version, the languages written and the cues changed
+    """
+    match = proj.matches[index]
+    with proj.episode_lock(index):
+        targets = []
+        changed = 0
+        for lang in langs:
+            name = match.get(f'{lang}_sub')
+            source_path = proj.find_subtitle(lang, name) if name else None
+            if not source_path:
+                continue
+            with span('retime'):
+                blocks, starts, ends, count = retime_blocks(
+                    load_subtitle_blocks(proj, lang, source_path), steps, from_ms, to_ms)
+            if count:
+                targets.append((lang, language_file_path(proj, match, lang), blocks, starts, ends))
+                changed += count
+
+        for lang, path, blocks, starts, ends in targets:
+            with proj.file_lock(path), span('write'):
+                header = subtitle_header(proj, path)
+                write_file(path, blocks, header)
+                st = os.stat(path)
+                # 文本未变，只更新数据库中的时间（全文索引不动）
+                if not proj.db.update_times(path, st, blocks, starts.tolist(), ends.tolist()):
+                    proj.db.store_file(proj.id, lang, path, st, blocks, header)
+        version = proj.bump_episode(index) if targets else proj.episode_version(index)
+
+    written = [lang for lang, *_ in targets]
+    if written:
+        bus.publish(proj.id, {"type": "episode_changed", "episode": index, "version": version,
+                              "langs": written, "source": source})
+    return {"index": index, "version": version, "langs": written, "cues": changed}
+
+def retime_season(proj: Project, req: RetimeRequest, steps, progress, source=None):
+    indices = range(len(proj.matches)) if req.episodes is None else req.episodes
+    results = []
+    for done, index in enumerate(indices, 1):
+        results.append(retime_episode(proj, index, steps, req.langs, req.from_ms, req.to_ms, source))
+        progress('write', done=done, total=len(indices))
+    changed = sum(r['cues'] for r in results)
+    progress('done', cues=changed)
+    return {"episodes": results, "cues": changed}
+
+@app.post("/api/retime")
+async def retime(req: RetimeRequest, client: Optional[str] = None, proj: Project = Depends(get_project)):
+    """
+    Shift, scale, convert the frame rate of, or snap the gaps of one episode, a
+    selection of episodes or the whole season (see retime.py for the ops)
+    """
+    try:
+        steps = validate_ops(req.ops)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not req.langs or any(lang not in LANGS for lang in req.langs):
+        raise HTTPException(status_code=400, detail="langs must be zh and/or en")
+    if req.episodes is not None and any(not 0 <= i < len(proj.matches) for i in req.episodes):
+        raise HTTPException(status_code=404, detail="Episode not found")
+    progress = bus.progress(proj.id, 'retime', client)
+    return await run_in_threadpool(retime_season, proj, req, steps, progress, client)
+
+def align_season(proj: Project, req: AlignRequest, progress, source=None):
+    """
+    Offset/drift estimates of the selected episodes; with req.write, foreign
+    files whose estimate applies are retimed onto the Chinese timeline
+    """
+    indices = range(len(proj.matches)) if req.episodes is None else req.episodes
+    results = []
+    for done, index in enumerate(indices, 1):
+        match = proj.matches[index]
+        zh_path, en_path, stamp = episode_stamp(proj, match)
+        zh_blocks = load_subtitle_blocks(proj, 'zh', zh_path) if zh_path else []
+        en_blocks = load_subtitle_blocks(proj, 'en', en_path) if en_path else []
+        estimate = episode_alignment(proj, index, stamp, zh_blocks, en_blocks)
+        item = {"index": index, "episode": match.get('episode'), "alignment": estimate, "written": False}
+        if req.write and estimate and estimate['apply']:
+            steps = alignment_steps(estimate['offset_ms'], estimate['drift_ppm'] / 1_000_000)
+            item["written"] = bool(retime_episode(proj, index, steps, ['en'], source=source)['langs'])
+        results.append(item)
+        progress('align', done=done, total=len(indices))
+    misaligned = sum(1 for r in results if r['alignment'] and r['alignment']['apply'])
+    progress('done', misaligned=misaligned)
+    return {"episodes": results, "misaligned": misaligned, "written": sum(r['written'] for r in results)}
+
+@app.post("/api/align")
+async def align(req: AlignRequest, client: Optional[str] = None, proj: Project = Depends(get_project)):
+    """
+    Detect the global offset and linear drift of the foreign subtitles against
+    the Chinese ones (FFT cross-correlation, see track_align.py)
 
+    Episode views already merge with the estimate applied; write=true also
+    retimes the foreign files so every other tool sees aligned times.
+    """
+    if req.episodes is not None and any(not 0 <= i < len(proj.matches) for i in req.episodes):
+        raise HTTPException(status_code=404, detail="Episode not found")
+    progress = bus.progress(proj.id, 'align', client)
+    return await run_in_threadpool(align_season, proj, req, progress, client)
+
+def approved_parts(proj: Project, content: str, sources: List[str]) -> Dict[int, str]:
+    """Subtitle number -> approved translation for the SRT blocks whose Chinese source has one"""
+    # 已确认译文的块原样保留，不再交给模型
+    load_tm_approved(proj)
+    keep = {}
+    for part, zh_text in zip(srt_parts(content), sources):
+        approved = proj.tm.approved(zh_text)
+        if approved and part_number(part) is not None:
+            keep[part_number(part)] = approved
+    return keep
 
 @app.post("/api/correct")
-async def correct_subtitle(req: CorrectRequest):
-    corrected = correct_text_with_gpt(req.content, req.rules)
+async def correct_subtitle(req: CorrectRequest, client: Optional[str] = None, proj: Project = Depends(get_project)):
+    progress = bus.progress(proj.id, 'correct', client)
+    keep = await run_in_threadpool(approved_parts, proj, req.content, req.sources) if req.sources else None
+    try:
+        corrected = await run_in_threadpool(correct_text_with_gpt, req.content, req.rules, progress, keep, req.stream)
+    except FileNotFoundError as e:
+        progress('failed', error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
     if corrected:
+        progress('done')
         return {"content": corrected}
     else:
+        progress('failed', error="Correction failed")
         raise HTTPException(status_code=500, detail="Correction failed")
 
+def handle_socket_message(proj: Project, client: str, msg) -> dict:
+    """Reply to one client message on the /ws channel"""
+    if not isinstance(msg, dict):
+        return {"type": "ack", "id": None, "ok": False, "status": 400, "error": "message must be an object"}
+    kind = msg.get('type')
+    inc('ws_messages_total', type=str(kind))
+    reply = {"type": "ack", "id": msg.get('id')}
+    if kind == 'ping':
+        return {"type": "pong", "id": msg.get('id')}
+    if kind == 'patch':
+        episode, ops, langs = msg.get('episode'), msg.get('ops'), msg.get('langs')
+        if not isinstance(episode, int) or not isinstance(ops, list) or not isinstance(msg.get('base_version'), int):
+            return {**reply, "ok": False, "status": 400, "error": "patch needs integer episode and base_version and an ops list"}
+        if langs is not None and (not isinstance(langs, list) or any(lang not in ('zh', 'en') for lang in langs)):
+            return {**reply, "ok": False, "status": 400, "error": "langs must be a list of 'zh' and 'en'"}
+        try:
+            result = patch_episode_blocks(proj, episode, msg.get('primary') or 'zh', msg['base_version'], ops,
+                                          langs, source=client)
+        except HTTPException as e:
+            return {**reply, "ok": False, "status": e.status_code, "error": e.detail}
+        except (ValueError, TypeError) as e:
+            # 格式不对的消息只拒绝这一条，不能断开整个连接
+            return {**reply, "ok": False, "status": 400, "error": str(e)}
+        return {**reply, "ok": True, **result}
+    return {**reply, "ok": False, "status": 400, "error": f"unknown message type {kind!r}"}
+
+@app.websocket("/ws")
+async def websocket_channel(websocket: WebSocket, project: str = DEFAULT_PROJECT, client: Optional[str] = None):
+    """
+    One connection per page: edit ops with acks, job progress and file change events
+
+    Client messages:
+        {"id", "type": "patch", "episode", "primary", "base_version", "ops", "langs"?}
+        {"id", "type": "ping"}
+    Server messages:
+        {"type": "hello", "client", "project"}
+        {"type": "ack", "id", "ok", "version", "count", "written"} or {"type": "ack", "id", "ok": false, "status", "error"}
+        {"type": "progress", "job": "match"|"correct", "stage", "source", ...}
+        {"type": "episode_changed", "episode", "version", "langs", "source"}
+        {"type": "files_changed", "lang", "files"}
+    """
+    try:
+        proj = projects.get(project)
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    client = client or uuid.uuid4().hex
+    sub = bus.subscribe(proj)
+    send_lock = asyncio.Lock()
+
+    async def send(message):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def forward_events():
+        while True:
+            await send(await sub.queue.get())
+
+    forwarder = asyncio.create_task(forward_events())
+    try:
+        await send({"type": "hello", "client": client, "project": proj.id})
+        while True:
+            text = await websocket.receive_text()
+            try:
+                msg = json.loads(text)
+            except ValueError:
+                await send({"type": "ack", "id": None, "ok": False, "status": 400, "error": "invalid JSON"})
+                continue
+            await send(await run_in_threadpool(handle_socket_message, proj, client, msg))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        forwarder.cancel()
+        bus.unsubscribe(sub)
+
 @app.get("/video/stream")
-async def video_stream(path: str, request: Request):
+async def video_stream(path: str, request: Request, proj: Project = Depends(get_project)):
+    video_base_path = proj.video_base_path
     if not video_base_path:
         raise HTTPException(status_code=400, detail="Video path not set")
         
@@ -477,7 +1040,10 @@ async def video_stream(path: str, request: Request):
         else:
             raise HTTPException(status_code=404, detail="Video not found")
             
-    file_size = os.path.getsize(full_path)
+    st = os.stat(full_path)
+    file_size = st.st_size
+    with span('video_layout'):
+        layout = video_layouts.get(full_path, st)
     range_header = request.headers.get("range")
     
     start = 0
@@ -487,8 +1053,12 @@ async def video_stream(path: str, request: Request):
         range_header = range_header.strip().lower().replace("bytes=", "")
         parts = range_header.split("-")
         try:
-            start = int(parts[0]) if parts[0] else 0
-            end = int(parts[1]) if len(parts) > 1 and parts[1] else file_size - 1
+            if not parts[0] and len(parts) > 1 and parts[1]:
+                # bytes=-N：文件末尾的 N 字节
+                start = max(0, file_size - int(parts[1]))
+            else:
+                start = int(parts[0]) if parts[0] else 0
+                end = int(parts[1]) if len(parts) > 1 and parts[1] else file_size - 1
         except ValueError:
             pass
             
@@ -496,36 +1066,389 @@ async def video_stream(path: str, request: Request):
         start = file_size - 1
     if end >= file_size:
         end = file_size - 1
-        
-    chunk_size = end - start + 1
     
-    # Limit chunk size to avoid memory issues
-    MAX_CHUNK = 1024 * 1024 * 5 # 5MB
-    if chunk_size > MAX_CHUNK:
-        chunk_size = MAX_CHUNK
-        end = start + chunk_size - 1
-        
-    with open(full_path, "rb") as video:
-        video.seek(start)
-        data = video.read(chunk_size)
+    moov = layout.box('moov') if layout.moov is not None else None
+    mdat = layout.box('mdat')
+    with span('video_read'):
+        if moov is not None and moov.offset <= start < moov.end:
+            # moov 整段从内存返回，不受单次块大小限制
+            end = min(end, moov.end - 1)
+            data = layout.moov[start - moov.offset:end - moov.offset + 1]
+            inc('video_moov_cache_total', status='hit')
+        else:
+            # Limit chunk size to avoid memory issues
+            MAX_CHUNK = 1024 * 1024 * 5 # 5MB
+            end = min(end, start + MAX_CHUNK - 1)
+            if layout.moov_after_mdat and start < mdat.offset + mdat.header:
+                # moov 在文件末尾：只返回到 mdat 头部，播放器据此直接请求 moov
+                end = min(end, mdat.offset + mdat.header - 1)
+            
+            # 文件开头（首帧、预取的下一集）从内存返回
+            head = video_heads.get(full_path, st) if end < video_heads.head_bytes else None
+            if head is None and start == 0:
+                head = video_heads.load(full_path, st)
+                inc('video_head_cache_total', status='miss')
+            elif head is not None:
+                inc('video_head_cache_total', status='hit')
+            if head is not None and end < len(head):
+                data = head[start:end + 1]
+            else:
+                with open(full_path, "rb") as video:
+                    video.seek(start)
+                    data = video.read(end - start + 1)
+    inc('video_bytes_streamed_total', len(data))
         
     headers = {
-        "Content-Range": f"bytes {start}-{end}/{file_size}",
+        "Content-Range": f"bytes {start}-{start + len(data) - 1}/{file_size}",
         "Accept-Ranges": "bytes",
-        "Content-Length": str(chunk_size),
-        "Content-Type": "video/mp4",
+        "Content-Length": str(len(data)),
+        "Content-Type": layout.content_type,
     }
     
     return Response(content=data, status_code=206, headers=headers)
 
+@app.get("/api/metrics")
+async def get_metrics(format: str = 'prometheus'):
+    """Timings and counters in Prometheus text format, or a JSON snapshot with ?format=json"""
+    if format == 'json':
+        return metrics.snapshot()
+    return Response(content=metrics.prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/profiles")
+async def get_profiles():
+    """Recent request profiles"""
+    return list_profiles()
+
+@app.get("/api/profiles/{filename}")
+async def download_profile(filename: str):
+    path = profile_file_path(filename)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=filename)
+
+@app.get("/api/projects")
+async def get_projects():
+    """IDs of all known projects"""
+    return projects.list()
+
+def export_source(proj: Project, index: int, lang: str, serializer, primary: str = 'zh'):
+    """
+    Blocks, ASS header and file name an episode is exported from
+
+    Bilingual formats use the merged view (header of the Chinese file); others
+    the stored cues of one language, renumbered from 1.
+
+    Returns:
+        (blocks, header, name), or None if the episode has no such file
+    """
+    match = proj.matches[index]
+    if serializer.bilingual:
+        if not match.get('zh_sub') and not match.get('en_sub'):
+            return None
+        zh_path = proj.find_subtitle('zh', match['zh_sub']) if match.get('zh_sub') else None
+        header = subtitle_header(proj, zh_path) if zh_path else None
+        return (load_merged_episode(proj, index, primary)['blocks'], header,
+                match.get('zh_sub') or match.get('en_sub'))
+    name = match.get(f'{lang}_sub')
+    path = proj.find_subtitle(lang, name) if name else None
+    if not path:
+        return None
+    blocks = [dict(b, index=i + 1) for i, b in enumerate(load_subtitle_blocks(proj, lang, path))]
+    return blocks, subtitle_header(proj, path), name
+
+def export_serializer(lang: str, format: str):
+    """
+    Raises:
+        HTTPException: 400 for unknown languages or formats
+    """
+    if lang not in LANGS:
+        raise HTTPException(status_code=400, detail="lang must be zh/en")
+    try:
+        return get_serializer(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def attachment(filename: str) -> Dict[str, str]:
+    return {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"}
+
+@app.get("/api/episode/{index}/export")
+async def export_episode_file(index: int, lang: str = 'en', format: str = 'srt', primary: str = 'zh',
+                              proj: Project = Depends(get_project)):
+    """Export an episode in any registered format (see serializers.SERIALIZERS) from the stored cues"""
+    serializer = export_serializer(lang, format)
+    if index < 0 or index >= len(proj.matches):
+        raise HTTPException(status_code=404, detail="Episode not found")
+    source = await run_in_threadpool(export_source, proj, index, lang, serializer, primary)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Subtitle file not found")
+    blocks, header, name = source
+    buf = io.StringIO()
+    with span('serialize', format=format):
+        serializer.write(buf, blocks, header)
+    return Response(content=buf.getvalue(), media_type=serializer.media_type,
+                    headers=attachment(os.path.splitext(name)[0] + serializer.extension))
+
+def export_season(proj: Project, serializer, lang: str, primary: str = 'zh'):
+    """
+    Write every matched episode in one format into a zip under the project root
+
+    Each file is streamed straight into its zip entry, so only one episode is
+    held in memory at a time.
+
+    Returns:
+        (archive path, number of files)
+    """
+    label = serializer.name if serializer.bilingual else f"{lang}_{serializer.name}"
+    archive = os.path.join(proj.root, f"export_{label}.zip")
+    tmp = f"{archive}.{uuid.uuid4().hex}.tmp"
+    names = set()
+    with span('export_season', format=serializer.name), zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for index in range(len(proj.matches)):
+            source = export_source(proj, index, lang, serializer, primary)
+            if source is None:
+                continue
+            blocks, header, name = source
+            arcname = os.path.splitext(name)[0] + serializer.extension
+            if arcname in names:
+                arcname = f"{index + 1:02d}_{arcname}"
+            names.add(arcname)
+            with io.TextIOWrapper(zf.open(arcname, 'w'), encoding='utf-8') as f:
+                serializer.write(f, blocks, header)
+    os.replace(tmp, archive)
+    return archive, len(names)
+
+@app.get("/api/export/season")
+async def export_season_file(format: str = 'srt', lang: str = 'en', primary: str = 'zh',
+                             proj: Project = Depends(get_project)):
+    """Zip of every matched episode in one registered format (bilingual formats ignore lang)"""
+    serializer = export_serializer(lang, format)
+    archive, count = await run_in_threadpool(export_season, proj, serializer, lang, primary)
+    if not count:
+        raise HTTPException(status_code=404, detail="No subtitle files to export")
+    return FileResponse(archive, filename=os.path.basename(archive))
+
+@app.get("/api/export/formats")
+async def export_formats():
+    """Registered export formats"""
+    return [{"name": s.name, "extension": s.extension, "bilingual": s.bilingual} for s in SERIALIZERS.values()]
+
+def search_season(proj: Project, query: str, lang: str, regex: bool, limit: int):
+    """
+    Cues of all matched episodes matching query, ordered by episode and time
+
+    Files changed since they were imported are imported again first, so saves made
+    outside the editor are found too.
+    """
+    targets = {}  # 字幕文件路径 -> (剧集序号, 语言)
+    with span('search_index'):
+        for i, m in enumerate(proj.matches):
+            for l in LANGS:
+                name = m.get(f'{l}_sub')
+                if lang not in ('all', l) or not name:
+                    continue
+                path = proj.find_subtitle(l, name)
+                if not path:
+                    continue
+                if not proj.db.file_current(path, os.stat(path)):
+                    load_subtitle_blocks(proj, l, path)
+                targets[path] = (i, l)
+
+    expression = None if regex else build_query(query)
+    pattern = query if regex else (None if expression else fallback_pattern(query))
+    with span('search_query', mode='regex' if pattern else 'fts'):
+        rows = proj.db.search_cues(list(targets), expression, pattern)
+
+    results = []
+    for path, seq, idx, start_ms, end_ms, text in rows:
+        i, l = targets[path]
+        results.append({"episode_index": i, "episode": proj.matches[i].get('episode'), "lang": l,
+                        "cue": seq, "index": idx, "start_ms": start_ms, "end_ms": end_ms, "text": text})
+    results.sort(key=lambda r: (r["episode_index"], r["start_ms"], LANGS.index(r["lang"]), r["cue"]))
+    return {"results": results[:limit], "count": len(results), "truncated": len(results) > limit}
+
+@app.get("/api/search")
+async def search_subtitles(q: str, lang: str = 'all', mode: str = 'text', limit: int = 200,
+                           proj: Project = Depends(get_project)):
+    """
+    Search the cue text of every matched episode
+
+    mode=text supports "quoted phrases", prefix* terms and Chinese words (all terms
+    must occur in one cue); mode=regex matches a Python regular expression.
+    """
+    if lang not in ('all', *LANGS) or mode not in ('text', 'regex'):
+        raise HTTPException(status_code=400, detail="lang must be all/zh/en and mode text/regex")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty query")
+    if mode == 'regex':
+        try:
+            re.compile(q)
+        except re.error as e:
+            raise HTTPException(status_code=400, detail=f"Invalid regex: {e}")
+    return await run_in_threadpool(search_season, proj, q, lang, mode == 'regex', max(1, min(limit, 2000)))
+
+def lint_season(proj: Project, checks: tuple, progress):
+    """
+    Lint report of all matched episodes
+
+    Episodes whose files and settings are unchanged since the last report reuse
+    their cached issues; the rest are checked in the lint process pool.
+    """
+    terms = profanity_terms(load_rules()) if 'profanity' in checks else []
+    profanity = profanity_pattern(terms)
+    matches = list(proj.matches)
+    keys, jobs, cached = {}, {}, {}
+    with span('lint_load'):
+        for i, m in enumerate(matches):
+            zh_path, en_path, stamp = episode_stamp(proj, m)
+            keys[i] = (stamp, checks, profanity)
+            issues = proj.cached_lint(i, keys[i])
+            if issues is not None:
+                cached[i] = issues
+                continue
+            zh_blocks = load_subtitle_blocks(proj, 'zh', zh_path) if zh_path else []
+            en_blocks = load_subtitle_blocks(proj, 'en', en_path) if en_path else []
+            # 与剧集视图一致：外语轨道先按缓存的偏移/漂移估计对齐，再检查未翻译条目
+            alignment = episode_alignment(proj, i, stamp, zh_blocks, en_blocks)
+            jobs[i] = (zh_blocks, en_blocks, alignment)
+            progress('load', done=i + 1, total=len(matches))
+
+    with span('lint_check'):
+        checked = lint_pool.run(jobs, checks, profanity, progress)
+    for i, issues in checked.items():
+        proj.store_lint(i, keys[i], issues)
+
+    report = []
+    summary = {c: {'warning': 0, 'error': 0} for c in checks}
+    for i, issues in sorted({**cached, **checked}.items()):
+        for issue in issues:
+            summary[issue['check']][issue['severity']] += 1
+            report.append({'episode_index': i, 'episode': matches[i].get('episode'), **issue})
+    progress('done', issues=len(report))
+    return {
+        'episodes': len(matches),
+        'checked': len(checked),
+        'cached': len(cached),
+        'thresholds': {'cps_warning': CPS_WARNING, 'cps_error': CPS_ERROR,
+                       'max_line_chars': MAX_LINE_CHARS, 'min_gap_ms': MIN_GAP_MS},
+        'profanity': terms,
+        'summary': summary,
+        'issues': report,
+    }
+
+@app.get("/api/lint")
+async def lint_report(checks: Optional[str] = None, client: Optional[str] = None,
+                      proj: Project = Depends(get_project)):
+    """
+    Quality report for the whole season: reading speed, line length, overlaps,
+    zero-length cues, tiny gaps, untranslated cues and profanity from rules.txt
+
+    Args:
+        checks: comma-separated subset of CHECKS (default all)
+    """
+    selected = tuple(c for c in CHECKS if checks is None or c in checks.split(','))
+    if not selected:
+        raise HTTPException(status_code=400, detail=f"checks must be a subset of {','.join(CHECKS)}")
+    progress = bus.progress(proj.id, 'lint', client)
+    try:
+        report = await run_in_threadpool(lint_season, proj, selected, progress)
+    except Exception as e:
+        print(f"ERROR in lint endpoint: {e}")
+        progress('failed', error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+    # 报告可能有数万条，直接序列化（不经过 jsonable_encoder），并且不占用事件循环
+    with span('serialize'):
+        body = await run_in_threadpool(partial(json.dumps, report, ensure_ascii=False))
+    return Response(content=body, media_type="application/json")
+
+def load_tm_approved(proj: Project):
+    if not proj.tm.approved_loaded:
+        proj.tm.load_approved(proj.db.tm_approved(proj.id))
+
+def sync_translation_memory(proj: Project):
+    """
+    Bring the project's translation memory up to date with the subtitle files
+
+    Only episodes whose files changed since the last sync are merged again.
+    """
+    load_tm_approved(proj)
+    matches = list(proj.matches)
+    updated = 0
+    with span('tm_sync'):
+        for i, m in enumerate(matches):
+            zh_path, en_path, stamp = episode_stamp(proj, m)
+            if proj.tm.episode_stamp(i) == stamp:
+                continue
+            pairs = []
+            if zh_path and en_path:
+                zh_blocks = load_subtitle_blocks(proj, 'zh', zh_path)
+                en_blocks = load_subtitle_blocks(proj, 'en', en_path)
+                alignment = episode_alignment(proj, i, stamp, zh_blocks, en_blocks)
+                merged = merge_blocks_by_time(zh_blocks, align_blocks(en_blocks, alignment), primary='zh')
+                pairs = [(b['zh_text'], b['en_text']) for b in merged
+                         if b['zh_text'].strip() and b['en_text'].strip()]
+            proj.tm.replace_episode(i, stamp, pairs)
+            updated += 1
+        for i in proj.tm.episodes():
+            if i >= len(matches):
+                proj.tm.replace_episode(i, None, [])
+    if updated:
+        print(f"Translation memory: {updated} episodes synced, {len(proj.tm)} source lines (project {proj.id})")
+
+def episode_suggestions(proj: Project, index: int, primary: str, limit: int, min_score: float):
+    """Translation memory suggestions for the untranslated blocks of an episode view"""
+    sync_translation_memory(proj)
+    entry = load_merged_episode(proj, index, primary)
+    results = []
+    with span('tm_lookup'):
+        for i, block in enumerate(entry['blocks']):
+            if block['zh_text'].strip() and not block['en_text'].strip():
+                found = proj.tm.lookup(block['zh_text'], limit, min_score)
+                if found:
+                    results.append({'index': i, 'zh_text': block['zh_text'], 'suggestions': found})
+    return {'version': proj.episode_version(index), 'blocks': results}
+
+@app.get("/api/tm/lookup")
+async def tm_lookup(q: str, limit: int = 5, proj: Project = Depends(get_project)):
+    """Earlier translations of a Chinese line: the exact match first, then similar lines"""
+    await run_in_threadpool(sync_translation_memory, proj)
+    return {'results': proj.tm.lookup(q, max(1, min(limit, 50)))}
+
+@app.get("/api/episode/{index}/suggestions")
+async def get_suggestions(index: int, primary: str = 'zh', limit: int = 3, min_score: float = 0.6,
+                          proj: Project = Depends(get_project)):
+    """Translation memory suggestions for every untranslated block of an episode (indices of the merged view)"""
+    if index < 0 or index >= len(proj.matches):
+        raise HTTPException(status_code=404, detail="Episode not found")
+    return await run_in_threadpool(episode_suggestions, proj, index, primary, max(1, min(limit, 10)), min_score)
+
+@app.post("/api/tm/fill")
+async def tm_fill(req: FillRequest, primary: str = 'zh', client: Optional[str] = None,
+                  proj: Project = Depends(get_project)):
+    """
+    Fill the untranslated blocks of an episode from the translation memory
+
+    Each block gets its best suggestion scoring at least min_score. Filled text
+    is not approved until it is edited and saved in the editor.
+    """
+    if req.episode_index < 0 or req.episode_index >= len(proj.matches):
+        raise HTTPException(status_code=404, detail="Episode not found")
+    found = await run_in_threadpool(episode_suggestions, proj, req.episode_index, primary, 1, req.min_score)
+    ops = [{'op': 'edit', 'index': b['index'], 'en_text': b['suggestions'][0]['target']} for b in found['blocks']]
+    if not ops:
+        return {"version": found['version'], "filled": 0, "written": []}
+    result = await run_in_threadpool(patch_episode_blocks, proj, req.episode_index, primary, req.base_version,
+                                     ops, None, client, False)
+    return {**result, "filled": len(ops)}
+
 @app.get("/api/export/en")
-async def export_en():
-    # Create a zip of the EN_DIR
-    shutil.make_archive("export_en", 'zip', EN_DIR)
-    return FileResponse("export_en.zip", filename="export_en.zip")
+async def export_en(proj: Project = Depends(get_project)):
+    # Create a zip of the project's foreign subtitle directory
+    archive = shutil.make_archive(os.path.join(proj.root, "export_en"), 'zip', proj.en_dir)
+    return FileResponse(archive, filename="export_en.zip")
 
 # Serve frontend
 app.mount("/", StaticFiles(directory=FRONTEND_DIR, html=True), name="frontend")
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
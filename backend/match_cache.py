@@ -0,0 +1,194 @@
+"""
+匹配结果缓存 - 以文件集合指纹为键持久化 match_files 的结果
+
+相同的字幕/视频文件列表直接返回缓存结果；
+部分变化时只把新增文件交给 match_files 重新匹配，再与上次结果合并。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+MATCH_FIELDS = ('zh_sub', 'en_sub', 'video')
+
+
+def fingerprint(zh_files: List[str], en_files: List[str], video_files: List[str], video_root: str) -> str:
+    """Hash of the sorted file lists and the video root"""
+    h = hashlib.sha256()
+    h.update(os.path.normcase(os.path.abspath(video_root or '')).encode('utf-8'))
+    for name, files in (('zh', zh_files), ('en', en_files), ('video', video_files)):
+        h.update(f"\0{name}\0".encode('utf-8'))
+        h.update('\n'.join(sorted(files)).encode('utf-8'))
+    return h.hexdigest()
+
+
+def index_by_episode(matches: List[Dict]) -> Dict[str, Dict]:
+    """Dict lookup of match entries by episode number"""
+    return {m.get('episode'): m for m in matches}
+
+
+def merge_matches(base: List[Dict], delta: List[Dict], removed: Optional[Dict[str, set]] = None) -> List[Dict]:
+    """
+    Merge a partial re-match into a previous result
+
+    Args:
+        base: previous match list
+        delta: match list for the changed files only
+        removed: {'zh_sub': set, 'en_sub': set, 'video': set} of files that no longer exist
+
+    Returns:
+        Merged match list sorted by episode
+    """
+    removed = removed or {}
+    by_ep = {}
+    for m in base:
+        entry = dict(m)
+        for field in MATCH_FIELDS:
+            if entry.get(field) in removed.get(field, ()):
+                entry[field] = None
+        by_ep[entry.get('episode')] = entry
+
+    for new in delta:
+        ep = new.get('episode')
+        entry = by_ep.setdefault(ep, {'episode': ep, 'zh_sub': None, 'en_sub': None, 'video': None})
+        for field in MATCH_FIELDS:
+            if new.get(field):
+                entry[field] = new[field]
+
+    merged = [m for m in by_ep.values() if any(m.get(f) for f in MATCH_FIELDS)]
+    merged.sort(key=lambda x: x.get('episode') or '')
+    return merged
+
+
+class MatchCache:
+    """On-disk cache of match results keyed by file-set fingerprint"""
+
+    def __init__(self, cache_file: str, max_entries: int = 50):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = {'entries': {}, 'roots': {}}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._data['entries'] = data.get('entries', {})
+                self._data['roots'] = data.get('roots', {})
+            print(f"[match_cache] Loaded {len(self._data['entries'])} cached results from {self.cache_file}")
+        except Exception as e:
+            print(f"[match_cache] Failed to load cache, starting empty: {e}")
+
+    def _save(self):
+        tmp_path = self.cache_file + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            print(f"[match_cache] Failed to write cache: {e}")
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._data['entries'].get(key)
+            if entry is None:
+                return None
+            entry['used'] = time.time()
+            return [dict(m) for m in entry['matches']]
+
+    def base_for(self, video_root: str) -> Optional[Dict]:
+        """Most recent file lists and result for this video root"""
+        with self._lock:
+            root = self._data['roots'].get(_root_key(video_root))
+            if root is None or root.get('key') not in self._data['entries']:
+                return None
+            return {
+                'zh': list(root['zh']),
+                'en': list(root['en']),
+                'videos': list(root['videos']),
+                'matches': [dict(m) for m in self._data['entries'][root['key']]['matches']],
+            }
+
+    def put(self, key: str, zh_files, en_files, video_files, video_root: str, matches: List[Dict]):
+        with self._lock:
+            now = time.time()
+            self._data['entries'][key] = {'matches': matches, 'used': now}
+            self._data['roots'][_root_key(video_root)] = {
+                'key': key,
+                'zh': sorted(zh_files),
+                'en': sorted(en_files),
+                'videos': sorted(video_files),
+            }
+            entries = self._data['entries']
+            if len(entries) > self.max_entries:
+                live = {r['key'] for r in self._data['roots'].values()}
+                for old_key, _ in sorted(entries.items(), key=lambda kv: kv[1].get('used', 0)):
+                    if len(entries) <= self.max_entries:
+                        break
+                    if old_key not in live:
+                        del entries[old_key]
+            self._save()
+
+
+def _root_key(video_root: str) -> str:
+    return os.path.normcase(os.path.abspath(video_root or ''))
+
+
+def cached_match(cache: MatchCache, zh_files: List[str], en_files: List[str], video_files: List[str],
+                 video_root: str, match_fn: Callable) -> Tuple[List[Dict], str]:
+    """
+    Run match_fn through the cache
+
+    Returns:
+        (matches, status) where status is 'hit', 'partial' or 'miss'
+    """
+    key = fingerprint(zh_files, en_files, video_files, video_root)
+    cached = cache.get(key)
+    if cached is not None:
+        print(f"[match_cache] Cache hit: {key[:12]} ({len(cached)} episodes)")
+        return cached, 'hit'
+
+    base = cache.base_for(video_root)
+    zh_set, en_set, video_set = set(zh_files), set(en_files), set(video_files)
+    if base and (zh_set & set(base['zh']) or en_set & set(base['en'])):
+        added_zh = sorted(zh_set - set(base['zh']))
+        added_en = sorted(en_set - set(base['en']))
+        added_videos = sorted(video_set - set(base['videos']))
+        removed = {
+            'zh_sub': set(base['zh']) - zh_set,
+            'en_sub': set(base['en']) - en_set,
+            'video': set(base['videos']) - video_set,
+        }
+        print(f"[match_cache] Partial change: +{len(added_zh)} zh, +{len(added_en)} en, +{len(added_videos)} videos, "
+              f"-{sum(len(s) for s in removed.values())} removed")
+
+        merged = merge_matches(base['matches'], [], removed)
+        delta = []
+        if added_zh or added_en or added_videos:
+            ctx_zh, ctx_en, ctx_videos = list(added_zh), list(added_en), list(added_videos)
+            if added_videos:
+                # 新视频需要与尚未关联视频的字幕一起匹配
+                ctx_zh += [m['zh_sub'] for m in merged if m.get('zh_sub') and not m.get('video')]
+                ctx_en += [m['en_sub'] for m in merged if m.get('en_sub') and not m.get('video')]
+            if added_zh or added_en:
+                # 新字幕需要与尚未被任何剧集使用的视频一起匹配
+                assigned = {m.get('video') for m in merged}
+                ctx_videos += [v for v in video_files if v not in assigned and v not in added_videos]
+            delta = match_fn(ctx_zh, ctx_en, ctx_videos)
+        merged = merge_matches(merged, delta)
+        # 与完整匹配一样，没有结果时不缓存（匹配失败不应在下次被当作命中）
+        if merged and (delta or not (added_zh or added_en or added_videos)):
+            cache.put(key, zh_files, en_files, video_files, video_root, merged)
+        return [dict(m) for m in merged], 'partial'
+
+    print(f"[match_cache] Cache miss: {key[:12]}")
+    matches = match_fn(zh_files, en_files, video_files)
+    if matches:
+        cache.put(key, zh_files, en_files, video_files, video_root, matches)
+    return [dict(m) for m in matches], 'miss'
@@ -1,32 +1,23 @@
-import requests
 import json
 import re
 import os
-import sys
-import configparser
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Load configuration from INI file
-config = configparser.ConfigParser()
-if getattr(sys, 'frozen', False):
-    config_path = os.path.join(os.path.dirname(sys.executable), 'config.ini')
-else:
-    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.ini')
+try:
+    from backend.config import get_api_config
+    from backend.logger import debug, is_debug
+    from backend.metrics import span
+except ImportError:
+    from config import get_api_config
+    from logger import debug, is_debug
+    from metrics import span
 
-print(f"[matcher.py] Loading config from: {config_path}")
-print(f"[matcher.py] sys.frozen = {getattr(sys, 'frozen', False)}")
-print(f"[matcher.py] sys.executable = {getattr(sys, 'executable', 'N/A')}")
-print(f"[matcher.py] __file__ = {__file__}")
-print(f"[matcher.py] Config file exists: {os.path.exists(config_path)}")
-
-if not os.path.exists(config_path):
-    raise FileNotFoundError(f"请创建配置文件: {config_path}\n可以复制 config.ini.example 并填入你的API密钥")
-
-config.read(config_path, encoding='utf-8')
-CHATGPT_ENDPOINT = config.get('API', 'chatgpt_endpoint')
-API_KEY = config.get('API', 'api_key')
-
-print(f"[matcher.py] Loaded endpoint: {CHATGPT_ENDPOINT}")
-print(f"[matcher.py] API key loaded: {API_KEY[:10]}..." if API_KEY else "[matcher.py] API key is empty!")
+# 无法识别剧名时，最多直接发送给AI的视频数量
+MAX_UNFILTERED_VIDEOS = 500
+# 每个匹配请求包含的集数，以及并行请求数
+SHARD_EPISODES = 30
+SHARD_WORKERS = 4
 
 def extract_episode_number(filename):
     """Extract episode number from filename"""
@@ -46,7 +37,38 @@ def extract_episode_number(filename):
             return match.group(1).zfill(2)  # Pad to 2 digits
     return None
 
-def match_files(zh_files, en_files, video_files):
+def guess_series_name(files):
+    """Guess the series name locally from the first subtitle filename"""
+    if not files:
+        return ""
+    series_name = re.sub(r'[Ee][Pp]?\d+.*', '', files[0])
+    series_name = re.sub(r'\d{2,3}.*', '', series_name)
+    series_name = re.sub(r'[_\-]*(中文|西班牙语|英语).*', '', series_name)
+    return series_name.strip('-_')
+
+def filter_videos(series_name, video_files, video_index=None):
+    """Candidate videos for a series name, through the n-gram index when available"""
+    if video_index is None:
+        return [v for v in video_files if series_name in v]
+    candidates = video_index.search(series_name)
+    if len(video_index) != len(video_files):
+        # 只在传入的视频子集内筛选
+        allowed = set(video_files)
+        candidates = [v for v in candidates if v in allowed]
+    return candidates
+
+def _no_progress(stage, **info):
+    pass
+
+def match_files(zh_files, en_files, video_files, video_index=None, progress=None):
+    """
+    Match subtitle files and videos into episodes
+
+    Args:
+        progress: optional callback progress(stage, **info), called as each step
+                  starts and after each AI shard finishes
+    """
+    progress = progress or _no_progress
     print(f"\n=== Starting smart file matching ===")
     print(f"Total: {len(zh_files)} Chinese, {len(en_files)} Foreign, {len(video_files)} videos")
     
@@ -59,13 +81,20 @@ def match_files(zh_files, en_files, video_files):
     en_sample = en_files[:3] if len(en_files) > 0 else []
     
     print(f"\n[STEP 1] Using AI to detect series name...")
+    progress('series')
     print(f"Chinese sample: {zh_sample}")
     print(f"Foreign sample: {en_sample}")
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {API_KEY}"
-    }
+    # 首次使用AI时才加载配置；没有配置时直接走本地规则
+    try:
+        endpoint, api_key = get_api_config()
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        }
+    except Exception as e:
+        print(f"✗ AI config unavailable: {e}")
+        endpoint, headers = None, None
     
     # 第一次AI调用：只返回剧名
     prompt = f"""从以下字幕文件名提取剧名。只返回剧名本身，不要任何其他内容。
@@ -82,8 +111,12 @@ def match_files(zh_files, en_files, video_files):
     
     series_name = ""
     try:
+        if endpoint is None:
+            raise RuntimeError("AI is not configured")
+        import requests
         print("→ Sending request to AI...")
-        response = requests.post(CHATGPT_ENDPOINT, headers=headers, data=json.dumps(data), timeout=30)
+        with span('llm_call', caller='match_series'):
+            response = requests.post(endpoint, headers=headers, data=json.dumps(data), timeout=30)
         print(f"← Response status: {response.status_code}")
         response.raise_for_status()
         result = response.json()
@@ -107,12 +140,7 @@ def match_files(zh_files, en_files, video_files):
     except Exception as e:
         print(f"✗ AI detection failed: {e}")
         # Fallback: 从中文字幕提取
-        if zh_files:
-            first = zh_files[0]
-            series_name = re.sub(r'[Ee][Pp]?\d+.*', '', first)
-            series_name = re.sub(r'\d{2,3}.*', '', series_name)
-            series_name = re.sub(r'[_\-]*(中文|西班牙语|英语).*', '', series_name)
-            series_name = series_name.strip('-_')
+        series_name = guess_series_name(zh_files)
         print(f"→ Fallback series name: '{series_name}'")
     
     if not series_name:
@@ -120,96 +148,93 @@ def match_files(zh_files, en_files, video_files):
     
     # ===== STEP 2: 本地筛选包含剧名的文件 =====
     print(f"\n[STEP 2] Filtering files containing '{series_name}'...")
+    progress('filter', series=series_name)
+    
+    if not series_name and video_index is not None:
+        series_name = guess_series_name(zh_files or en_files)
+        print(f"→ Using local series guess for index lookup: '{series_name}'")
     
-    filtered_videos = []
     if series_name:
-        for v in video_files:
-            if series_name in v:
-                filtered_videos.append(v)
-    else:
+        filtered_videos = filter_videos(series_name, video_files, video_index)
+    elif len(video_files) <= MAX_UNFILTERED_VIDEOS:
         filtered_videos = video_files
+    else:
+        # 视频库过大时不把整个列表发给AI
+        print(f"⚠ WARNING: {len(video_files)} videos without a series name, not sending them to the matcher")
+        filtered_videos = []
     
     print(f"→ Filtered: {len(filtered_videos)} videos (from {len(video_files)} total)")
     
-    # ===== STEP 3: AI匹配所有文件 =====
-    print(f"\n[STEP 3] Sending all files to AI for matching...")
+    # ===== STEP 3: AI分片匹配 =====
+    shards = build_shards(zh_files, en_files, filtered_videos)
+    print(f"\n[STEP 3] Sending files to AI for matching in {len(shards)} shard(s)...")
+    progress('shards', done=0, total=len(shards))
     
-    # 第二次AI调用：发送所有字幕和筛选后的视频
-    if zh_files or en_files or filtered_videos:
-        match_prompt = f"""匹配以下文件的对应关系，返回JSON数组。
-
-中文字幕 ({len(zh_files)}个):
-{json.dumps(zh_files, ensure_ascii=False)}
-
-外语字幕 ({len(en_files)}个):
-{json.dumps(en_files, ensure_ascii=False)}
-
-视频文件 ({len(filtered_videos)}个):
-{json.dumps(filtered_videos, ensure_ascii=False)}
-
-返回格式（只返回JSON数组，不要其他内容）:
-[{{"episode": "01", "zh_sub": "file1.srt", "en_sub": "file2.srt", "video": "file3.mp4"}}]
-
-注意：如果某集缺少某个文件，对应字段设为null。"""
+    if endpoint and (zh_files or en_files or filtered_videos):
+        matched = []
+        failed = []
+        with ThreadPoolExecutor(max_workers=min(SHARD_WORKERS, len(shards))) as pool:
+            futures = {pool.submit(ai_match_shard, n + 1, shard, endpoint, headers): shard for n, shard in enumerate(shards)}
+            for finished, future in enumerate(as_completed(futures), 1):
+                shard = futures[future]
+                try:
+                    matched.extend(future.result())
+                except Exception as e:
+                    print(f"✗ AI matching failed for shard {shard['range']}: {e}")
+                    failed.append(shard)
+                progress('shards', done=finished, total=len(shards))
         
-        match_data = {
-            "model": "gemini-2.5-flash",
-            "messages": [{"role": "user", "content": match_prompt}]
-        }
-        
-        try:
-            print(f"→ Sending to AI: {len(zh_files)} zh + {len(en_files)} en + {len(filtered_videos)} videos")
-            response = requests.post(CHATGPT_ENDPOINT, headers=headers, data=json.dumps(match_data), timeout=60)
-            print(f"← Response status: {response.status_code}")
-            response.raise_for_status()
-            result = response.json()
-            content = result['choices'][0]['message']['content'].strip()
-            
-            # 清理markdown
-            content = content.replace('```json', '').replace('```', '').strip()
-            
-            matched = json.loads(content)
+        if len(failed) < len(shards):
+            for shard in failed:
+                print(f"→ Falling back to local regex matching for shard {shard['range']}...")
+                matched.extend(regex_match(shard['zh'], shard['en'], shard['videos']))
+            matched = merge_shard_results(matched)
             print(f"✓ AI matched {len(matched)} episodes")
             
             # 显示结果
-            for item in matched:
-                ep = item.get('episode', '??')
-                status = []
-                if item.get('zh_sub'): status.append('中文✓')
-                if item.get('en_sub'): status.append('外语✓')
-                if item.get('video'): status.append('视频✓')
-                print(f"  Episode {ep}: {' '.join(status) if status else '(empty)'}")
+            if is_debug():
+                for item in matched:
+                    ep = item.get('episode', '??')
+                    status = []
+                    if item.get('zh_sub'): status.append('中文✓')
+                    if item.get('en_sub'): status.append('外语✓')
+                    if item.get('video'): status.append('视频✓')
+                    debug("  Episode %s: %s", ep, ' '.join(status) if status else '(empty)')
             
             print(f"=== AI matching completed: {len(matched)} episodes ===\n")
             return matched
-            
-        except Exception as e:
-            print(f"✗ AI matching failed: {e}")
-            print("→ Falling back to local regex matching...")
+        
+        print("→ Falling back to local regex matching...")
     
     # ===== FALLBACK: 本地正则匹配 =====
     print(f"\n[FALLBACK] Using local regex matching...")
-    
+    progress('fallback')
+    matched = regex_match(zh_files, en_files, filtered_videos)
+    print(f"=== Local matching completed: {len(matched)} episodes ===\n")
+    return matched
+
+def regex_match(zh_files, en_files, video_files):
+    """Match files by the episode number found in their names"""
     zh_map = {}
     for f in zh_files:
         ep_num = extract_episode_number(f)
         if ep_num:
             zh_map[ep_num] = f
-            print(f"  Chinese E{ep_num}: {f}")
+            debug("  Chinese E%s: %s", ep_num, f)
     
     en_map = {}
     for f in en_files:
         ep_num = extract_episode_number(f)
         if ep_num:
             en_map[ep_num] = f
-            print(f"  Foreign E{ep_num}: {f}")
+            debug("  Foreign E%s: %s", ep_num, f)
     
     video_map = {}
-    for f in filtered_videos:
+    for f in video_files:
         ep_num = extract_episode_number(f)
         if ep_num:
             video_map[ep_num] = f
-            print(f"  Video E{ep_num}: {f}")
+            debug("  Video E%s: %s", ep_num, f)
     
     all_episodes = sorted(set(list(zh_map.keys()) + list(en_map.keys()) + list(video_map.keys())))
     
@@ -221,12 +246,147 @@ def match_files(zh_files, en_files, video_files):
             'en_sub': en_map.get(ep),
             'video': video_map.get(ep)
         })
-        status = []
-        if zh_map.get(ep): status.append('中文✓')
-        if en_map.get(ep): status.append('外语✓')
-        if video_map.get(ep): status.append('视频✓')
-        print(f"  Episode {ep}: {' '.join(status)}")
+        if is_debug():
+            status = []
+            if zh_map.get(ep): status.append('中文✓')
+            if en_map.get(ep): status.append('外语✓')
+            if video_map.get(ep): status.append('视频✓')
+            debug("  Episode %s: %s", ep, ' '.join(status))
     
-    print(f"=== Local matching completed: {len(matched)} episodes ===\n")
     return matched
 
+def _episode_sort_key(ep):
+    return (0, int(ep)) if ep and ep.isdigit() else (1, ep or '')
+
+def build_shards(zh_files, en_files, video_files, shard_size=None):
+    """
+    Split the file lists into shards by episode range
+
+    Files without a recognizable episode number go into the first shard.
+    """
+    shard_size = shard_size or SHARD_EPISODES
+    groups = {}
+    for key, files in (('zh', zh_files), ('en', en_files), ('videos', video_files)):
+        for f in files:
+            groups.setdefault(extract_episode_number(f), {'zh': [], 'en': [], 'videos': []})[key].append(f)
+    
+    numbered = sorted((ep for ep in groups if ep is not None), key=_episode_sort_key)
+    if len(numbered) <= shard_size:
+        return [{'range': 'all', 'zh': list(zh_files), 'en': list(en_files), 'videos': list(video_files)}]
+    
+    shards = []
+    for i in range(0, len(numbered), shard_size):
+        eps = numbered[i:i + shard_size]
+        shard = {'range': f"{eps[0]}-{eps[-1]}", 'zh': [], 'en': [], 'videos': []}
+        for ep in eps:
+            for key in ('zh', 'en', 'videos'):
+                shard[key].extend(groups[ep][key])
+        shards.append(shard)
+    if None in groups:
+        for key in ('zh', 'en', 'videos'):
+            shards[0][key].extend(groups[None][key])
+    return shards
+
+def _trim_affix(affix, from_end):
+    """Keep digits out of a shared prefix/suffix so episode numbers stay intact"""
+    if from_end:
+        return affix.lstrip('0123456789')
+    return affix.rstrip('0123456789')
+
+def compress_names(names, id_prefix):
+    """
+    Strip the shared prefix and suffix and assign short IDs
+
+    Returns:
+        (prefix, suffix, [(id, middle)], {id: filename})
+    """
+    if not names:
+        return '', '', [], {}
+    prefix = suffix = ''
+    if len(names) > 1:
+        prefix = _trim_affix(os.path.commonprefix(names), from_end=False)
+        suffix = _trim_affix(os.path.commonprefix([n[len(prefix):][::-1] for n in names])[::-1], from_end=True)
+    entries = []
+    id_map = {}
+    for i, name in enumerate(names, 1):
+        file_id = f"{id_prefix}{i}"
+        middle = name[len(prefix):len(name) - len(suffix)] if suffix else name[len(prefix):]
+        entries.append((file_id, middle))
+        id_map[file_id] = name
+    return prefix, suffix, entries, id_map
+
+def _format_group(title, prefix, suffix, entries):
+    lines = [f"{title} ({len(entries)}个, 公共前缀={json.dumps(prefix, ensure_ascii=False)}, 公共后缀={json.dumps(suffix, ensure_ascii=False)}):"]
+    lines.extend(f"{file_id}={middle}" for file_id, middle in entries)
+    return '\n'.join(lines)
+
+def build_match_prompt(zh_files, en_files, video_files):
+    """Compact match prompt referring to files by short IDs"""
+    zh_pre, zh_suf, zh_entries, zh_ids = compress_names(zh_files, 'z')
+    en_pre, en_suf, en_entries, en_ids = compress_names(en_files, 'e')
+    v_pre, v_suf, v_entries, v_ids = compress_names(video_files, 'v')
+    
+    prompt = f"""匹配以下文件的对应关系，返回JSON数组。每个文件以"ID=文件名去掉公共前缀和后缀的部分"给出。
+
+{_format_group('中文字幕', zh_pre, zh_suf, zh_entries)}
+
+{_format_group('外语字幕', en_pre, en_suf, en_entries)}
+
+{_format_group('视频文件', v_pre, v_suf, v_entries)}
+
+返回格式（只返回JSON数组，使用文件ID，不要其他内容）:
+[{{"episode": "01", "zh": "z1", "en": "e1", "video": "v1"}}]
+
+注意：如果某集缺少某个文件，对应字段设为null。"""
+    return prompt, {'zh': zh_ids, 'en': en_ids, 'video': v_ids}
+
+def ai_match_shard(shard_no, shard, endpoint, headers):
+    """Send one shard to the AI and map the returned IDs back to filenames"""
+    import requests
+    prompt, id_maps = build_match_prompt(shard['zh'], shard['en'], shard['videos'])
+    match_data = {
+        "model": "gemini-2.5-flash",
+        "messages": [{"role": "user", "content": prompt}]
+    }
+    
+    print(f"→ [shard {shard_no} {shard['range']}] Sending {len(shard['zh'])} zh + {len(shard['en'])} en + {len(shard['videos'])} videos")
+    started = time.perf_counter()
+    with span('llm_call', caller='match_shard'):
+        response = requests.post(endpoint, headers=headers, data=json.dumps(match_data), timeout=60)
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    result = response.json()
+    usage = result.get('usage') or {}
+    if usage.get('prompt_tokens') is not None:
+        tokens = f"{usage['prompt_tokens']} prompt / {usage.get('completion_tokens', '?')} completion tokens"
+    else:
+        tokens = f"~{len(prompt) // 2} prompt tokens (estimated)"
+    print(f"← [shard {shard_no} {shard['range']}] status {response.status_code}, {tokens}, {elapsed:.2f}s")
+    
+    content = result['choices'][0]['message']['content'].strip()
+    # 清理markdown
+    content = content.replace('```json', '').replace('```', '').strip()
+    
+    matched = []
+    for item in json.loads(content):
+        matched.append({
+            'episode': item.get('episode'),
+            'zh_sub': id_maps['zh'].get(item.get('zh')),
+            'en_sub': id_maps['en'].get(item.get('en')),
+            'video': id_maps['video'].get(item.get('video')),
+        })
+    return matched
+
+def merge_shard_results(matched):
+    """Merge per-shard matches by episode, keeping the first file found for each field"""
+    by_ep = {}
+    for item in matched:
+        ep = item.get('episode')
+        if ep is None:
+            continue
+        ep = str(ep).zfill(2) if str(ep).isdigit() else str(ep)
+        entry = by_ep.setdefault(ep, {'episode': ep, 'zh_sub': None, 'en_sub': None, 'video': None})
+        for field in ('zh_sub', 'en_sub', 'video'):
+            if item.get(field) and not entry[field]:
+                entry[field] = item[field]
+    return sorted(by_ep.values(), key=lambda m: _episode_sort_key(m['episode']))
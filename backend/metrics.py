@@ -0,0 +1,186 @@
+"""
+性能指标 - 路由耗时、分阶段 span 和计数器
+
+通过 /api/metrics 以 Prometheus 文本格式（或 ?format=json 的 JSON 快照）导出。
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+# 耗时直方图的桶（秒）
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 180.0)
+
+PREFIX = 'dqs_'
+
+
+class _Histogram:
+    __slots__ = ('count', 'sum', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+
+
+def _labels_key(labels: Dict) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: Tuple, extra: Tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in pairs
+    )
+    return '{' + body + '}'
+
+
+class Metrics:
+    """Process-wide registry of counters and timing histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._histograms: Dict[str, Dict[Tuple, _Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self.started = time.time()
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time a named stage: with span('parse'): ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('span_seconds', time.perf_counter() - started, span=name, **labels)
+
+    def snapshot(self):
+        """JSON-friendly copy of every series"""
+        with self._lock:
+            counters = {
+                name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            timings = {
+                name: [{
+                    'labels': dict(key),
+                    'count': h.count,
+                    'sum': round(h.sum, 6),
+                    'avg': round(h.sum / h.count, 6) if h.count else 0,
+                    'max': round(h.max, 6),
+                } for key, h in series.items()]
+                for name, series in self._histograms.items()
+            }
+        return {'uptime_seconds': round(time.time() - self.started, 3), 'counters': counters, 'timings': timings}
+
+    def prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = PREFIX + name
+                if name in self._help:
+                    lines.append(f"# HELP {full} {self._help[name]}")
+                lines.append(f"# TYPE {full} counter")
+                for key, value in series.items():
+                    lines.append(f"{full}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                full = PREFIX + name
+                if name in self._help:
+                    lines.append(f"# HELP {full} {self._help[name]}")
+                lines.append(f"# TYPE {full} histogram")
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, n in zip(BUCKETS, h.buckets):
+                        cumulative += n
+                        lines.append(f"{full}_bucket{_format_labels(key, (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{full}_bucket{_format_labels(key, (('le', '+Inf'),))} {h.count}")
+                    lines.append(f"{full}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{full}_count{_format_labels(key)} {h.count}")
+        lines.append(f"# TYPE {PREFIX}uptime_seconds gauge")
+        lines.append(f"{PREFIX}uptime_seconds {time.time() - self.started}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+metrics = Metrics()
+span = metrics.span
+inc = metrics.inc
+
+metrics.describe('http_request_seconds', 'Request latency by route')
+metrics.describe('http_requests_total', 'Requests by route and status')
+metrics.describe('span_seconds', 'Duration of named processing stages')
+metrics.describe('llm_retries_total', 'AI request retries')
+metrics.describe('llm_first_cue_seconds', 'Time from a streamed correction request to its first valid block')
+metrics.describe('match_cache_total', 'Match cache lookups by result')
+metrics.describe('video_bytes_streamed_total', 'Bytes sent by /video/stream')
+metrics.describe('episode_cache_total', 'Merged episode cache lookups by result')
+metrics.describe('episode_patch_ops_total', 'Edit ops applied through the patch API')
+metrics.describe('ws_messages_total', 'Messages received on the /ws channel by type')
+metrics.describe('video_head_cache_total', 'Video file head cache lookups by result')
+metrics.describe('video_moov_cache_total', 'MP4 moov ranges served from memory')
+
+
+class TimingMiddleware:
+    """ASGI middleware recording latency and status of every HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            path = getattr(route, 'path', None) or ('static' if status['code'] < 400 else 'unmatched')
+            elapsed = time.perf_counter() - started
+            metrics.observe('http_request_seconds', elapsed, method=scope['method'], route=path)
+            metrics.inc('http_requests_total', method=scope['method'], route=path, status=status['code'])
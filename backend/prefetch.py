@@ -0,0 +1,76 @@
+"""
+后台预取 - 打开第 N 集后在后台解析合并相邻剧集，并在内存中保留视频文件开头
+
+译者通常按顺序处理剧集，切换到下一集时字幕直接命中合并缓存，
+视频的第一个请求由内存中的文件开头响应。
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+PREFETCH_NEIGHBOURS = (1, -1)  # 先下一集，再上一集
+VIDEO_HEAD_BYTES = 1024 * 1024 * 5  # 与 /video/stream 的单次最大块一致
+VIDEO_HEAD_CACHE_SIZE = 4
+
+
+class Prefetcher:
+    """Runs background loads on one worker thread, skipping keys already queued"""
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self._pool = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args) -> bool:
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch')
+        self._pool.submit(self._run, key, fn, args)
+        return True
+
+    def _run(self, key, fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"Prefetch {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+
+class VideoHeadCache:
+    """First VIDEO_HEAD_BYTES of recently opened videos, validated by size and mtime"""
+
+    def __init__(self, size: int = VIDEO_HEAD_CACHE_SIZE, head_bytes: int = VIDEO_HEAD_BYTES):
+        self.size = size
+        self.head_bytes = head_bytes
+        self._heads: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, st: os.stat_result):
+        """Cached head of path, or None if missing or the file changed"""
+        with self._lock:
+            item = self._heads.get(path)
+            if item is None:
+                return None
+            if item[0] != (st.st_size, st.st_mtime_ns):
+                del self._heads[path]
+                return None
+            self._heads.move_to_end(path)
+            return item[1]
+
+    def load(self, path: str, st: os.stat_result) -> bytes:
+        """Read and cache the head of path"""
+        with open(path, 'rb') as f:
+            data = f.read(self.head_bytes)
+        with self._lock:
+            self._heads[path] = ((st.st_size, st.st_mtime_ns), data)
+            self._heads.move_to_end(path)
+            while len(self._heads) > self.size:
+                self._heads.popitem(last=False)
+        return data
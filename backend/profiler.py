@@ -0,0 +1,185 @@
+"""
+请求性能分析 - 按需对单个请求做 cProfile 和栈采样
+
+环境变量 DQS_PROFILE 控制是否启用（未设置时不安装中间件，没有任何开销）:
+    DQS_PROFILE=1        分析所有 /api 和 /video 请求
+    DQS_PROFILE=header   只分析带 X-Profile: 1 请求头的请求
+    DQS_PROFILE=/api/episode   只分析路径以此开头的请求（也接受请求头触发）
+
+每次分析在 app.log 旁的 profiles/ 目录生成:
+    *.prof    cProfile 数据（snakeviz / pstats 可读）
+    *.folded  折叠栈采样（flamegraph.pl / speedscope 可读）
+"""
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+try:
+    from backend.config import get_base_dir
+except ImportError:
+    from config import get_base_dir
+
+PROFILE_ENV = 'DQS_PROFILE'
+PROFILE_HEADER = b'x-profile'
+PROFILE_DIR = os.path.join(get_base_dir(), 'profiles')
+MAX_PROFILES = 50
+SAMPLE_INTERVAL = 0.001  # 栈采样间隔（秒）
+
+_recent = deque(maxlen=MAX_PROFILES)
+_recent_lock = threading.Lock()
+# 同一时间只能有一个 cProfile 处于启用状态
+_active = threading.Lock()
+
+
+class _StackSampler(threading.Thread):
+    """Samples the stack of one thread at a fixed interval into folded-stack counts"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join(1.0)
+
+
+def _slug(path):
+    return re.sub(r'[^A-Za-z0-9]+', '_', path).strip('_')[:60] or 'root'
+
+
+def _save(profiler, sampler, method, path, elapsed):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    base = os.path.join(PROFILE_DIR, f"{stamp}_{method}_{_slug(path)}_{int(elapsed * 1000)}ms")
+    profiler.dump_stats(base + '.prof')
+    with open(base + '.folded', 'w', encoding='utf-8') as f:
+        for stack, count in sampler.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+    entry = {
+        'name': os.path.basename(base),
+        'method': method,
+        'path': path,
+        'duration_ms': round(elapsed * 1000, 2),
+        'samples': sum(sampler.stacks.values()),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'files': [os.path.basename(base) + '.prof', os.path.basename(base) + '.folded'],
+    }
+    with _recent_lock:
+        _recent.appendleft(entry)
+    _prune()
+    print(f"[profiler] {method} {path} took {elapsed * 1000:.1f} ms -> {base}.prof")
+
+
+def _prune():
+    """Keep only the newest MAX_PROFILES profiles on disk"""
+    try:
+        names = sorted({os.path.splitext(n)[0] for n in os.listdir(PROFILE_DIR)}, reverse=True)
+    except OSError:
+        return
+    for old in names[MAX_PROFILES:]:
+        for ext in ('.prof', '.folded'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old + ext))
+            except OSError:
+                pass
+
+
+def list_profiles():
+    """Recent profiles, newest first (including ones left from earlier runs)"""
+    with _recent_lock:
+        entries = list(_recent)
+    known = {e['name'] for e in entries}
+    try:
+        names = sorted({os.path.splitext(n)[0] for n in os.listdir(PROFILE_DIR)}, reverse=True)
+    except OSError:
+        names = []
+    for name in names:
+        if name not in known:
+            entries.append({'name': name, 'files': [name + '.prof', name + '.folded']})
+    return entries[:MAX_PROFILES]
+
+
+def profile_file_path(filename):
+    """Absolute path of a profile file, or None if it is not a profile in PROFILE_DIR"""
+    if os.path.basename(filename) != filename or not filename.endswith(('.prof', '.folded')):
+        return None
+    path = os.path.join(PROFILE_DIR, filename)
+    return path if os.path.exists(path) else None
+
+
+class ProfilerMiddleware:
+    """ASGI middleware that profiles selected requests
+
+    cProfile only sees the event-loop thread, so concurrent requests handled
+    in the same window show up in the profile as well.
+    """
+
+    def __init__(self, app, mode):
+        self.app = app
+        self.mode = mode
+        self.profile_all = mode.lower() in ('1', 'true', 'all', 'yes')
+        self.prefix = mode if mode.startswith('/') else None
+
+    def _wanted(self, scope):
+        path = scope['path']
+        if self.profile_all and path.startswith(('/api', '/video')):
+            return not path.startswith('/api/profiles')
+        if self.prefix and path.startswith(self.prefix):
+            return True
+        for key, value in scope['headers']:
+            if key == PROFILE_HEADER:
+                return value not in (b'0', b'', b'false')
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self._wanted(scope) or not _active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = _StackSampler(threading.get_ident())
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        sampler.start()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            sampler.stop()
+            elapsed = time.perf_counter() - started
+            _active.release()
+            try:
+                _save(profiler, sampler, scope['method'], scope['path'], elapsed)
+            except Exception as e:
+                print(f"[profiler] Failed to save profile: {e}")
+
+
+def install_profiler(app):
+    """Add ProfilerMiddleware when DQS_PROFILE is set"""
+    mode = os.environ.get(PROFILE_ENV, '').strip()
+    if not mode or mode.lower() in ('0', 'false', 'off'):
+        return False
+    app.add_middleware(ProfilerMiddleware, mode=mode)
+    print(f"[profiler] Request profiling enabled ({PROFILE_ENV}={mode}), saving to {PROFILE_DIR}")
+    return True
@@ -0,0 +1,318 @@
+"""
+项目数据库 - SQLite（WAL 模式）保存项目、剧集匹配、字幕文件记录和解析后的字幕条目
+
+字幕文件仍是导入/导出的格式：文件首次读取时解析一次写入 cues 表，
+之后按文件大小和修改时间校验，未变化时直接按索引查询，重启后无需重新解析。
+每条字幕的检索词同时写入 FTS5 全文索引 cue_fts（rowid 由文件 ID 和条目序号组成）。
+翻译记忆中已确认的译文保存在 tm_approved 表，按归一化后的原文去重。
+"""
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from backend.srt_parser import time_to_seconds
+    from backend.cue_search import index_text
+except ImportError:
+    from srt_parser import time_to_seconds
+    from cue_search import index_text
+
+SCHEMA_VERSION = 4
+SEQ_BITS = 20  # cue_fts.rowid = (files.id << SEQ_BITS) | cues.seq，每个文件最多约 100 万条
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    video_base_path TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS episodes (
+    project TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    episode TEXT,
+    zh_sub TEXT,
+    en_sub TEXT,
+    video TEXT,
+    PRIMARY KEY (project, idx)
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    format TEXT NOT NULL,
+    header TEXT
+);
+CREATE INDEX IF NOT EXISTS files_by_name ON files (project, lang, name);
+CREATE TABLE IF NOT EXISTS cues (
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (file_id, seq)
+) WITHOUT ROWID;
+-- 旧版本按时间建的索引没有查询使用，只会拖慢写入
+DROP INDEX IF EXISTS cues_by_time;
+CREATE VIRTUAL TABLE IF NOT EXISTS cue_fts USING fts5 (tokens, tokenize = 'unicode61 remove_diacritics 2');
+CREATE TABLE IF NOT EXISTS tm_approved (
+    project TEXT NOT NULL,
+    key TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    PRIMARY KEY (project, key)
+) WITHOUT ROWID;
+"""
+
+MATCH_FIELDS = ('episode', 'zh_sub', 'en_sub', 'video')
+
+
+def time_to_ms(value: str) -> int:
+    try:
+        # 常见的 00:00:01,000 格式直接按位置切分
+        if len(value) == 12 and value[2] == ':' and value[5] == ':' and value[8] == ',':
+            return int(value[:2]) * 3600000 + int(value[3:5]) * 60000 + int(value[6:8]) * 1000 + int(value[9:])
+        return int(round(time_to_seconds(value) * 1000))
+    except (ValueError, AttributeError, TypeError):
+        return 0
+
+
+def _fts_range(file_id: int) -> Tuple[int, int]:
+    return file_id << SEQ_BITS, ((file_id + 1) << SEQ_BITS) - 1
+
+
+def _regexp(pattern, value) -> bool:
+    return value is not None and re.search(pattern, value) is not None
+
+
+def _blocks(rows) -> List[Dict]:
+    return [{'index': idx, 'start': start, 'end': end, 'text': text} for idx, start, end, text in rows]
+
+
+def cue_rows(blocks: List[Dict]) -> List[Tuple]:
+    """(seq, idx, start, end, start_ms, end_ms, text, search tokens) of each block, as stored by store_file"""
+    return [(i, b.get('index', i + 1), b['start'], b['end'], time_to_ms(b['start']), time_to_ms(b['end']),
+             b.get('text', ''), index_text(b.get('text', ''))) for i, b in enumerate(blocks)]
+
+
+def ass_header(content: str) -> Optional[str]:
+    """Everything of an ASS file up to its [Events] Format line, kept for export"""
+    lines = content.split('\n')
+    for i, line in enumerate(lines):
+        if line.strip().startswith('[Events]'):
+            for j in range(i + 1, len(lines)):
+                if lines[j].strip().startswith('Format:'):
+                    return '\n'.join(lines[:j + 1]) + '\n'
+            return '\n'.join(lines[:i + 1]) + '\n'
+    return None
+
+
+class ProjectDB:
+    """SQLite store shared by all projects, with one connection per thread
+
+    All projects live in one database file and SQLite allows a single writer
+    per file, so writes of different projects are serialized by one lock
+    (_write_lock) rather than per-project locks: a per-project lock would only
+    move the wait into SQLite's busy timeout. Reads never take the lock (WAL).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            conn.create_function('regexp', 2, _regexp, deterministic=True)
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version < SCHEMA_VERSION:
+                with self._write_lock, conn:
+                    conn.executescript(SCHEMA)
+                    if version == 1:
+                        # 旧版本导入的文件没有全文索引，清空后在下次读取时重新导入
+                        conn.execute('DELETE FROM files')
+                    conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---------- 项目和剧集 ----------
+
+    def load_project(self, project_id: str) -> Optional[Dict]:
+        """Video root and match set of a project, or None if it was never saved"""
+        conn = self._conn()
+        row = conn.execute('SELECT video_base_path FROM projects WHERE id = ?', (project_id,)).fetchone()
+        if row is None:
+            return None
+        rows = conn.execute(
+            'SELECT episode, zh_sub, en_sub, video FROM episodes WHERE project = ? ORDER BY idx', (project_id,))
+        matches = [dict(zip(MATCH_FIELDS, r)) for r in rows]
+        return {'video_base_path': row[0], 'matches': matches}
+
+    def save_project(self, project_id: str, video_base_path: str, matches: List[Dict]):
+        conn = self._conn()
+        with self._write_lock, conn:
+            conn.execute('INSERT INTO projects (id, video_base_path) VALUES (?, ?) '
+                         'ON CONFLICT (id) DO UPDATE SET video_base_path = excluded.video_base_path',
+                         (project_id, video_base_path or ''))
+            conn.execute('DELETE FROM episodes WHERE project = ?', (project_id,))
+            conn.executemany(
+                'INSERT INTO episodes (project, idx, episode, zh_sub, en_sub, video) VALUES (?, ?, ?, ?, ?, ?)',
+                [(project_id, i, *(m.get(k) for k in MATCH_FIELDS)) for i, m in enumerate(matches)])
+
+    def project_ids(self) -> List[str]:
+        return [r[0] for r in self._conn().execute('SELECT id FROM projects ORDER BY id')]
+
+    # ---------- 字幕文件和条目 ----------
+
+    def file_path(self, project_id: str, lang: str, name: str) -> Optional[str]:
+        """Recorded path of a subtitle file that still exists on disk"""
+        rows = self._conn().execute(
+            'SELECT path FROM files WHERE project = ? AND lang = ? AND name = ?', (project_id, lang, name))
+        for (path,) in rows:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def file_current(self, path: str, st: os.stat_result) -> bool:
+        """True if path was imported and has not changed since"""
+        row = self._conn().execute('SELECT size, mtime_ns FROM files WHERE path = ?', (path,)).fetchone()
+        return row is not None and tuple(row) == (st.st_size, st.st_mtime_ns)
+
+    def file_header(self, path: str) -> Optional[str]:
+        """ASS header recorded for path (None for SRT or unknown files)"""
+        row = self._conn().execute('SELECT header FROM files WHERE path = ?', (path,)).fetchone()
+        return row[0] if row else None
+
+    def file_cues(self, path: str, st: os.stat_result) -> Optional[Tuple[List[Dict], Optional[str]]]:
+        """
+        Cues imported from path, if the file has not changed since
+
+        Returns:
+            (blocks, ASS header or None), or None if the file must be parsed again
+        """
+        conn = self._conn()
+        row = conn.execute('SELECT id, size, mtime_ns, header FROM files WHERE path = ?', (path,)).fetchone()
+        if row is None or (row[1], row[2]) != (st.st_size, st.st_mtime_ns):
+            return None
+        rows = conn.execute('SELECT idx, start_time, end_time, text FROM cues WHERE file_id = ? ORDER BY seq', (row[0],))
+        return _blocks(rows), row[3]
+
+    def store_file(self, project_id: str, lang: str, path: str, st: os.stat_result,
+                   blocks: List[Dict], header: Optional[str] = None, rows: Optional[List[Tuple]] = None):
+        """Record a subtitle file and replace its cues (after parsing or writing it)
+
+        rows, if given, are cue_rows(blocks) computed elsewhere (warm-up workers).
+        """
+        fmt = 'ass' if path.endswith('.ass') else 'srt'
+        if rows is None:
+            rows = cue_rows(blocks)
+        conn = self._conn()
+        with self._write_lock, conn:
+            self._drop_files(conn, 'path = ?', (path,))
+            cur = conn.execute(
+                'INSERT INTO files (project, lang, name, path, size, mtime_ns, format, header) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (project_id, lang, os.path.basename(path), path, st.st_size, st.st_mtime_ns, fmt, header))
+            file_id = cur.lastrowid
+            conn.executemany(
+                'INSERT INTO cues (file_id, seq, idx, start_time, end_time, start_ms, end_ms, text) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(file_id, *r[:7]) for r in rows])
+            base = file_id << SEQ_BITS
+            conn.executemany('INSERT INTO cue_fts (rowid, tokens) VALUES (?, ?)',
+                             [(base | r[0], r[7]) for r in rows])
+
+    def update_times(self, path: str, st: os.stat_result, blocks: List[Dict],
+                     starts_ms: List[int], ends_ms: List[int]) -> bool:
+        """
+        Store new cue times of a file rewritten with unchanged text (retiming)
+
+        The full-text index is left alone. Returns False if the file is not
+        recorded with the same number of cues; the caller stores it instead.
+        """
+        conn = self._conn()
+        with self._write_lock, conn:
+            row = conn.execute('SELECT id FROM files WHERE path = ?', (path,)).fetchone()
+            if row is None or conn.execute('SELECT COUNT(*) FROM cues WHERE file_id = ?', row).fetchone()[0] != len(blocks):
+                return False
+            conn.execute('UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?', (st.st_size, st.st_mtime_ns, row[0]))
+            conn.executemany(
+                'UPDATE cues SET start_time = ?, end_time = ?, start_ms = ?, end_ms = ? WHERE file_id = ? AND seq = ?',
+                [(b['start'], b['end'], start, end, row[0], i)
+                 for i, (b, start, end) in enumerate(zip(blocks, starts_ms, ends_ms))])
+        return True
+
+    def _drop_files(self, conn: sqlite3.Connection, where: str, params: tuple):
+        """Delete matching file records with their cues and index rows (caller holds the write lock)"""
+        for (file_id,) in conn.execute(f'SELECT id FROM files WHERE {where}', params).fetchall():
+            conn.execute('DELETE FROM cue_fts WHERE rowid BETWEEN ? AND ?', _fts_range(file_id))
+        conn.execute(f'DELETE FROM files WHERE {where}', params)
+
+    def forget_files(self, project_id: str, lang: str):
+        """Drop file records and cues of one language (its directory was replaced)"""
+        conn = self._conn()
+        with self._write_lock, conn:
+            self._drop_files(conn, 'project = ? AND lang = ?', (project_id, lang))
+
+    def search_cues(self, paths: List[str], match: Optional[str] = None,
+                    regex: Optional[str] = None) -> List[Tuple]:
+        """
+        Cues of the given files matching a full-text expression or a regex
+
+        Args:
+            paths: imported subtitle files to search
+            match: FTS5 MATCH expression (see cue_search.build_query)
+            regex: Python regex tested against the cue text, used when match is None
+
+        Returns:
+            (path, seq, idx, start_ms, end_ms, text) tuples
+        """
+        if not paths:
+            return []
+        marks = ', '.join('?' * len(paths))
+        select = 'SELECT f.path, c.seq, c.idx, c.start_ms, c.end_ms, c.text FROM '
+        if match is not None:
+            sql = (select + 'cue_fts JOIN cues c ON c.file_id = (cue_fts.rowid >> ?) '
+                   'AND c.seq = (cue_fts.rowid & ?) JOIN files f ON f.id = c.file_id '
+                   f'WHERE cue_fts MATCH ? AND f.path IN ({marks})')
+            params = (SEQ_BITS, (1 << SEQ_BITS) - 1, match, *paths)
+        else:
+            sql = select + f'files f JOIN cues c ON c.file_id = f.id WHERE f.path IN ({marks}) AND c.text REGEXP ?'
+            params = (*paths, regex)
+        return self._conn().execute(sql, params).fetchall()
+
+    # ---------- 翻译记忆 ----------
+
+    def tm_approved(self, project_id: str) -> List[Tuple[str, str]]:
+        """(source, target) pairs approved in the editor"""
+        return self._conn().execute(
+            'SELECT source, target FROM tm_approved WHERE project = ?', (project_id,)).fetchall()
+
+    def approve_translations(self, project_id: str, pairs: List[Tuple[str, str, str]]):
+        """Store (key, source, target) approvals; an empty target withdraws one"""
+        conn = self._conn()
+        with self._write_lock, conn:
+            conn.executemany('DELETE FROM tm_approved WHERE project = ? AND key = ?',
+                             [(project_id, key) for key, _, target in pairs if not target])
+            conn.executemany(
+                'INSERT INTO tm_approved (project, key, source, target) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (project, key) DO UPDATE SET source = excluded.source, target = excluded.target',
+                [(project_id, key, source, target) for key, source, target in pairs if target])
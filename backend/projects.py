@@ -0,0 +1,253 @@
+"""
+项目工作区 - 每个项目有独立的上传目录、匹配结果、视频路径、缓存和文件锁
+
+默认项目 "default" 沿用原来的 uploads/zh、uploads/en 目录，
+其他项目位于 uploads/projects/<id>/ 下。项目之间不共享任何锁。
+匹配结果、视频路径和解析后的字幕保存在 uploads/projects.db（见 project_db.py）。
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+try:
+    from backend.match_cache import MatchCache
+    from backend.project_db import ProjectDB
+    from backend.translation_memory import TranslationMemory
+except ImportError:
+    from match_cache import MatchCache
+    from project_db import ProjectDB
+    from translation_memory import TranslationMemory
+
+DEFAULT_PROJECT = 'default'
+MERGED_CACHE_SIZE = 8  # 每个项目缓存的合并后剧集数
+_PROJECT_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+
+def valid_project_id(project_id: str) -> bool:
+    return bool(project_id) and bool(_PROJECT_ID.match(project_id))
+
+
+class Project:
+    """State of one workspace: uploads, match set, video root and caches"""
+
+    def __init__(self, project_id: str, root: str, db: ProjectDB):
+        self.id = project_id
+        self.root = root
+        self.db = db
+        self.zh_dir = os.path.join(root, 'zh')
+        self.en_dir = os.path.join(root, 'en')
+        # 旧版本保存状态的文件，只在数据库中还没有该项目时读取一次
+        self.state_file = os.path.join(root, 'project.json')
+        os.makedirs(self.zh_dir, exist_ok=True)
+        os.makedirs(self.en_dir, exist_ok=True)
+
+        self.matches: List[Dict] = []
+        self.video_base_path = ''
+        self.match_cache = MatchCache(os.path.join(root, 'match_cache.json'))
+        # (集索引, primary) -> 合并结果，按文件状态校验，供分页/时间窗口查询复用
+        self.merged_episodes: "OrderedDict[tuple, dict]" = OrderedDict()
+        # 集索引 -> (文件状态和质检设置, 问题列表)
+        self.lint_results: Dict[int, tuple] = {}
+        # 集索引 -> (文件状态, 外语轨道偏移/漂移估计)，见 track_align.py
+        self.alignments: Dict[int, tuple] = {}
+        # 各集中文/外语句对的翻译记忆，按文件状态增量同步（见 main.sync_translation_memory）
+        self.tm = TranslationMemory()
+        # 保护 matches / video_base_path 的读改写
+        self.lock = threading.RLock()
+        self._locks: Dict[object, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # 剧集版本号：每次写入递增；以毫秒时间起步，重启后旧客户端的版本号不会撞上
+        self._last_version = int(time.time() * 1000)
+        self._generation = self._last_version
+        self._episode_versions: Dict[int, int] = {}
+        self._load_state()
+
+    def subtitle_dir(self, kind: str) -> str:
+        return self.zh_dir if kind == 'zh' else self.en_dir
+
+    def find_subtitle(self, kind: str, name: str):
+        """Path of a subtitle file: the recorded path if it still exists, else a directory walk"""
+        path = self.db.file_path(self.id, kind, name)
+        if path is not None:
+            return path
+        for root, dirs, files in os.walk(self.subtitle_dir(kind)):
+            if name in files:
+                return os.path.join(root, name)
+        return None
+
+    def _lock_for(self, key) -> threading.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._locks.setdefault(key, threading.Lock())
+        return lock
+
+    def file_lock(self, path: str) -> threading.Lock:
+        """Lock serializing read-modify-write of one file inside this project"""
+        return self._lock_for(os.path.normcase(os.path.abspath(path)))
+
+    def forget_files(self, kind: str):
+        """
+        Drop the database records of one language after its directory was
+        replaced, along with the file locks of paths under it
+
+        Locks currently held are kept; the writer still holding one finishes
+        against the replaced directory as before.
+        """
+        self.db.forget_files(self.id, kind)
+        prefix = os.path.join(os.path.normcase(os.path.abspath(self.subtitle_dir(kind))), '')
+        with self._locks_guard:
+            for key in [k for k in self._locks if isinstance(k, str) and k.startswith(prefix)]:
+                if not self._locks[key].locked():
+                    del self._locks[key]
+
+    def episode_lock(self, index: int) -> threading.Lock:
+        """Lock serializing patches of one episode (taken before its file locks)"""
+        return self._lock_for(('episode', index))
+
+    def episode_version(self, index: int) -> int:
+        with self.lock:
+            return self._episode_versions.get(index, self._generation)
+
+    def bump_episode(self, index: int) -> int:
+        """Record a write to an episode's files and return its new version"""
+        with self.lock:
+            self._last_version += 1
+            self._episode_versions[index] = self._last_version
+            return self._last_version
+
+    def reset_episodes(self):
+        """Invalidate versions and merged caches after the match set is replaced"""
+        with self.lock:
+            self._last_version += 1
+            self._generation = self._last_version
+            self._episode_versions.clear()
+            self.merged_episodes.clear()
+            self.lint_results.clear()
+            self.alignments.clear()
+
+    def cached_episode(self, key: tuple, stamp: tuple):
+        """Merged episode stored under key if it was built from files matching stamp
+
+        Block indices in a client's view are only valid for the view it loaded,
+        so a view dropped because its files changed bumps the episode version.
+        """
+        with self.lock:
+            entry = self.merged_episodes.get(key)
+            if entry is None:
+                return None
+            if entry['stamp'] != stamp:
+                del self.merged_episodes[key]
+                # 文件在记录的写入之外被改动（版本号未变）
+                if entry.get('version') == self.episode_version(key[0]):
+                    self.bump_episode(key[0])
+                return None
+            self.merged_episodes.move_to_end(key)
+            return entry
+
+    def store_episode(self, key: tuple, entry: dict):
+        with self.lock:
+            self.merged_episodes[key] = entry
+            self.merged_episodes.move_to_end(key)
+            while len(self.merged_episodes) > MERGED_CACHE_SIZE:
+                old_key, old = self.merged_episodes.popitem(last=False)
+                # 修改过的视图无法从文件重新合并得到，淘汰时让客户端重新加载
+                if old.get('patched'):
+                    self.bump_episode(old_key[0])
+
+    def cached_lint(self, index: int, key: tuple):
+        """Lint issues of an episode if they were computed for key (file stamps and settings)"""
+        with self.lock:
+            item = self.lint_results.get(index)
+            return item[1] if item is not None and item[0] == key else None
+
+    def store_lint(self, index: int, key: tuple, issues: List[Dict]):
+        with self.lock:
+            self.lint_results[index] = (key, issues)
+
+    def cached_alignment(self, index: int, stamp: tuple):
+        """(True, estimate) if the track alignment of an episode was estimated from files matching stamp"""
+        with self.lock:
+            item = self.alignments.get(index)
+            return (True, item[1]) if item is not None and item[0] == stamp else (False, None)
+
+    def store_alignment(self, index: int, stamp: tuple, estimate):
+        with self.lock:
+            self.alignments[index] = (stamp, estimate)
+
+    def _load_state(self):
+        state = self.db.load_project(self.id)
+        if state is None:
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                return
+            print(f"Importing project state of {self.id} from {self.state_file}")
+            self.db.save_project(self.id, state.get('video_base_path', ''), state.get('matches', []))
+        self.matches = state.get('matches', [])
+        self.video_base_path = state.get('video_base_path', '')
+
+    def save_state(self):
+        """Persist the match set and video root so a restart restores the project"""
+        with self.lock:
+            matches = [dict(m) for m in self.matches]
+            video_base_path = self.video_base_path
+        try:
+            self.db.save_project(self.id, video_base_path, matches)
+        except sqlite3.Error as e:
+            print(f"Failed to save project state {self.id}: {e}")
+
+
+class ProjectStore:
+    """Lazily created projects keyed by ID
+
+    Lookups of existing projects take no lock; the store lock is only held
+    while a new project is being created.
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self.projects_dir = os.path.join(base_dir, 'projects')
+        self.db = ProjectDB(os.path.join(base_dir, 'projects.db'))
+        self._projects: Dict[str, Project] = {}
+        self._lock = threading.Lock()
+
+    def root_for(self, project_id: str) -> str:
+        if project_id == DEFAULT_PROJECT:
+            return self.base_dir
+        return os.path.join(self.projects_dir, project_id)
+
+    def get(self, project_id: str = DEFAULT_PROJECT) -> Project:
+        """
+        Project for project_id, creating its directories on first use
+
+        Raises:
+            ValueError: if project_id is not a valid ID
+        """
+        project = self._projects.get(project_id)
+        if project is not None:
+            return project
+        if not valid_project_id(project_id):
+            raise ValueError(f"Invalid project id: {project_id!r}")
+        with self._lock:
+            project = self._projects.get(project_id)
+            if project is None:
+                project = Project(project_id, self.root_for(project_id), self.db)
+                self._projects[project_id] = project
+        return project
+
+    def list(self) -> List[str]:
+        """IDs of loaded projects and projects found on disk"""
+        ids = {DEFAULT_PROJECT, *self._projects, *self.db.project_ids()}
+        try:
+            ids.update(n for n in os.listdir(self.projects_dir)
+                       if valid_project_id(n) and os.path.isdir(os.path.join(self.projects_dir, n)))
+        except OSError:
+            pass
+        return sorted(ids)
@@ -0,0 +1,153 @@
+"""
+批量调轴 - 用 NumPy 对整集（或整季）字幕的毫秒时间数组做平移、缩放、帧率转换和最小间隔对齐
+
+操作按顺序执行，作用于 [from_ms, to_ms) 内开始的字幕（未指定则为全部）:
+    {"op": "shift",   "ms": 1500}                                   整体平移
+    {"op": "scale",   "from": [a, b], "to": [a2, b2]}               两点线性映射：a->a2, b->b2
+    {"op": "fps",     "from": "23.976", "to": "25"}                 帧率转换（时间乘以 from/to）
+    {"op": "min_gap", "ms": 80}                                     与下一条间隔不足时提前结束
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from backend.project_db import time_to_ms
+    from backend.lint import MIN_GAP_MS
+except ImportError:
+    from project_db import time_to_ms
+    from lint import MIN_GAP_MS
+
+FPS_PRESETS = {
+    '23.976': 24000 / 1001,
+    '24': 24.0,
+    '25': 25.0,
+    '29.97': 30000 / 1001,
+    '30': 30.0,
+}
+MIN_DURATION_MS = 300  # min_gap 不会把字幕缩短到此长度以下（同时出现的字幕保持不变）
+MAX_TIME_MS = 100 * 3600 * 1000 - 1  # SRT 时间的小时只有两位
+
+
+def parse_fps(value) -> float:
+    """Frame rate from a preset name ("23.976") or a positive number"""
+    if isinstance(value, str) and value in FPS_PRESETS:
+        return FPS_PRESETS[value]
+    try:
+        fps = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"fps must be one of {', '.join(FPS_PRESETS)} or a number, got {value!r}")
+    if not 1 <= fps <= 240:
+        raise ValueError(f"fps out of range: {value!r}")
+    # 23.976 / 29.97 写成小数时按 NTSC 的精确值处理
+    for preset in FPS_PRESETS.values():
+        if abs(fps - preset) < 0.001:
+            return preset
+    return fps
+
+
+def _pair(op, field):
+    value = op.get(field)
+    if not isinstance(value, (list, tuple)) or len(value) != 2 or not all(isinstance(v, (int, float)) for v in value):
+        raise ValueError(f"scale {field} must be two times in ms, got {value!r}")
+    return float(value[0]), float(value[1])
+
+
+def validate_ops(ops: List[Dict]) -> List[Tuple]:
+    """
+    Check timing ops and convert them to (kind, args) tuples
+
+    Raises:
+        ValueError: for unknown ops or invalid arguments
+    """
+    if not ops:
+        raise ValueError("no timing ops given")
+    steps = []
+    for op in ops:
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind == 'shift':
+            ms = op.get('ms')
+            if not isinstance(ms, (int, float)):
+                raise ValueError(f"shift ms must be a number, got {ms!r}")
+            steps.append(('shift', float(ms)))
+        elif kind == 'scale':
+            (a, b), (a2, b2) = _pair(op, 'from'), _pair(op, 'to')
+            if a == b:
+                raise ValueError("scale anchors must be two different times")
+            steps.append(('scale', a, a2, (b2 - a2) / (b - a)))
+        elif kind == 'fps':
+            steps.append(('scale', 0.0, 0.0, parse_fps(op.get('from')) / parse_fps(op.get('to'))))
+        elif kind == 'min_gap':
+            ms = op.get('ms', MIN_GAP_MS)
+            if not isinstance(ms, (int, float)) or ms < 0:
+                raise ValueError(f"min_gap ms must be a non-negative number, got {ms!r}")
+            steps.append(('min_gap', float(ms)))
+        else:
+            raise ValueError(f"unknown timing op {kind!r}")
+    return steps
+
+
+def snap_min_gap(starts: np.ndarray, ends: np.ndarray, gap: float, mask: np.ndarray) -> np.ndarray:
+    """Ends pulled back so each cue leaves gap ms before the next one starts"""
+    order = np.argsort(starts, kind='stable')
+    s, e = starts[order], ends[order]
+    limit = s[1:] - gap
+    snap = (e[:-1] > limit) & (limit - s[:-1] >= MIN_DURATION_MS) & mask[order][:-1]
+    e[:-1] = np.where(snap, limit, e[:-1])
+    new_ends = ends.copy()
+    new_ends[order] = e
+    return new_ends
+
+
+def retime_arrays(starts: np.ndarray, ends: np.ndarray, steps: List[Tuple],
+                  mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Apply validated steps to float ms arrays; only cues where mask is True move"""
+    if mask is None:
+        mask = np.ones(len(starts), dtype=bool)
+    starts, ends = starts.astype(np.float64), ends.astype(np.float64)
+    for step in steps:
+        kind = step[0]
+        if kind == 'shift':
+            starts = np.where(mask, starts + step[1], starts)
+            ends = np.where(mask, ends + step[1], ends)
+        elif kind == 'scale':
+            _, anchor, target, factor = step
+            starts = np.where(mask, target + (starts - anchor) * factor, starts)
+            ends = np.where(mask, target + (ends - anchor) * factor, ends)
+        elif kind == 'min_gap' and len(starts) > 1:
+            ends = snap_min_gap(starts, ends, step[1], mask)
+    starts = np.clip(np.rint(starts), 0, MAX_TIME_MS).astype(np.int64)
+    ends = np.clip(np.rint(ends), 0, MAX_TIME_MS).astype(np.int64)
+    return starts, np.maximum(ends, starts)
+
+
+def ms_to_times(values: np.ndarray) -> List[str]:
+    """SRT timestamps (00:00:01,000) for an array of ms"""
+    h, rest = np.divmod(values, 3600000)
+    m, rest = np.divmod(rest, 60000)
+    s, ms = np.divmod(rest, 1000)
+    return [f"{a:02d}:{b:02d}:{c:02d},{d:03d}" for a, b, c, d in zip(h.tolist(), m.tolist(), s.tolist(), ms.tolist())]
+
+
+def retime_blocks(blocks: List[Dict], steps: List[Tuple], from_ms: Optional[int] = None,
+                  to_ms: Optional[int] = None) -> Tuple[List[Dict], np.ndarray, np.ndarray, int]:
+    """
+    Retimed copies of subtitle blocks
+
+    Returns:
+        (blocks, new start ms, new end ms, number of cues whose start or end changed)
+    """
+    if not blocks:
+        return [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0
+    starts = np.fromiter((time_to_ms(b['start']) for b in blocks), dtype=np.int64, count=len(blocks))
+    ends = np.fromiter((time_to_ms(b['end']) for b in blocks), dtype=np.int64, count=len(blocks))
+    mask = np.ones(len(blocks), dtype=bool)
+    if from_ms is not None:
+        mask &= starts >= from_ms
+    if to_ms is not None:
+        mask &= starts < to_ms
+    new_starts, new_ends = retime_arrays(starts, ends, steps, mask)
+    changed = int(np.count_nonzero((new_starts != starts) | (new_ends != ends)))
+    retimed = [dict(b, start=start, end=end)
+               for b, start, end in zip(blocks, ms_to_times(new_starts), ms_to_times(new_ends))]
+    return retimed, new_starts, new_ends, changed
@@ -0,0 +1,165 @@
+"""
+字幕输出 - 按格式名注册的写出器：SRT、ASS、WebVTT，以及中外双语 SRT/ASS
+
+写出器逐条写入文件对象（磁盘文件、zip 成员或 StringIO），不在内存中拼出整个文件。
+单语格式接收 {index, start, end, text} 块；双语格式接收合并后的
+{start, end, zh_text, en_text} 块，中文在上、外语在下。
+ASS 使用原文件 [Events] Format 行之前的全部内容作为文件头（见 project_db.ass_header），
+没有原文件时使用 DEFAULT_ASS_HEADER。
+"""
+import io
+import os
+import re
+from typing import Callable, Dict, List, Optional, TextIO
+
+try:
+    from backend.srt_parser import srt_time_to_ass
+except ImportError:
+    from srt_parser import srt_time_to_ass
+
+DEFAULT_ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,60,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,1,2,10,10,40,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+_ASS_TAGS = re.compile(r'\{[^}]*\}')
+_BLANK_LINES = re.compile(r'\n\s*\n')
+
+
+class Serializer:
+    """One registered output format"""
+    __slots__ = ('name', 'extension', 'media_type', 'bilingual', 'write')
+
+    def __init__(self, name: str, extension: str, media_type: str, bilingual: bool, write: Callable):
+        self.name = name
+        self.extension = extension
+        self.media_type = media_type
+        self.bilingual = bilingual
+        self.write = write  # write(f, blocks, header=None)
+
+
+SERIALIZERS: Dict[str, Serializer] = {}
+
+
+def register(name: str, extension: str, media_type: str = 'text/plain; charset=utf-8', bilingual: bool = False):
+    """Decorator adding a writer function write(f, blocks, header=None) to SERIALIZERS"""
+    def decorator(fn):
+        SERIALIZERS[name] = Serializer(name, extension, media_type, bilingual, fn)
+        return fn
+    return decorator
+
+
+def get_serializer(name: str) -> Serializer:
+    """
+    Raises:
+        ValueError: for unknown formats
+    """
+    serializer = SERIALIZERS.get(name)
+    if serializer is None:
+        raise ValueError(f"format must be one of {', '.join(SERIALIZERS)}, got {name!r}")
+    return serializer
+
+
+def serializer_for_path(path: str) -> Serializer:
+    """Single-language format of a subtitle file, by its extension (SRT by default)"""
+    ext = os.path.splitext(path)[1].lower()
+    for serializer in SERIALIZERS.values():
+        if serializer.extension == ext and not serializer.bilingual:
+            return serializer
+    return SERIALIZERS['srt']
+
+
+def dumps(name: str, blocks: List[Dict], header: Optional[str] = None) -> str:
+    buf = io.StringIO()
+    get_serializer(name).write(buf, blocks, header)
+    return buf.getvalue()
+
+
+def write_file(path: str, blocks: List[Dict], header: Optional[str] = None, name: Optional[str] = None):
+    """Stream blocks to path in its format (or name) via a temp file and os.replace"""
+    serializer = get_serializer(name) if name else serializer_for_path(path)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        serializer.write(f, blocks, header)
+    os.replace(tmp, path)
+
+
+def _ass_text(text: str) -> str:
+    # ASS 的一条 Dialogue 只能占一行，换行写成 \N
+    return text.replace('\r', '').replace('\n', '\\N')
+
+
+def _srt_text(text: str) -> str:
+    # 来自 ASS 的文本把 \N 换成真正的换行（SRT 原文不受影响）
+    return text.replace('\\N', '\n')
+
+
+def _plain_text(text: str) -> str:
+    """Text without ASS override tags and with \\N as real line breaks"""
+    text = _ASS_TAGS.sub('', text).replace('\\N', '\n').replace('\\n', '\n').replace('\\h', ' ')
+    return _BLANK_LINES.sub('\n', text).strip()
+
+
+def _stacked(block: Dict) -> List[str]:
+    return [t for t in ((block.get('zh_text') or '').strip(), (block.get('en_text') or '').strip()) if t]
+
+
+# ---------- 单语 ----------
+
+@register('srt', '.srt')
+def write_srt(f: TextIO, blocks: List[Dict], header: Optional[str] = None):
+    # 与 blocks_to_srt 相同：块之间空一行，文件以单个换行结束
+    separator = ''
+    for block in blocks:
+        f.write(f"{separator}{block['index']}\n{block['start']} --> {block['end']}\n{_srt_text(block['text'])}\n")
+        separator = '\n'
+
+
+@register('ass', '.ass')
+def write_ass(f: TextIO, blocks: List[Dict], header: Optional[str] = None):
+    f.write(header or DEFAULT_ASS_HEADER)
+    for block in blocks:
+        f.write(f"Dialogue: 0,{srt_time_to_ass(block['start'])},{srt_time_to_ass(block['end'])},"
+                f"Default,,0,0,0,,{_ass_text(block['text'])}\n")
+
+
+@register('vtt', '.vtt', 'text/vtt; charset=utf-8')
+def write_vtt(f: TextIO, blocks: List[Dict], header: Optional[str] = None):
+    f.write('WEBVTT\n')
+    for block in blocks:
+        # 提示文本中不能出现空行和 "-->"
+        text = _plain_text(block['text']).replace('-->', '->')
+        f.write(f"\n{block['start'].replace(',', '.')} --> {block['end'].replace(',', '.')}\n{text}\n")
+
+
+# ---------- 双语（合并后的块） ----------
+
+@register('srt_bilingual', '.srt', bilingual=True)
+def write_bilingual_srt(f: TextIO, blocks: List[Dict], header: Optional[str] = None):
+    index, separator = 0, ''
+    for block in blocks:
+        lines = _stacked(block)
+        if lines:
+            index += 1
+            text = _srt_text('\n'.join(lines))
+            f.write(f"{separator}{index}\n{block['start']} --> {block['end']}\n{text}\n")
+            separator = '\n'
+
+
+@register('ass_bilingual', '.ass', bilingual=True)
+def write_bilingual_ass(f: TextIO, blocks: List[Dict], header: Optional[str] = None):
+    f.write(header or DEFAULT_ASS_HEADER)
+    for block in blocks:
+        lines = _stacked(block)
+        if lines:
+            text = '\\N'.join(_ass_text(t) for t in lines)
+            f.write(f"Dialogue: 0,{srt_time_to_ass(block['start'])},{srt_time_to_ass(block['end'])},"
+                    f"Default,,0,0,0,,{text}\n")
@@ -1,4 +1,5 @@
 import re
+from bisect import bisect_left, bisect_right
 from typing import List, Dict
 
 def parse_srt(content: str) -> List[Dict]:
@@ -180,6 +181,13 @@ def merge_blocks_by_time(zh_blocks: List[Dict], en_blocks: List[Dict], primary:
     
     used_secondary = set()
     
+    # 预先转换时间并按开始时间排序，只检查时间上可能匹配的候选
+    s_starts = [time_to_seconds(b['start']) for b in secondary_blocks]
+    s_ends = [time_to_seconds(b['end']) for b in secondary_blocks]
+    order = sorted(range(len(secondary_blocks)), key=lambda i: s_starts[i])
+    sorted_starts = [s_starts[i] for i in order]
+    max_duration = max([0.0] + [e - s for s, e in zip(s_starts, s_ends)])
+    
     for p_block in primary_blocks:
         p_start = time_to_seconds(p_block['start'])
         p_end = time_to_seconds(p_block['end'])
@@ -189,12 +197,16 @@ def merge_blocks_by_time(zh_blocks: List[Dict], en_blocks: List[Dict], primary:
         best_match = None
         best_distance = float('inf')
         
-        for i, s_block in enumerate(secondary_blocks):
+        # 重叠或中点距离小于 tolerance 的字幕一定在这个开始时间范围内（多留 1 秒余量）
+        lo = bisect_left(sorted_starts, min(p_start, p_mid - tolerance) - max_duration - 1.0)
+        hi = bisect_right(sorted_starts, max(p_end, p_mid + tolerance) + 1.0)
+        
+        for i in order[lo:hi]:
             if i in used_secondary:
                 continue
             
-            s_start = time_to_seconds(s_block['start'])
-            s_end = time_to_seconds(s_block['end'])
+            s_start = s_starts[i]
+            s_end = s_ends[i]
             s_mid = (s_start + s_end) / 2
             
             # Check if time ranges overlap or are very close
@@ -204,7 +216,8 @@ def merge_blocks_by_time(zh_blocks: List[Dict], en_blocks: List[Dict], primary:
             overlap = min(p_end, s_end) - max(p_start, s_start)
             
             if overlap > 0 or distance < tolerance:
-                if distance < best_distance:
+                # 距离相同时取原顺序中靠前的
+                if distance < best_distance or (distance == best_distance and i < best_match):
                     best_distance = distance
                     best_match = i
         
@@ -318,6 +331,10 @@ def merge_union(zh_blocks: List[Dict], en_blocks: List[Dict], tolerance: float =
             
             other = all_segments[j]
             
+            # 按开始时间排序，之后的字幕都不会再与当前字幕重叠
+            if other['start_sec'] >= current['end_sec']:
+                break
+            
             # Calculate overlap
             overlap_start = max(current['start_sec'], other['start_sec'])
             overlap_end = min(current['end_sec'], other['end_sec'])
@@ -0,0 +1,168 @@
+"""
+轨道对齐 - 用 FFT 互相关估计外语字幕相对中文字幕的整体偏移和线性漂移
+
+两条轨道按 RASTER_MS 栅格化为"有字幕/无字幕"的活动信号（去均值后互相关）。
+漂移会抹平相关峰，所以先按常见帧率换算比例（FPS_PRESETS 两两之比）补偿外语轨道，
+取整体相关度最高的比例；再把中文时间轴分成若干段，每段在 ±MAX_OFFSET_MS 内
+分别求局部偏移，去掉离群段后用加权最小二乘拟合剩余的偏移和漂移，得到
+外语时间 = 中文时间 × (1 + 漂移) + 偏移；可信的分段不足两段时只用整体偏移。
+估计可信且超出合并容差时，合并前把外语时间映射回中文时间轴。
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from backend.project_db import time_to_ms
+    from backend.retime import FPS_PRESETS, retime_arrays, ms_to_times
+except ImportError:
+    from project_db import time_to_ms
+    from retime import FPS_PRESETS, retime_arrays, ms_to_times
+
+RASTER_MS = 100            # 栅格精度
+MAX_OFFSET_MS = 60000      # 整体偏移的搜索范围
+MAX_RESIDUAL_MS = 500     # 拟合后局部偏移偏离直线超过此值的分段视为离群
+SEGMENT_MS = 30000         # 每段的目标长度（至少 2 段，最多 MAX_SEGMENTS 段）
+MAX_SEGMENTS = 60
+MIN_CUES = 20              # 任一轨道少于这么多条时不估计
+MIN_SCORE = 0.3            # 归一化互相关峰值低于此值视为不可信
+MIN_OFFSET_MS = 200        # 偏移和漂移造成的最大位移都小于此值时不调整
+MAX_DRIFT = 0.05           # 分段拟合出的剩余漂移超过 5% 时视为估计错误
+# 帧率换算造成的漂移（如 25 -> 23.976 约 +4.3%），0 在最前面，相关度相同时优先
+DRIFT_CANDIDATES = sorted({round(a / b - 1, 9) for a in FPS_PRESETS.values() for b in FPS_PRESETS.values()
+                           if abs(a / b - 1) <= MAX_DRIFT}, key=abs)
+
+
+def _intervals(blocks: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    starts = np.fromiter((time_to_ms(b['start']) for b in blocks), dtype=np.int64, count=len(blocks))
+    ends = np.fromiter((time_to_ms(b['end']) for b in blocks), dtype=np.int64, count=len(blocks))
+    return starts, np.maximum(ends, starts)
+
+
+def activity(starts: np.ndarray, ends: np.ndarray, length: int, step: int = RASTER_MS) -> np.ndarray:
+    """0/1 signal of length samples that is 1 while any cue is shown"""
+    first = np.clip(starts // step, 0, length)
+    last = np.clip((ends + step - 1) // step, 0, length)
+    edges = np.zeros(length + 1, dtype=np.int32)
+    np.add.at(edges, first, 1)
+    np.add.at(edges, last, -1)
+    return (np.cumsum(edges[:-1]) > 0).astype(np.float64)
+
+
+def cross_correlate(a: np.ndarray, b: np.ndarray, max_lag: int, center: int = 0) -> Tuple[int, float]:
+    """
+    Lag k in [center - max_lag, center + max_lag] maximizing sum a[t] * b[t + k]
+
+    Both signals are mean-removed first; the score is the peak divided by the
+    norms of a and b (1.0 for identical shapes).
+
+    Returns:
+        (lag in samples, score)
+    """
+    a = a - a.mean()
+    b = b - b.mean()
+    norm = np.sqrt(np.dot(a, a) * np.dot(b, b))
+    if norm == 0:
+        return center, 0.0
+    n = 1 << int(len(a) + len(b) - 1).bit_length()
+    corr = np.fft.irfft(np.conj(np.fft.rfft(a, n)) * np.fft.rfft(b, n), n)
+    lags = np.arange(center - max_lag, center + max_lag + 1)
+    lags = lags[(lags > -len(a)) & (lags < len(b))]
+    if not len(lags):
+        return center, 0.0
+    values = corr[lags % n]
+    best = int(np.argmax(values))
+    return int(lags[best]), float(values[best] / norm)
+
+
+def estimate_alignment(zh_blocks: List[Dict], en_blocks: List[Dict]) -> Optional[Dict]:
+    """
+    Offset and linear drift of the foreign track against the Chinese one
+
+    Returns:
+        dict with offset_ms, drift_ppm, score, segments and apply (True if the
+        estimate is trustworthy and large enough to matter), or None if either
+        track has too few cues
+    """
+    if len(zh_blocks) < MIN_CUES or len(en_blocks) < MIN_CUES:
+        return None
+    zh_starts, zh_ends = _intervals(zh_blocks)
+    en_starts, en_ends = _intervals(en_blocks)
+    length = int(max(zh_ends.max(), en_ends.max() / (1 + min(DRIFT_CANDIDATES))) // RASTER_MS) + 2
+    zh = activity(zh_starts, zh_ends, length)
+    max_lag = MAX_OFFSET_MS // RASTER_MS
+
+    # 整体：逐个尝试帧率换算比例，外语时间先除以 (1 + 比例)
+    best = None
+    for candidate in DRIFT_CANDIDATES:
+        signal = activity(*map_times(en_starts, en_ends, 0.0, candidate), length)
+        lag, score = cross_correlate(zh, signal, max_lag)
+        if best is None or score > best[2] + 1e-9:
+            best = (candidate, lag, score, signal)
+    base_drift, base_lag, _, en = best
+
+    # 分段求局部偏移（以整体偏移为中心）：中文第 lo 个采样对应外语第 lo + 偏移 个采样
+    span_start = int(zh_starts.min() // RASTER_MS)
+    span_end = int(zh_ends.max() // RASTER_MS) + 1
+    count = int(np.clip((span_end - span_start) * RASTER_MS // SEGMENT_MS, 2, MAX_SEGMENTS))
+    bounds = np.linspace(span_start, span_end, count + 1).astype(int)
+    centers, lags, weights = [], [], []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        segment = zh[lo:hi]
+        if segment.min() == segment.max():
+            continue
+        b_lo, b_hi = max(0, lo + base_lag - max_lag), min(length, hi + base_lag + max_lag)
+        local, local_score = cross_correlate(segment, en[b_lo:b_hi], max_lag, lo + base_lag - b_lo)
+        if local_score >= MIN_SCORE:
+            centers.append((lo + hi) / 2 * RASTER_MS)
+            lags.append((local + b_lo - lo) * RASTER_MS)
+            weights.append(local_score)
+    centers, lags, weights = np.array(centers), np.array(lags, dtype=np.float64), np.array(weights)
+
+    # 补偿后的轨道上：映射时间 = 中文时间 × (1 + 剩余漂移) + 剩余偏移
+    offset_ms, drift = float(base_lag * RASTER_MS), 0.0
+    keep = np.ones(len(centers), dtype=bool)
+    while keep.sum() >= 2:
+        slope, intercept = np.polyfit(centers[keep], lags[keep], 1, w=weights[keep])
+        residual = np.abs(lags - (intercept + slope * centers))
+        worst = int(np.argmax(np.where(keep, residual, -1)))
+        if residual[worst] <= MAX_RESIDUAL_MS:
+            if abs(slope) <= MAX_DRIFT:
+                offset_ms, drift = float(intercept), float(slope)
+            break
+        keep[worst] = False
+    # 外语时间 = 映射时间 × (1 + 比例)
+    offset_ms *= 1 + base_drift
+    drift = (1 + drift) * (1 + base_drift) - 1
+
+    # 用最终估计把外语轨道映射回来，重新计算整体相关度
+    mapped_starts, mapped_ends = map_times(en_starts, en_ends, offset_ms, drift)
+    _, score = cross_correlate(zh, activity(mapped_starts, mapped_ends, length), 1)
+    shift = max(abs(offset_ms), abs(offset_ms + drift * float(zh_ends.max())))
+    return {
+        'offset_ms': int(round(offset_ms)),
+        'drift_ppm': int(round(drift * 1_000_000)),
+        'score': round(score, 3),
+        'segments': int(keep.sum()),
+        'apply': score >= MIN_SCORE and shift >= MIN_OFFSET_MS,
+    }
+
+
+def map_times(starts: np.ndarray, ends: np.ndarray, offset_ms: float, drift: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Foreign times mapped onto the Chinese timeline: (t - offset) / (1 + drift)"""
+    return retime_arrays(starts, ends, alignment_steps(offset_ms, drift))
+
+
+def alignment_steps(offset_ms: float, drift: float) -> List[Tuple]:
+    """retime steps (see retime.validate_ops) undoing an estimated offset and drift"""
+    return [('scale', float(offset_ms), 0.0, 1 / (1 + drift))]
+
+
+def align_blocks(en_blocks: List[Dict], estimate: Optional[Dict]) -> List[Dict]:
+    """Copies of the foreign blocks moved onto the Chinese timeline, if the estimate applies"""
+    if not estimate or not estimate['apply']:
+        return en_blocks
+    starts, ends = _intervals(en_blocks)
+    new_starts, new_ends = map_times(starts, ends, estimate['offset_ms'], estimate['drift_ppm'] / 1_000_000)
+    return [dict(b, start=start, end=end)
+            for b, start, end in zip(en_blocks, ms_to_times(new_starts), ms_to_times(new_ends))]
@@ -0,0 +1,201 @@
+"""
+翻译记忆 - 收集各集中文/外语对齐后的句对，按原文查找已有译文
+
+句对来自 merge_blocks_by_time（primary=zh）的合并结果。原文先归一化（NFKC、去掉标签、
+标点和空白、小写）后精确查找；找不到时按字符 bigram 的 Dice 系数做模糊匹配，
+只从最少见的几个 bigram 的倒排表里取候选，十万句对时单次查询仍在 1 毫秒以内。
+在编辑器中保存过的译文视为"已确认"，AI 修正时这些句子不再发送给模型。
+"""
+import math
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+FUZZY_MIN_SCORE = 0.6     # 模糊匹配的最低 Dice 系数
+MAX_CANDIDATES = 400      # 单次模糊查询最多比较的句对数（常见 bigram 的倒排表只取前面一部分）
+
+_TAGS = re.compile(r'\{[^}]*\}|<[^>]*>|\\[Nnh]')
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text: str) -> str:
+    """Lookup key of a source line: NFKC, no tags, punctuation or whitespace, lowercase"""
+    return _NON_WORD.sub('', unicodedata.normalize('NFKC', _TAGS.sub('', text or '')).lower())
+
+
+def ngrams(key: str) -> frozenset:
+    if len(key) < 2:
+        return frozenset([key]) if key else frozenset()
+    return frozenset(key[i:i + 2] for i in range(len(key) - 1))
+
+
+class Entry:
+    """All translations seen for one normalized source line"""
+    __slots__ = ('source', 'key', 'grams', 'targets', 'approved')
+
+    def __init__(self, source: str, key: str):
+        self.source = source
+        self.key = key
+        self.grams = ngrams(key)
+        self.targets: Dict[str, int] = {}  # 译文 -> 出现次数
+        self.approved: Optional[str] = None
+
+    def best(self) -> Optional[str]:
+        """Approved translation, else the most frequent one"""
+        if self.approved:
+            return self.approved
+        if not self.targets:
+            return None
+        return max(self.targets.items(), key=lambda item: item[1])[0]
+
+    def to_dict(self, score: float = 1.0) -> Dict:
+        return {'source': self.source, 'target': self.best(), 'score': round(score, 3),
+                'approved': self.approved is not None, 'count': sum(self.targets.values())}
+
+
+class TranslationMemory:
+    """
+    In-memory translation memory of one project
+
+    Each episode contributes its aligned pairs under a stamp of its subtitle
+    files; replace_episode() swaps the contribution when the files change.
+    """
+
+    def __init__(self):
+        self._entries: List[Entry] = []
+        self._by_key: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = {}
+        self._episodes: Dict[object, tuple] = {}  # 剧集 -> (文件状态, 句对)
+        self.approved_loaded = False
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _entry(self, source: str, create: bool = True) -> Optional[Entry]:
+        key = normalize(source)
+        if not key:
+            return None
+        entry_id = self._by_key.get(key)
+        if entry_id is not None:
+            return self._entries[entry_id]
+        if not create:
+            return None
+        entry = Entry(source.strip(), key)
+        entry_id = len(self._entries)
+        self._entries.append(entry)
+        self._by_key[key] = entry_id
+        for gram in entry.grams:
+            self._postings.setdefault(gram, []).append(entry_id)
+        return entry
+
+    def add(self, source: str, target: str, count: int = 1):
+        target = (target or '').strip()
+        with self.lock:
+            entry = self._entry(source)
+            if entry is not None and target:
+                entry.targets[target] = entry.targets.get(target, 0) + count
+
+    def remove(self, source: str, target: str):
+        target = (target or '').strip()
+        with self.lock:
+            entry = self._entry(source, create=False)
+            if entry is None or target not in entry.targets:
+                return
+            entry.targets[target] -= 1
+            if entry.targets[target] <= 0:
+                del entry.targets[target]
+
+    def approve(self, source: str, target: str) -> Optional[str]:
+        """Mark target as the approved translation of source; returns the key, or None for empty lines"""
+        with self.lock:
+            entry = self._entry(source)
+            if entry is None:
+                return None
+            entry.approved = (target or '').strip() or None
+            return entry.key
+
+    def load_approved(self, pairs: Iterable[Tuple[str, str]]):
+        with self.lock:
+            for source, target in pairs:
+                self.approve(source, target)
+            self.approved_loaded = True
+
+    def episode_stamp(self, episode):
+        with self.lock:
+            item = self._episodes.get(episode)
+            return item[0] if item is not None else None
+
+    def replace_episode(self, episode, stamp, pairs: List[Tuple[str, str]]):
+        """Swap the pairs an episode contributes (its files changed)"""
+        with self.lock:
+            old = self._episodes.pop(episode, None)
+            if old is not None:
+                for source, target in old[1]:
+                    self.remove(source, target)
+            for source, target in pairs:
+                self.add(source, target)
+            if stamp is not None:
+                self._episodes[episode] = (stamp, pairs)
+
+    def episodes(self) -> List:
+        with self.lock:
+            return list(self._episodes)
+
+    # ---------- 查询 ----------
+
+    def exact(self, source: str) -> Optional[Entry]:
+        with self.lock:
+            entry = self._entry(source, create=False)
+            return entry if entry is not None and entry.best() else None
+
+    def approved(self, source: str) -> Optional[str]:
+        """Approved translation of source, if any"""
+        with self.lock:
+            entry = self._entry(source, create=False)
+            return entry.approved if entry is not None else None
+
+    def fuzzy(self, source: str, limit: int = 5, min_score: float = FUZZY_MIN_SCORE) -> List[Tuple[float, Entry]]:
+        """
+        Entries whose bigram Dice coefficient with source is at least min_score
+
+        Dice >= t needs an overlap of at least t*|A|/(2-t) grams, so a match must
+        share one of the |A| - that + 1 rarest grams of the query (prefix filter).
+        At most MAX_CANDIDATES entries are compared, which keeps queries made of
+        very common grams bounded at the cost of possibly missing some matches.
+        """
+        key = normalize(source)
+        grams = ngrams(key)
+        if not grams:
+            return []
+        size = len(grams)
+        min_overlap = max(1, math.ceil(min_score * size / (2 - min_score)))
+        max_size = size * (2 - min_score) / min_score
+        with self.lock:
+            postings = sorted((self._postings.get(g, ()) for g in grams), key=len)
+            candidates = set()
+            for ids in postings[:size - min_overlap + 1]:
+                candidates.update(ids[:MAX_CANDIDATES - len(candidates)])
+                if len(candidates) >= MAX_CANDIDATES:
+                    break
+            scored = []
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                other = len(entry.grams)
+                if other > max_size or entry.key == key:
+                    continue
+                score = 2 * len(grams & entry.grams) / (size + other)
+                if score >= min_score and entry.best():
+                    scored.append((score, entry))
+        scored.sort(key=lambda item: (-item[0], -sum(item[1].targets.values())))
+        return scored[:limit]
+
+    def lookup(self, source: str, limit: int = 5, min_score: float = FUZZY_MIN_SCORE) -> List[Dict]:
+        """Suggestions for source: the exact match first, then fuzzy ones"""
+        results = []
+        entry = self.exact(source)
+        if entry is not None:
+            results.append(entry.to_dict())
+        results += [e.to_dict(score) for score, e in self.fuzzy(source, limit - len(results), min_score)]
+        return results
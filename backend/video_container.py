@@ -0,0 +1,137 @@
+"""
+视频容器索引 - 首次打开视频时记录顶层 box（ftyp/moov/mdat）的位置，并把 moov 缓存在内存中
+
+很多 MP4 不是 fast-start（moov 在文件末尾），播放器要先读到 moov 才能显示首帧。
+有了索引，/video/stream 可以让第一个响应停在 mdat 头部，播放器随即跳到 moov，
+而 moov 的请求直接从内存返回。MKV/AVI 等其他容器只用于确定 Content-Type。
+"""
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+CONTENT_TYPES = {
+    '.mp4': 'video/mp4',
+    '.m4v': 'video/mp4',
+    '.mov': 'video/quicktime',
+    '.mkv': 'video/x-matroska',
+    '.webm': 'video/webm',
+    '.avi': 'video/x-msvideo',
+}
+MP4_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+MAX_BOXES = 4096                       # 顶层 box 数量上限（防止损坏文件导致长时间扫描）
+MOOV_MAX_BYTES = 32 * 1024 * 1024      # 超过此大小的 moov 不缓存
+MOOV_CACHE_BYTES = 128 * 1024 * 1024   # 所有缓存的 moov 总大小上限
+LAYOUT_CACHE_SIZE = 256
+
+
+class Box(NamedTuple):
+    kind: str
+    offset: int
+    size: int
+    header: int  # 头部长度：8，或使用 64 位长度时为 16
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.size
+
+
+def read_boxes(f, file_size: int) -> List[Box]:
+    """Top-level boxes of an MP4/QuickTime file, stopping at the first malformed header"""
+    boxes = []
+    offset = 0
+    while offset + 8 <= file_size and len(boxes) < MAX_BOXES:
+        f.seek(offset)
+        header = f.read(16)
+        if len(header) < 8:
+            break
+        size, kind = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                break
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset  # 延伸到文件末尾
+        if size < header_size:
+            break
+        boxes.append(Box(kind.decode('latin-1'), offset, size, header_size))
+        offset += size
+    return boxes
+
+
+class VideoLayout:
+    """Container type and top-level box layout of one video file"""
+
+    def __init__(self, stamp: tuple, content_type: str, boxes: List[Box], moov: Optional[bytes]):
+        self.stamp = stamp
+        self.content_type = content_type
+        self.boxes = boxes
+        self.moov = moov  # moov 的完整字节（含头部），未缓存时为 None
+
+    def box(self, kind: str) -> Optional[Box]:
+        for b in self.boxes:
+            if b.kind == kind:
+                return b
+        return None
+
+    @property
+    def moov_after_mdat(self) -> bool:
+        """True for files that are not fast-start (moov stored after the media data)"""
+        moov, mdat = self.box('moov'), self.box('mdat')
+        return moov is not None and mdat is not None and moov.offset > mdat.offset
+
+
+def inspect_video(path: str, st: os.stat_result) -> VideoLayout:
+    """Read the layout of path (and its moov, if small enough)"""
+    ext = os.path.splitext(path)[1].lower()
+    content_type = CONTENT_TYPES.get(ext, 'application/octet-stream')
+    boxes, moov = [], None
+    if ext in MP4_EXTENSIONS:
+        with open(path, 'rb') as f:
+            boxes = read_boxes(f, st.st_size)
+            ftyp = next((b for b in boxes if b.kind == 'ftyp'), None)
+            if ftyp is not None and ext != '.mov':
+                f.seek(ftyp.offset + ftyp.header)
+                if f.read(4) == b'qt  ':
+                    content_type = 'video/quicktime'
+            box = next((b for b in boxes if b.kind == 'moov'), None)
+            if box is not None and box.size <= MOOV_MAX_BYTES and box.end <= st.st_size:
+                f.seek(box.offset)
+                moov = f.read(box.size)
+    return VideoLayout((st.st_size, st.st_mtime_ns), content_type, boxes, moov)
+
+
+class VideoLayoutCache:
+    """Layouts of opened videos, validated by size and mtime
+
+    Eviction keeps both the entry count and the total cached moov size bounded.
+    """
+
+    def __init__(self, size: int = LAYOUT_CACHE_SIZE, moov_bytes: int = MOOV_CACHE_BYTES):
+        self.size = size
+        self.moov_bytes = moov_bytes
+        self._layouts: "OrderedDict[str, VideoLayout]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str, st: os.stat_result) -> VideoLayout:
+        stamp = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            layout = self._layouts.get(path)
+            if layout is not None and layout.stamp == stamp:
+                self._layouts.move_to_end(path)
+                return layout
+        layout = inspect_video(path, st)
+        with self._lock:
+            old = self._layouts.pop(path, None)
+            if old is not None:
+                self._cached_bytes -= len(old.moov or b'')
+            self._layouts[path] = layout
+            self._cached_bytes += len(layout.moov or b'')
+            while len(self._layouts) > 1 and (len(self._layouts) > self.size or self._cached_bytes > self.moov_bytes):
+                _, evicted = self._layouts.popitem(last=False)
+                self._cached_bytes -= len(evicted.moov or b'')
+        return layout
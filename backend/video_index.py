@@ -0,0 +1,121 @@
+"""
+视频文件名索引 - 字符 n-gram 倒排索引，用于在大型视频库中按剧名筛选候选视频
+
+文件名在扫描目录时同步建索引；查询时先做精确子串匹配，
+没有结果时按 n-gram 重合度做模糊匹配。繁简体在归一化时统一为简体。
+"""
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from backend.logger import debug
+except ImportError:
+    from logger import debug
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov')
+
+# 常见繁体 -> 简体对照（剧名常用字），用于繁简体互查
+_TRAD_SIMP_PAIRS = (
+    "們们 個个 來来 時时 後后 說说 這这 國国 過过 會会 對对 無无 開开 關关 門门 問问 間间 東东 車车 "
+    "長长 見见 頭头 從从 點点 發发 現现 學学 實实 體体 電电 話话 語语 讓让 錢钱 愛爱 戀恋 歡欢 劇剧 "
+    "夢梦 龍龙 鳳凤 華华 麗丽 傳传 記记 億亿 萬万 總总 嬌娇 寵宠 婦妇 媽妈 兒儿 孫孙 親亲 韓韩 漢汉 "
+    "貴贵 處处 氣气 風风 雲云 飛飞 劍剑 俠侠 殺杀 戰战 爭争 鬥斗 勝胜 敗败 義义 軍军 醫医 藥药 療疗 "
+    "報报 復复 離离 結结 緣缘 選选 擇择 買买 賣卖 歸归 還还 臉脸 聲声 場场 豐丰 產产 業业 權权 勢势 "
+    "幫帮 衛卫 護护 團团 陣阵 隊队 廳厅 館馆 樓楼 層层 園园 灣湾 島岛 灘滩 嶺岭 峽峡 邊边 遠远 運运 "
+    "動动 靜静 驚惊 鴻鸿 閃闪 燈灯 陽阳 陰阴 蘭兰 紅红 綠绿 藍蓝 黃黄 顏颜 儀仪 歲岁 羅罗 蕭萧 劉刘 "
+    "張张 陳陈 楊杨 趙赵 吳吴 鄭郑 謝谢 馮冯 鄧邓 許许 蘇苏 葉叶 範范 顧顾 盧卢 陸陆 錦锦 繡绣 絲丝 "
+    "線线 綿绵 純纯 師师 帥帅 將将 憶忆 戲戏 聽听 讀读 寫写 舊旧 緊紧 難难 雙双 條条 嗎吗 與与 為为 "
+    "給给 嫻娴 妝妆 賢贤 鏡镜 變变 轉转 換换 鎮镇 鄉乡 莊庄 歷历 顯显 縣县 軟软 殘残 誘诱 謀谋 計计 "
+    "錯错 隱隐 寶宝 貝贝 魚鱼 鳥鸟 馬马 騎骑 驕骄 極极 樂乐 導导 聯联 獨独 擊击 燒烧 熱热 涼凉 凍冻 "
+    "溫温 誰谁 憐怜 憂忧 慮虑 惡恶 靈灵 眾众 紀纪 鐵铁 銀银 鋒锋 鳴鸣 聖圣 瑤瑶 攜携 嶼屿 "
+    "闆板 韻韵 詩诗 夥伙 蓮莲 屬属 娛娱 壯壮 麼么 觀观 窮穷 擁拥 懷怀 裝装 錄录 綜综 藝艺"
+)
+_T2S = str.maketrans({pair[0]: pair[1] for pair in _TRAD_SIMP_PAIRS.split() if pair[0] != pair[1]})
+_SEPARATORS = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    """Fold width, case and traditional characters; drop separators"""
+    text = unicodedata.normalize('NFKC', text).lower().translate(_T2S)
+    return _SEPARATORS.sub('', text)
+
+
+class VideoIndex:
+    """Inverted character n-gram index over video filenames"""
+
+    def __init__(self, n: int = 2):
+        self.n = n
+        self.files: List[str] = []
+        self._norm: List[str] = []
+        self._postings: Dict[str, List[int]] = {}
+
+    def __len__(self):
+        return len(self.files)
+
+    def _grams(self, norm: str) -> List[str]:
+        if len(norm) < self.n:
+            return [norm] if norm else []
+        return [norm[i:i + self.n] for i in range(len(norm) - self.n + 1)]
+
+    def add(self, filename: str):
+        doc_id = len(self.files)
+        stem = os.path.splitext(filename)[0]
+        norm = normalize(stem)
+        self.files.append(filename)
+        self._norm.append(norm)
+        for gram in set(self._grams(norm)):
+            self._postings.setdefault(gram, []).append(doc_id)
+
+    def search(self, query: str, min_similarity: float = 0.6) -> List[str]:
+        """
+        Candidate files for a series name
+
+        Args:
+            query: series name (any width, case, traditional or simplified)
+            min_similarity: fraction of query n-grams a file must contain for a fuzzy hit
+
+        Returns:
+            Matching filenames in scan order
+        """
+        norm = normalize(query)
+        if not norm:
+            return []
+        grams = list(dict.fromkeys(self._grams(norm)))
+
+        if len(norm) < self.n:
+            ids = [i for i, name in enumerate(self._norm) if norm in name]
+            return [self.files[i] for i in ids]
+
+        # 精确匹配：取最短的倒排表作为候选，再校验子串
+        lists = [self._postings.get(g) for g in grams]
+        if all(lists):
+            shortest = min(lists, key=len)
+            exact = [i for i in shortest if norm in self._norm[i]]
+            if exact:
+                return [self.files[i] for i in exact]
+
+        # 模糊匹配：按命中的 n-gram 数量打分
+        counts = Counter()
+        for posting in lists:
+            if posting:
+                counts.update(posting)
+        needed = max(1, math.ceil(len(grams) * min_similarity))
+        fuzzy = sorted(i for i, hits in counts.items() if hits >= needed)
+        return [self.files[i] for i in fuzzy]
+
+
+def scan_videos(video_root: str, index: Optional[VideoIndex] = None) -> Tuple[List[str], VideoIndex]:
+    """Walk video_root collecting video filenames and building the n-gram index alongside"""
+    index = index or VideoIndex()
+    video_files = []
+    for root, dirs, files in os.walk(video_root):
+        for file in files:
+            if file.lower().endswith(VIDEO_EXTENSIONS):
+                video_files.append(file)
+                index.add(file)
+                debug("Found video: %s", file)
+    return video_files, index
@@ -0,0 +1,147 @@
+"""
+整季预热 - 匹配完成后在进程池中解码、解析并合并所有剧集的字幕
+
+解析结果写入项目数据库（之后打开任一集都无需再解析），合并结果放入合并缓存，
+中文/外语句对同时更新翻译记忆。子进程完成解码、解析、外语轨道对齐估计、合并和数据库行的准备，
+主进程只负责读写数据库（SQLite 连接不能跨进程共享）：已入库的字幕由主进程读出后交给子进程对齐和合并。
+上传后的导入（main.index_subtitles）也通过 parse_files 使用同样的进程池。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from backend.srt_parser import parse_srt, parse_ass, merge_blocks_by_time
+    from backend.project_db import ass_header, cue_rows
+    from backend.track_align import estimate_alignment, align_blocks
+except ImportError:
+    from srt_parser import parse_srt, parse_ass, merge_blocks_by_time
+    from project_db import ass_header, cue_rows
+    from track_align import estimate_alignment, align_blocks
+
+WARMUP_WORKERS = os.cpu_count() or 1
+MIN_POOL_EPISODES = 4  # 任务（剧集或文件）少于这么多（或只有一个 CPU）时直接在当前线程处理
+
+
+def decode_subtitle(path: str) -> str:
+    """Content of a subtitle file as UTF-8, falling back to GBK"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except UnicodeDecodeError:
+        with open(path, 'r', encoding='gbk', errors='ignore') as f:
+            return f.read()
+
+
+def parse_subtitle_file(path: str) -> Tuple[List[Dict], Optional[str]]:
+    """Blocks and ASS header (None for SRT) of a subtitle file"""
+    content = decode_subtitle(path)
+    if path.endswith('.ass'):
+        return parse_ass(content), ass_header(content)
+    return parse_srt(content), None
+
+
+def parse_file_rows(path: str) -> Optional[Tuple[List[Dict], Optional[str], List[Tuple]]]:
+    """Blocks, ASS header and database rows of one file, or None if it cannot be parsed (runs in a worker)"""
+    try:
+        blocks, header = parse_subtitle_file(path)
+        # 检索词切分和时间换算也在子进程中完成，主进程只写数据库
+        return blocks, header, cue_rows(blocks)
+    except Exception as e:
+        print(f"Failed to parse {path}: {e}")
+        return None
+
+
+def prepare_episode(zh_source, en_source, primaries=('zh',)) -> Dict:
+    """
+    Parse (if needed), align and merge both files of an episode (runs in a worker process)
+
+    Args:
+        zh_source, en_source: path of a file to parse, blocks already read from
+            the project database, or None
+
+    Returns:
+        dict with 'zh' and 'en' as (blocks, header, database rows) for files
+        parsed here (None otherwise), 'alignment' (track_align estimate or None)
+        and 'merged' as primary -> merged blocks
+    """
+    result = {'zh': None, 'en': None}
+    blocks = {}
+    for lang, source in (('zh', zh_source), ('en', en_source)):
+        if isinstance(source, str):
+            result[lang] = parse_file_rows(source)
+            blocks[lang] = result[lang][0] if result[lang] else []
+        else:
+            blocks[lang] = source or []
+    zh_blocks, en_blocks = blocks['zh'], blocks['en']
+    result['alignment'] = estimate_alignment(zh_blocks, en_blocks) if zh_blocks and en_blocks else None
+    en_blocks = align_blocks(en_blocks, result['alignment'])
+    result['merged'] = {p: merge_blocks_by_time(zh_blocks, en_blocks, primary=p) for p in primaries}
+    return result
+
+
+def run_pool(fn, jobs: Dict, workers: int = WARMUP_WORKERS, progress=None, stage: str = 'parse'):
+    """
+    Call fn(*args) for every job in a process pool sized to the CPU count
+
+    Small batches (fewer than MIN_POOL_EPISODES jobs) and single-CPU machines
+    run in the current thread; a broken pool finishes the rest in-process.
+
+    Args:
+        jobs: key -> argument tuple
+        progress: optional callback progress(stage, done=, total=)
+
+    Yields:
+        (key, result) in completion order
+    """
+    total = len(jobs)
+    done = 0
+    pending = dict(jobs)
+    if total >= MIN_POOL_EPISODES and workers > 1:
+        try:
+            # 进程池只在本次任务期间存在，结束后子进程随之退出
+            with ProcessPoolExecutor(max_workers=min(workers, total)) as pool:
+                futures = {pool.submit(fn, *args): key for key, args in jobs.items()}
+                for future in as_completed(futures):
+                    key = futures[future]
+                    result = future.result()
+                    del pending[key]
+                    done += 1
+                    if progress:
+                        progress(stage, done=done, total=total)
+                    yield key, result
+        except BrokenProcessPool as e:
+            print(f"Warm-up pool broken ({e}), finishing in-process")
+    for key, args in list(pending.items()):
+        result = fn(*args)
+        done += 1
+        if progress:
+            progress(stage, done=done, total=total)
+        yield key, result
+
+
+def prepare_episodes(jobs: Dict, primaries=('zh',), workers: int = WARMUP_WORKERS, progress=None):
+    """
+    Run prepare_episode for several episodes in a process pool
+
+    Args:
+        jobs: key -> (zh_source, en_source), see prepare_episode
+        primaries: merge orders to build for each episode
+        progress: optional callback progress('parse', done=, total=)
+
+    Yields:
+        (key, result) in completion order
+    """
+    return run_pool(prepare_episode, {key: (*sources, primaries) for key, sources in jobs.items()},
+                    workers, progress)
+
+
+def parse_files(paths: List[str], workers: int = WARMUP_WORKERS, progress=None):
+    """
+    Decode and parse several subtitle files in a process pool
+
+    Yields:
+        (path, (blocks, header, database rows) or None) in completion order
+    """
+    return run_pool(parse_file_rows, {path: (path,) for path in paths}, workers, progress)
@@ -0,0 +1,194 @@
+"""
+AI 修正基准 - 本地兼容 OpenAI 接口的替身服务，比较流式与非流式修正的首条结果时间
+
+替身把提示中的 SRT 原样返回，按 --chars-per-sec 的速度"生成"（首字延迟 --first-token-ms）。
+请求带 "stream": true 时以 SSE 分块返回，否则等全部生成完再返回 JSON。
+--break-at N 时第一次回答会漏掉第 N 条（模拟模型合并字幕），用于测量发现错误所需的时间。
+
+用法:
+    python -m benchmarks.llm_standin                        # 默认 300 条字幕
+    python -m benchmarks.llm_standin --cues 600 --break-at 150
+    python -m benchmarks.llm_standin --serve --port 8765    # 只启动替身服务（config.ini 指向它）
+
+结果写入 JSON（默认 benchmarks/results/correct-<commit>.json）。
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.run import RESULTS_DIR, _git_commit  # noqa: E402
+from benchmarks.synthetic import SeasonSpec, cues_to_blocks, derive_foreign, make_cues  # noqa: E402
+
+CHUNK_CHARS = 16  # 每个 SSE 事件的字符数（约 4 个 token）
+
+
+def drop_block(srt: str, number: int) -> str:
+    """SRT content with block number left out"""
+    parts = [p for p in srt.strip().split('\n\n') if p.split('\n', 1)[0].strip() != str(number)]
+    return '\n\n'.join(parts) + '\n\n'
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """POST <any path>: chat completion echoing the SRT content of the first message"""
+    protocol_version = 'HTTP/1.1'
+    chars_per_sec = 4000.0
+    first_token_ms = 800
+    break_at = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        messages = body.get('messages', [])
+        prompt = messages[0]['content'] if messages else ''
+        content = prompt.split('SRT Content:\n', 1)[-1]
+        if self.break_at and len(messages) == 1:
+            content = drop_block(content, self.break_at)
+        time.sleep(self.first_token_ms / 1000)
+        if body.get('stream'):
+            self._stream(content)
+        else:
+            time.sleep(len(content) / self.chars_per_sec)
+            self._send_json({'choices': [{'message': {'role': 'assistant', 'content': content}}]})
+
+    def _send_json(self, data):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, content):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for i in range(0, len(content), CHUNK_CHARS):
+                delta = content[i:i + CHUNK_CHARS]
+                event = {'choices': [{'delta': {'content': delta}}]}
+                self._chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                time.sleep(len(delta) / self.chars_per_sec)
+            self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端发现错误后提前断开
+            self.close_connection = True
+
+
+def start_standin(port=0, chars_per_sec=4000.0, first_token_ms=800, break_at=None):
+    """Run the stand-in in a daemon thread; returns (server, endpoint URL)"""
+    handler = type('Handler', (StandinHandler,), {
+        'chars_per_sec': chars_per_sec, 'first_token_ms': first_token_ms, 'break_at': break_at})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+
+def run_correction(content, stream):
+    """Time one correct_text_with_gpt call: first streamed cue, first invalid block and total"""
+    from backend.corrector import correct_text_with_gpt
+
+    started = time.perf_counter()
+    marks = {}
+
+    def progress(stage, **info):
+        if stage in ('cue', 'invalid') and stage not in marks:
+            marks[stage] = time.perf_counter() - started
+
+    result = correct_text_with_gpt(content, 'Fix typos.', progress, stream=stream)
+    total = time.perf_counter() - started
+    return {
+        'ok': result is not None,
+        'first_cue_s': round(marks['cue'], 3) if 'cue' in marks else None,
+        'invalid_after_s': round(marks['invalid'], 3) if 'invalid' in marks else None,
+        'total_s': round(total, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cues', type=int, default=300)
+    parser.add_argument('--chars-per-sec', type=float, default=4000.0)
+    parser.add_argument('--first-token-ms', type=int, default=800)
+    parser.add_argument('--break-at', type=int, help='drop this block from the first answer')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--serve', action='store_true', help='only run the stand-in until interrupted')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--output', help='result file (default benchmarks/results/correct-<commit>.json)')
+    args = parser.parse_args()
+
+    server, endpoint = start_standin(args.port, args.chars_per_sec, args.first_token_ms, args.break_at)
+    if args.serve:
+        print(f"Stand-in listening on {endpoint}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return
+
+    from backend.config import set_api_config
+    from backend.serializers import dumps
+
+    set_api_config(endpoint, 'standin')
+    rng = random.Random(args.seed)
+    foreign = derive_foreign(make_cues(args.cues, rng), SeasonSpec(split_ratio=0, merge_ratio=0), rng)
+    content = dumps('srt', cues_to_blocks(foreign))
+
+    results = {}
+    # 修正过程的 print 输出不计入测量
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results['json'] = run_correction(content, stream=False)
+        results['stream'] = run_correction(content, stream=True)
+    server.shutdown()
+
+    commit = _git_commit()
+    report = {
+        'commit': commit,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cues': args.cues,
+        'chars': len(content),
+        'chars_per_sec': args.chars_per_sec,
+        'first_token_ms': args.first_token_ms,
+        'break_at': args.break_at,
+        'results': results,
+    }
+    for name, res in results.items():
+        print(f"  {name:<8} first cue {res['first_cue_s'] if res['first_cue_s'] is not None else '-':>7} s  "
+              f"invalid after {res['invalid_after_s'] if res['invalid_after_s'] is not None else '-':>7} s  "
+              f"total {res['total_s']:.3f} s  ok={res['ok']}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"correct-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,412 @@
+"""
+处理流水线基准 - 在合成剧集上测量解析、合并、序列化和主要接口的耗时（写出整季时另记峰值内存）
+
+用法:
+    python -m benchmarks.run                          # 默认 10 集 x 300 条
+    python -m benchmarks.run --episodes 40 --cues 800 --drift-ppm 1000
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --compare before.json    # 与之前的结果对比
+
+结果写入 JSON（默认 benchmarks/results/<commit>.json），便于在不同提交之间比较。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import SeasonSpec, generate_season, write_fake_video, write_fake_mp4  # noqa: E402
+from backend.srt_parser import parse_srt, parse_ass, blocks_to_srt, blocks_to_ass, merge_blocks_by_time  # noqa: E402
+from backend.corrector import split_long_line  # noqa: E402
+from backend.serializers import SERIALIZERS  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or 'unknown'
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+
+
+def bench(fn, repeat, items=1):
+    """
+    Call fn() repeat times
+
+    Returns:
+        dict with median/min/max milliseconds per call and items per second
+    """
+    fn()  # 预热
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    median = statistics.median(samples)
+    return {
+        'median_ms': round(median * 1000, 4),
+        'min_ms': round(min(samples) * 1000, 4),
+        'max_ms': round(max(samples) * 1000, 4),
+        'items': items,
+        'items_per_sec': round(items / median, 1) if median else None,
+        'repeat': repeat,
+    }
+
+
+def _read(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except UnicodeDecodeError:
+        with open(path, 'r', encoding='gbk', errors='ignore') as f:
+            return f.read()
+
+
+def _parse(name, content):
+    return parse_ass(content) if name.endswith('.ass') else parse_srt(content)
+
+
+def run_pipeline(season, repeat):
+    """Parsing, merging and serialization over every episode of the season"""
+    zh_contents = [(m['zh_sub'], _read(os.path.join(season.zh_dir, m['zh_sub']))) for m in season.matches]
+    en_contents = [(m['en_sub'], _read(os.path.join(season.en_dir, m['en_sub']))) for m in season.matches]
+    srt_contents = [c for name, c in zh_contents + en_contents if name.endswith('.srt')]
+    ass_contents = [c for name, c in zh_contents + en_contents if name.endswith('.ass')]
+
+    zh_blocks = [_parse(name, c) for name, c in zh_contents]
+    en_blocks = [_parse(name, c) for name, c in en_contents]
+    all_blocks = zh_blocks + en_blocks
+    cue_count = sum(len(b) for b in all_blocks)
+    en_lines = [b['text'] for blocks in en_blocks for b in blocks]
+
+    results = {}
+    if srt_contents:
+        n = sum(len(parse_srt(c)) for c in srt_contents)
+        results['parse_srt'] = bench(lambda: [parse_srt(c) for c in srt_contents], repeat, n)
+    if ass_contents:
+        n = sum(len(parse_ass(c)) for c in ass_contents)
+        results['parse_ass'] = bench(lambda: [parse_ass(c) for c in ass_contents], repeat, n)
+
+    pairs = list(zip(zh_blocks, en_blocks))
+    pair_cues = sum(len(z) + len(e) for z, e in pairs)
+    for mode in ('zh', 'en', 'union'):
+        results[f'merge_{mode}'] = bench(
+            lambda mode=mode: [merge_blocks_by_time(z, e, primary=mode) for z, e in pairs], repeat, pair_cues)
+
+    results['blocks_to_srt'] = bench(lambda: [blocks_to_srt(b) for b in all_blocks], repeat, cue_count)
+    results['blocks_to_ass'] = bench(lambda: [blocks_to_ass(b) for b in all_blocks], repeat, cue_count)
+    results['split_long_line'] = bench(lambda: [split_long_line(t) for t in en_lines], repeat, len(en_lines))
+    return results
+
+
+def peak_kb(fn):
+    """Peak memory allocated while fn() runs, in KiB"""
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def run_serializers(season, repeat):
+    """Writing a full season to disk in every registered format, with peak memory"""
+    zh_blocks = [_parse(m['zh_sub'], _read(os.path.join(season.zh_dir, m['zh_sub']))) for m in season.matches]
+    en_blocks = [_parse(m['en_sub'], _read(os.path.join(season.en_dir, m['en_sub']))) for m in season.matches]
+    merged = [merge_blocks_by_time(z, e, primary='zh') for z, e in zip(zh_blocks, en_blocks)]
+    cue_count = sum(len(b) for b in zh_blocks + en_blocks)
+    merged_count = sum(len(b) for b in merged)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='dqs_bench_write_') as out:
+        def write_season(serializer, episodes):
+            for i, blocks in enumerate(episodes):
+                with open(os.path.join(out, f"{i}{serializer.extension}"), 'w', encoding='utf-8') as f:
+                    serializer.write(f, blocks)
+
+        def write_strings(to_string, extension):
+            # 旧做法：先在内存中拼出整个文件再写入
+            for i, blocks in enumerate(zh_blocks + en_blocks):
+                with open(os.path.join(out, f"{i}{extension}"), 'w', encoding='utf-8') as f:
+                    f.write(to_string(blocks))
+
+        for name, serializer in SERIALIZERS.items():
+            episodes, n = (merged, merged_count) if serializer.bilingual else (zh_blocks + en_blocks, cue_count)
+            fn = lambda serializer=serializer, episodes=episodes: write_season(serializer, episodes)
+            results[f'write_season_{name}'] = dict(bench(fn, repeat, n), peak_kb=peak_kb(fn))
+        for name, to_string, extension in (('srt', blocks_to_srt, '.srt'), ('ass', blocks_to_ass, '.ass')):
+            fn = lambda to_string=to_string, extension=extension: write_strings(to_string, extension)
+            results[f'write_season_{name}_string'] = dict(bench(fn, repeat, cue_count), peak_kb=peak_kb(fn))
+    return results
+
+
+def run_database(season, repeat):
+    """Reopening a project and loading a season from the SQLite store versus parsing the files"""
+    import backend.main as main
+    from backend.projects import ProjectStore
+
+    paths = [(kind, os.path.join(season.zh_dir if kind == 'zh' else season.en_dir, m[f'{kind}_sub']))
+             for m in season.matches for kind in ('zh', 'en')]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='dqs_bench_db_') as base:
+        store = ProjectStore(base)
+        proj = store.get('season')
+        proj.matches = [dict(m) for m in season.matches]
+        proj.save_state()
+        for kind, path in paths:
+            main.load_subtitle_blocks(proj, kind, path)  # 首次加载时导入数据库
+
+        def reopen():
+            reopened = ProjectStore(base)
+            assert len(reopened.get('season').matches) == len(season.matches)
+            reopened.db.close()
+        results['project_reopen'] = bench(reopen, repeat, len(season.matches))
+        results['season_load_files'] = bench(
+            lambda: [main.parse_subtitle(p, main.read_subtitle_file(p)) for _, p in paths], repeat, len(paths))
+        results['season_load_db'] = bench(
+            lambda: [proj.db.file_cues(p, os.stat(p)) for _, p in paths], repeat, len(paths))
+        store.db.close()
+    return results
+
+
+def run_endpoints(season, repeat, video_size):
+    """Main API routes through the ASGI app, without a real socket"""
+    from fastapi.testclient import TestClient
+    import backend.main as main
+
+    video_dir = os.path.join(season.root, 'videos')
+    os.makedirs(video_dir, exist_ok=True)
+    video_name = season.matches[0]['video']
+    write_fake_video(os.path.join(video_dir, video_name), size=video_size)
+
+    # 项目库放在临时目录中，不写入真实的 uploads/projects.db
+    from backend.projects import ProjectStore
+
+    saved_store = main.projects
+    with tempfile.TemporaryDirectory(prefix='dqs_bench_api_') as base:
+        main.projects = ProjectStore(base)
+        try:
+            proj = main.projects.get('bench')
+            proj.zh_dir = season.zh_dir
+            proj.en_dir = season.en_dir
+            proj.video_base_path = video_dir
+            proj.matches = [dict(m) for m in season.matches]
+            client = TestClient(main.app)
+            client.params = {'project': proj.id}
+            return _bench_endpoints(main, client, season, video_dir, video_name, repeat, video_size)
+        finally:
+            main.projects.db.close()
+            main.projects = saved_store
+
+
+def _bench_endpoints(main, client, season, video_dir, video_name, repeat, video_size):
+    """Timings for the routes of run_endpoints against an already configured client"""
+    results = {}
+    episodes = len(season.matches)
+    counter = {'i': 0}
+
+    def next_episode():
+        counter['i'] = (counter['i'] + 1) % episodes
+        return counter['i']
+
+    for mode in ('zh', 'union'):
+        def load(mode=mode):
+            r = client.get(f'/api/episode/{next_episode()}', params={'primary': mode})
+            r.raise_for_status()
+        results[f'api_episode_{mode}'] = bench(load, repeat)
+
+    # update-block 解析为 SRT，只对 SRT 剧集测量
+    srt_episodes = [i for i, m in enumerate(season.matches) if m['en_sub'].endswith('.srt')]
+    if srt_episodes:
+        rng = random.Random(1)
+
+        def update():
+            ep = rng.choice(srt_episodes)
+            r = client.post('/api/update-block', json={
+                'episode_index': ep, 'block_index': rng.randrange(50),
+                'text': 'Texto editado ' + str(rng.random()), 'type': 'en',
+            })
+            r.raise_for_status()
+        results['api_update_block'] = bench(update, repeat)
+
+    chunk = 1024 * 1024
+    rng = random.Random(2)
+
+    def stream():
+        start = rng.randrange(0, max(1, video_size - chunk))
+        r = client.get('/video/stream', params={'path': video_name},
+                       headers={'Range': f'bytes={start}-{start + chunk - 1}'})
+        assert r.status_code == 206
+    results['video_stream_1mb'] = bench(stream, repeat, chunk)
+    results['video_stream_1mb']['mb_per_sec'] = round(chunk / 1024 / 1024 / (results['video_stream_1mb']['median_ms'] / 1000), 1)
+
+    results.update(run_player(main, client, video_dir, repeat, video_size))
+    return results
+
+
+def player_open(client, name):
+    """
+    Requests a player makes before its first frame: walk the top-level boxes
+    until moov has been read, then fetch the start of mdat
+
+    Returns:
+        (request count, bytes received)
+    """
+    state = {'buf': b'', 'start': 0, 'requests': 0, 'bytes': 0}
+
+    def fetch(offset):
+        r = client.get('/video/stream', params={'path': name}, headers={'Range': f'bytes={offset}-'})
+        assert r.status_code == 206 and r.content
+        state['requests'] += 1
+        state['bytes'] += len(r.content)
+        if offset == state['start'] + len(state['buf']):
+            state['buf'] += r.content
+        else:
+            state['buf'], state['start'] = r.content, offset
+
+    pos, moov_read, mdat_payload = 0, False, None
+    while not moov_read or mdat_payload is None:
+        buf, rel = state['buf'], pos - state['start']
+        if rel < 0 or rel > len(buf):
+            fetch(pos)
+            continue
+        if rel + 8 > len(buf):
+            fetch(state['start'] + len(buf))
+            continue
+        size, kind = struct.unpack('>I4s', buf[rel:rel + 8])
+        if kind == b'moov':
+            if rel + size > len(buf):
+                fetch(state['start'] + len(buf))
+                continue
+            moov_read = True
+        elif kind == b'mdat':
+            mdat_payload = pos + 8
+        pos += size
+    fetch(mdat_payload)  # 首帧数据
+    return state['requests'], state['bytes']
+
+
+def run_player(main, client, video_dir, repeat, media_size):
+    """Time to first frame (cold and cached layout) and seek latency on MP4-shaped files"""
+    from backend.prefetch import VideoHeadCache
+    from backend.video_container import VideoLayoutCache
+
+    moov_size = 2 * 1024 * 1024
+    names = {}
+    for label, faststart in (('moov_end', False), ('faststart', True)):
+        names[label] = f'player-{label}.mp4'
+        write_fake_mp4(os.path.join(video_dir, names[label]), media_size, moov_size, faststart=faststart)
+
+    def reset_caches():
+        main.video_layouts = VideoLayoutCache()
+        main.video_heads = VideoHeadCache()
+
+    results = {}
+    for label, name in names.items():
+        def cold(name=name):
+            reset_caches()
+            player_open(client, name)
+        results[f'video_first_frame_{label}_cold'] = bench(cold, repeat)
+        requests, received = player_open(client, name)
+        results[f'video_first_frame_{label}'] = bench(lambda name=name: player_open(client, name), repeat)
+        results[f'video_first_frame_{label}'].update(requests=requests, mb_received=round(received / 1024 / 1024, 2))
+
+    rng = random.Random(3)
+    mdat_start = 8 + 24 + 8
+
+    def seek():
+        offset = rng.randrange(mdat_start, mdat_start + media_size - 1)
+        r = client.get('/video/stream', params={'path': names['moov_end']}, headers={'Range': f'bytes={offset}-'})
+        assert r.status_code == 206
+    results['video_seek'] = bench(seek, repeat)
+    return results
+
+
+def compare(current, previous):
+    """Print the median change of every benchmark found in both result files"""
+    print(f"\nCompared with {previous.get('commit', '?')}:")
+    old = previous.get('results', {})
+    for name, res in current['results'].items():
+        if name not in old:
+            continue
+        before, after = old[name]['median_ms'], res['median_ms']
+        change = (after - before) / before * 100 if before else 0
+        print(f"  {name:<34} {before:10.3f} -> {after:10.3f} ms  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--episodes', type=int, default=10)
+    parser.add_argument('--cues', type=int, default=300, help='Chinese cues per episode')
+    parser.add_argument('--offset-ms', type=int, default=0)
+    parser.add_argument('--drift-ppm', type=int, default=0)
+    parser.add_argument('--split-ratio', type=float, default=0.05)
+    parser.add_argument('--merge-ratio', type=float, default=0.05)
+    parser.add_argument('--gbk-ratio', type=float, default=0.3)
+    parser.add_argument('--ass-ratio', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--video-mb', type=int, default=32)
+    parser.add_argument('--skip-api', action='store_true', help='only benchmark the pure functions')
+    parser.add_argument('--output', help='result file (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    args = parser.parse_args()
+
+    spec = SeasonSpec(
+        episodes=args.episodes, cues=args.cues, offset_ms=args.offset_ms, drift_ppm=args.drift_ppm,
+        split_ratio=args.split_ratio, merge_ratio=args.merge_ratio, gbk_ratio=args.gbk_ratio,
+        ass_ratio=args.ass_ratio, seed=args.seed,
+    )
+
+    with tempfile.TemporaryDirectory(prefix='dqs_bench_') as tmp:
+        started = time.perf_counter()
+        season = generate_season(tmp, spec)
+        print(f"Generated {spec.episodes} episodes x {spec.cues} cues in {time.perf_counter() - started:.2f}s")
+
+        results = run_pipeline(season, args.repeat)
+        results.update(run_serializers(season, args.repeat))
+        results.update(run_database(season, args.repeat))
+        if not args.skip_api:
+            results.update(run_endpoints(season, args.repeat, args.video_mb * 1024 * 1024))
+
+    commit = _git_commit()
+    report = {
+        'commit': commit,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'spec': asdict(spec),
+        'results': results,
+    }
+
+    for name, res in results.items():
+        peak = f"  peak {res['peak_kb']:,.0f} KiB" if 'peak_kb' in res else ''
+        print(f"  {name:<34} {res['median_ms']:10.3f} ms  ({res['items_per_sec'] or 0:,.0f} items/s){peak}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+启动耗时基准 - 分段统计 导入 / 服务器启动 / 窗口打开
+
+用法:
+    python -m benchmarks.startup            # 导入 + 服务器启动（无需图形界面）
+    python -m benchmarks.startup --window   # 额外启动 app_desktop 测量窗口打开时间
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在全新解释器中测量导入和服务器启动，避免模块缓存影响结果
+_BOOT_SCRIPT = r"""
+import json, threading, time
+t0 = time.perf_counter()
+import uvicorn
+from backend.main import app
+t_import = time.perf_counter() - t0
+
+ready = threading.Event()
+
+class ReadyServer(uvicorn.Server):
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        ready.set()
+
+server = ReadyServer(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="error", access_log=False))
+t1 = time.perf_counter()
+thread = threading.Thread(target=server.run, daemon=True)
+thread.start()
+ready.wait(20)
+t_boot = time.perf_counter() - t1
+server.should_exit = True
+thread.join(5)
+print(json.dumps({"backend_import": t_import, "server_boot": t_boot}))
+"""
+
+
+def _run_json(cmd, env=None):
+    out = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    for line in reversed(out.stdout.splitlines()):
+        line = line.strip()
+        if line.startswith('{'):
+            return json.loads(line)
+        if 'Startup timings:' in line:
+            return json.loads(line.split('Startup timings:', 1)[1])
+    raise RuntimeError(f"No timings in output:\n{out.stdout}\n{out.stderr}")
+
+
+def measure_boot(runs):
+    samples = [_run_json([sys.executable, '-c', _BOOT_SCRIPT]) for _ in range(runs)]
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def measure_window():
+    env = dict(os.environ, DQS_STARTUP_BENCH='1')
+    return _run_json([sys.executable, 'app_desktop.py'], env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='number of cold starts to take the median of')
+    parser.add_argument('--window', action='store_true', help='also launch the desktop window')
+    args = parser.parse_args()
+
+    result = {'boot': measure_boot(args.runs)}
+    if args.window:
+        result['window'] = measure_window()
+
+    for section, timings in result.items():
+        print(f"[{section}]")
+        for key, value in timings.items():
+            print(f"  {key:<16} {value * 1000:8.1f} ms")
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+合成剧集生成器 - 生成用于基准测试的整季中外文字幕
+
+可配置集数、每集字幕条数、外文相对中文的偏移和漂移、拆分/合并的字幕比例，
+以及 GBK 编码和带样式的 ASS 文件的比例。相同 seed 生成完全相同的数据。
+"""
+import os
+import random
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+_ZH_PHRASES = [
+    "快走！", "你说什么？", "我不会放过你的", "这件事你别管", "林有有，你给我站住",
+    "总裁，夫人她又跑了", "今天的事情谁也不许说出去", "你到底想怎么样", "我们离婚吧",
+    "对不起，是我错了", "你以为我会相信你吗", "妈妈一会儿就来接你", "这是我们林家的事",
+    "三年了，你终于回来了", "别碰我", "把他给我带走", "我才是真正的千金", "你根本不配",
+]
+_FOREIGN_WORDS = (
+    "el la los las un una que de no se lo me te por para con sin pero porque cuando "
+    "ahora siempre nunca vete dime quiero puedo sabes verdad mentira familia casa señor "
+    "esposa divorcio perdón culpa dinero empresa presidente hija madre padre volver irse"
+).split()
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 1920
+PlayResY: 1080
+WrapStyle: 0
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,60,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,1,2,10,10,40,1
+Style: Top,Arial,52,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,1,8,10,10,40,1
+Style: Italic,Arial,60,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,1,0,0,100,100,0,0,1,2,1,2,10,10,40,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+@dataclass
+class SeasonSpec:
+    episodes: int = 10
+    cues: int = 300
+    offset_ms: int = 0            # 外文整体偏移
+    drift_ppm: int = 0            # 外文线性漂移（百万分之一）
+    split_ratio: float = 0.05     # 外文中被拆成两条的比例
+    merge_ratio: float = 0.05     # 外文中与下一条合并的比例
+    gbk_ratio: float = 0.3        # 中文字幕用 GBK 编码的比例
+    ass_ratio: float = 0.2        # 使用 ASS 格式的比例
+    seed: int = 0
+    series_name: str = "霸道总裁爱上我"
+
+
+@dataclass
+class Season:
+    root: str
+    zh_dir: str
+    en_dir: str
+    matches: List[Dict] = field(default_factory=list)
+
+
+def ms_to_srt(ms: int) -> str:
+    ms = max(0, int(ms))
+    h, rem = divmod(ms, 3600000)
+    m, rem = divmod(rem, 60000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def ms_to_ass(ms: int) -> str:
+    ms = max(0, int(ms))
+    h, rem = divmod(ms, 3600000)
+    m, rem = divmod(rem, 60000)
+    s, ms = divmod(rem, 1000)
+    return f"{h}:{m:02d}:{s:02d}.{ms // 10:02d}"
+
+
+def _foreign_line(rng: random.Random) -> str:
+    words = [rng.choice(_FOREIGN_WORDS) for _ in range(rng.randint(3, 14))]
+    line = ' '.join(words)
+    return line[0].upper() + line[1:] + rng.choice(['.', '?', '!', '...'])
+
+
+def make_cues(count: int, rng: random.Random) -> List[Dict]:
+    """Chinese cues as dicts with millisecond times and text"""
+    cues = []
+    t = rng.randint(500, 3000)
+    for _ in range(count):
+        duration = rng.randint(800, 4000)
+        cues.append({'start_ms': t, 'end_ms': t + duration, 'text': rng.choice(_ZH_PHRASES)})
+        t += duration + rng.randint(80, 1200)
+    return cues
+
+
+def derive_foreign(zh_cues: List[Dict], spec: SeasonSpec, rng: random.Random) -> List[Dict]:
+    """Foreign cues following the Chinese ones with offset, drift, splits and merges"""
+    scale = 1 + spec.drift_ppm / 1_000_000
+    out = []
+    i = 0
+    while i < len(zh_cues):
+        cue = zh_cues[i]
+        start, end = cue['start_ms'], cue['end_ms']
+        if rng.random() < spec.merge_ratio and i + 1 < len(zh_cues):
+            end = zh_cues[i + 1]['end_ms']
+            i += 1
+        start = int(start * scale) + spec.offset_ms
+        end = int(end * scale) + spec.offset_ms
+        if rng.random() < spec.split_ratio and end - start > 1200:
+            mid = (start + end) // 2
+            out.append({'start_ms': start, 'end_ms': mid, 'text': _foreign_line(rng)})
+            out.append({'start_ms': mid, 'end_ms': end, 'text': _foreign_line(rng)})
+        else:
+            text = _foreign_line(rng)
+            if rng.random() < 0.3:
+                text += '\n' + _foreign_line(rng)
+            out.append({'start_ms': start, 'end_ms': end, 'text': text})
+        i += 1
+    return out
+
+
+def cues_to_blocks(cues: List[Dict]) -> List[Dict]:
+    """Cues in the block format used by backend.srt_parser"""
+    return [
+        {'index': i, 'start': ms_to_srt(c['start_ms']), 'end': ms_to_srt(c['end_ms']), 'text': c['text']}
+        for i, c in enumerate(cues, 1)
+    ]
+
+
+def render_srt(cues: List[Dict]) -> str:
+    parts = [f"{i}\n{ms_to_srt(c['start_ms'])} --> {ms_to_srt(c['end_ms'])}\n{c['text']}\n" for i, c in enumerate(cues, 1)]
+    return '\n'.join(parts)
+
+
+def render_ass(cues: List[Dict], rng: random.Random) -> str:
+    styles = ['Default', 'Default', 'Default', 'Top', 'Italic']
+    lines = []
+    for c in cues:
+        text = c['text'].replace('\n', r'\N')
+        lines.append(f"Dialogue: 0,{ms_to_ass(c['start_ms'])},{ms_to_ass(c['end_ms'])},{rng.choice(styles)},,0,0,0,,{text}")
+    return ASS_HEADER + '\n'.join(lines) + '\n'
+
+
+def generate_season(root: str, spec: SeasonSpec = None) -> Season:
+    """
+    Write a synthetic season under root/zh and root/en
+
+    Returns:
+        Season with the match list in the same shape as match_files produces
+    """
+    spec = spec or SeasonSpec()
+    rng = random.Random(spec.seed)
+    zh_dir = os.path.join(root, 'zh')
+    en_dir = os.path.join(root, 'en')
+    os.makedirs(zh_dir, exist_ok=True)
+    os.makedirs(en_dir, exist_ok=True)
+    season = Season(root=root, zh_dir=zh_dir, en_dir=en_dir)
+
+    for ep in range(1, spec.episodes + 1):
+        zh_cues = make_cues(spec.cues, rng)
+        en_cues = derive_foreign(zh_cues, spec, rng)
+
+        use_ass = rng.random() < spec.ass_ratio
+        ext = '.ass' if use_ass else '.srt'
+        zh_name = f"{spec.series_name}_第{ep:02d}集_中文{ext}"
+        en_name = f"{spec.series_name}_第{ep:02d}集_西班牙语{ext}"
+
+        zh_content = render_ass(zh_cues, rng) if use_ass else render_srt(zh_cues)
+        en_content = render_ass(en_cues, rng) if use_ass else render_srt(en_cues)
+        zh_encoding = 'gbk' if rng.random() < spec.gbk_ratio else 'utf-8'
+
+        with open(os.path.join(zh_dir, zh_name), 'w', encoding=zh_encoding, newline='\n') as f:
+            f.write(zh_content)
+        with open(os.path.join(en_dir, en_name), 'w', encoding='utf-8', newline='\n') as f:
+            f.write(en_content)
+
+        season.matches.append({
+            'episode': f"{ep:02d}",
+            'zh_sub': zh_name,
+            'en_sub': en_name,
+            'video': f"{spec.series_name}-{ep:02d}.mp4",
+        })
+    return season
+
+
+def write_fake_video(path: str, size: int = 32 * 1024 * 1024, seed: int = 0):
+    """Random bytes standing in for a video file (for range-request benchmarks)"""
+    rng = random.Random(seed)
+    chunk = bytes(rng.getrandbits(8) for _ in range(1024 * 1024))
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            n = min(len(chunk), size - written)
+            f.write(chunk[:n])
+            written += n
+
+
+def write_fake_mp4(path: str, media_size: int = 32 * 1024 * 1024, moov_size: int = 2 * 1024 * 1024,
+                   faststart: bool = False, seed: int = 0):
+    """
+    MP4-shaped file: ftyp, moov and mdat boxes with random payloads
+
+    Only the top-level box layout is real; faststart=False puts moov after
+    mdat, like files written without a fast-start pass.
+    """
+    rng = random.Random(seed)
+    chunk = bytes(rng.getrandbits(8) for _ in range(1024 * 1024))
+
+    def payload(f, size):
+        written = 0
+        while written < size:
+            n = min(len(chunk), size - written)
+            f.write(chunk[:n])
+            written += n
+
+    ftyp = b'isom' + struct.pack('>I', 0x200) + b'isomiso2avc1mp41'
+    with open(path, 'wb') as f:
+        f.write(struct.pack('>I4s', 8 + len(ftyp), b'ftyp') + ftyp)
+        boxes = [(b'mdat', media_size), (b'moov', moov_size)]
+        if faststart:
+            boxes.reverse()
+        for kind, size in boxes:
+            f.write(struct.pack('>I4s', 8 + size, kind))
+            payload(f, size)
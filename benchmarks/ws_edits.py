@@ -0,0 +1,184 @@
+"""
+编辑吞吐基准 - 在真实的 uvicorn 服务上比较逐条 POST 与单个 WebSocket 连接提交修改的速度
+
+用法:
+    python -m benchmarks.ws_edits                    # 默认 500 次修改
+    python -m benchmarks.ws_edits --edits 2000 --cues 800
+    python -m benchmarks.ws_edits --output ws.json
+
+每次修改都等待服务器确认后再发送下一条（与前端一致，版本号依次传递）。
+结果写入 JSON（默认 benchmarks/results/ws-<commit>.json）。
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.run import RESULTS_DIR, _git_commit  # noqa: E402
+from benchmarks.synthetic import SeasonSpec, generate_season  # noqa: E402
+
+PROJECT = 'bench-ws'
+
+
+def start_server(app):
+    """Run app with uvicorn on a free local port in a daemon thread, return the port"""
+    import uvicorn
+    config = uvicorn.Config(app, host='127.0.0.1', port=0, log_level='warning', ws='auto')
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.01)
+    return server, server.servers[0].sockets[0].getsockname()[1]
+
+
+def summarize(samples):
+    total = sum(samples)
+    ordered = sorted(samples)
+    return {
+        'edits': len(samples),
+        'edits_per_sec': round(len(samples) / total, 1) if total else None,
+        'median_ms': round(statistics.median(samples) * 1000, 4),
+        'p95_ms': round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+    }
+
+
+def run_update_block(base, episode, edits, cues, rng):
+    """Legacy path: one POST /api/update-block per edit"""
+    import requests
+    session = requests.Session()
+    samples = []
+    for _ in range(edits):
+        body = {'episode_index': episode, 'block_index': rng.randrange(cues),
+                'text': 'Texto editado ' + str(rng.random()), 'type': 'en'}
+        started = time.perf_counter()
+        r = session.post(f'{base}/api/update-block', params={'project': PROJECT}, json=body)
+        r.raise_for_status()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def _episode_view(base, episode, primary):
+    import requests
+    r = requests.get(f'{base}/api/episode/{episode}', params={'project': PROJECT, 'primary': primary})
+    r.raise_for_status()
+    data = r.json()
+    return data['version'], data['total']
+
+
+def run_http_patch(base, episode, primary, edits, rng):
+    """One POST /api/episode/{i}/patch per edit over a keep-alive session"""
+    import requests
+    version, total = _episode_view(base, episode, primary)
+    session = requests.Session()
+    url = f'{base}/api/episode/{episode}/patch'
+    samples = []
+    for _ in range(edits):
+        body = {'base_version': version,
+                'ops': [{'op': 'edit', 'index': rng.randrange(total), 'en_text': 'Texto editado ' + str(rng.random())}]}
+        started = time.perf_counter()
+        r = session.post(url, params={'project': PROJECT, 'primary': primary}, json=body)
+        r.raise_for_status()
+        version = r.json()['version']
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def run_ws_patch(base, episode, primary, edits, rng):
+    """Patch messages over one /ws connection, each awaiting its ack"""
+    from websockets.sync.client import connect
+    version, total = _episode_view(base, episode, primary)
+    samples = []
+    with connect(f"ws{base[4:]}/ws?project={PROJECT}&client=bench") as ws:
+        json.loads(ws.recv())  # hello
+        for n in range(edits):
+            msg = {'id': n, 'type': 'patch', 'episode': episode, 'primary': primary, 'base_version': version,
+                   'ops': [{'op': 'edit', 'index': rng.randrange(total), 'en_text': 'Texto editado ' + str(rng.random())}]}
+            started = time.perf_counter()
+            ws.send(json.dumps(msg))
+            while True:
+                reply = json.loads(ws.recv())
+                if reply.get('type') == 'ack' and reply.get('id') == n:
+                    break
+            if not reply['ok']:
+                raise RuntimeError(f"patch rejected: {reply}")
+            version = reply['version']
+            samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--edits', type=int, default=500)
+    parser.add_argument('--cues', type=int, default=300, help='Chinese cues per episode')
+    parser.add_argument('--primary', default='union', choices=['zh', 'en', 'union'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='result file (default benchmarks/results/ws-<commit>.json)')
+    args = parser.parse_args()
+
+    import backend.main as app_main
+    from backend.projects import ProjectStore
+
+    spec = SeasonSpec(episodes=2, cues=args.cues, ass_ratio=0, seed=args.seed)
+    saved_store = app_main.projects
+    with tempfile.TemporaryDirectory(prefix='dqs_bench_ws_') as tmp:
+        season = generate_season(tmp, spec)
+        # 项目库放在临时目录中，不写入真实的 uploads/projects.db
+        app_main.projects = ProjectStore(os.path.join(tmp, 'store'))
+        proj = app_main.projects.get(PROJECT)
+        proj.zh_dir = season.zh_dir
+        proj.en_dir = season.en_dir
+        proj.matches = [dict(m) for m in season.matches]
+
+        server, port = start_server(app_main.app)
+        base = f'http://127.0.0.1:{port}'
+        rng = random.Random(args.seed)
+        results = {}
+        try:
+            # 服务端的 print 输出不计入测量
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                run_ws_patch(base, 1, args.primary, 20, rng)  # 预热
+                results['post_update_block'] = run_update_block(base, 0, args.edits, args.cues, rng)
+                results['post_patch'] = run_http_patch(base, 1, args.primary, args.edits, rng)
+                results['ws_patch'] = run_ws_patch(base, 1, args.primary, args.edits, rng)
+        finally:
+            server.should_exit = True
+            app_main.projects = saved_store
+
+    commit = _git_commit()
+    report = {
+        'commit': commit,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cues': args.cues,
+        'primary': args.primary,
+        'results': results,
+    }
+    for name, res in results.items():
+        print(f"  {name:<18} {res['edits_per_sec'] or 0:10,.1f} edits/s  "
+              f"median {res['median_ms']:.3f} ms  p95 {res['p95_ms']:.3f} ms")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"ws-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
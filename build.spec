@@ -22,8 +22,10 @@ a = Analysis(
         'uvicorn.protocols.http.auto',
         'uvicorn.protocols.websockets',
         'uvicorn.protocols.websockets.auto',
+        'uvicorn.protocols.websockets.websockets_impl',
         'uvicorn.lifespan',
         'uvicorn.lifespan.on',
+        'numpy',
     ],
     hookspath=[],
     hooksconfig={},
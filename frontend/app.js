@@ -1,4 +1,135 @@
 const API_BASE = "http://localhost:8000/api";
+const VIDEO_BASE = "http://localhost:8000/video";
+// 项目ID：页面地址 ?project=xxx 指定，否则使用上次的项目
+const PROJECT_ID = new URLSearchParams(location.search).get('project')
+    || localStorage.getItem('dqs_project') || 'default';
+localStorage.setItem('dqs_project', PROJECT_ID);
+
+// 所有接口都带上项目ID
+function apiUrl(path) {
+    const sep = path.includes('?') ? '&' : '?';
+    return `${API_BASE}${path}${sep}project=${encodeURIComponent(PROJECT_ID)}`;
+}
+
+function videoUrl(videoPath) {
+    return `${VIDEO_BASE}/stream?path=${encodeURIComponent(videoPath)}&project=${encodeURIComponent(PROJECT_ID)}`;
+}
+
+// ============= WebSocket 通道 =============
+// 修改操作、任务进度和文件变化通知共用一个连接；连接断开时修改操作改走 HTTP
+const WS_URL = API_BASE.replace(/^http/, 'ws').replace(/\/api$/, '/ws');
+const CLIENT_ID = Math.random().toString(36).slice(2) + Date.now().toString(36);
+let socket = null;
+let socketRetryDelay = 1000;
+let socketRequestId = 0;
+let socketPending = new Map();  // 请求ID -> {resolve, reject}
+let jobButtons = {};            // 任务名 -> 显示进度的按钮
+let reloadPrompted = false;
+
+function connectSocket() {
+    const ws = new WebSocket(`${WS_URL}?project=${encodeURIComponent(PROJECT_ID)}&client=${CLIENT_ID}`);
+    ws.onopen = () => {
+        socket = ws;
+        socketRetryDelay = 1000;
+    };
+    ws.onmessage = (e) => onSocketMessage(JSON.parse(e.data));
+    ws.onclose = () => {
+        if (socket === ws) socket = null;
+        for (const { reject } of socketPending.values()) reject(new Error('WebSocket closed'));
+        socketPending = new Map();
+        // 后端重启或网络中断时逐步放慢重连
+        setTimeout(connectSocket, socketRetryDelay);
+        socketRetryDelay = Math.min(socketRetryDelay * 2, 30000);
+    };
+}
+
+function socketRequest(message) {
+    return new Promise((resolve, reject) => {
+        const id = ++socketRequestId;
+        socketPending.set(id, { resolve, reject });
+        socket.send(JSON.stringify({ ...message, id: id }));
+    });
+}
+
+function onSocketMessage(msg) {
+    if (msg.type === 'ack' || msg.type === 'pong') {
+        const pending = socketPending.get(msg.id);
+        if (pending) {
+            socketPending.delete(msg.id);
+            pending.resolve(msg);
+        }
+    } else if (msg.type === 'progress') {
+        if (msg.source === CLIENT_ID) showJobProgress(msg);
+    } else if (msg.type === 'episode_changed') {
+        if (msg.source !== CLIENT_ID && msg.episode === currentEpisodeIndex && msg.version !== episodeVersion) {
+            onEpisodeChangedElsewhere();
+        }
+    } else if (msg.type === 'files_changed') {
+        const match = allMatches[currentEpisodeIndex];
+        const file = match && (msg.lang === 'zh' ? match.zh_sub : match.en_sub);
+        if (file && msg.files.includes(file)) checkEpisodeVersion();
+    }
+}
+
+function jobProgressText(msg) {
+    switch (msg.stage) {
+        case 'scan': return '扫描视频...';
+        case 'series': return '识别剧名...';
+        case 'filter': return '筛选视频...';
+        case 'shards': return `匹配中 ${msg.done}/${msg.total}`;
+        case 'fallback': return '本地匹配中...';
+        case 'request': return msg.attempt > 1 ? `AI修正中（第${msg.attempt}次）...` : 'AI修正中...';
+        case 'cue': return `AI修正中 ${msg.done}/${msg.total}`;
+        case 'invalid': return `第${msg.cue ?? msg.total}条有误，重试中...`;
+        case 'validate': return '校验结果...';
+        case 'mismatch': return `条数不符（${msg.got}/${msg.expected}），重试中...`;
+        case 'load': return `读取字幕 ${msg.done}/${msg.total}`;
+        case 'check': return `质检中 ${msg.done}/${msg.total}`;
+        case 'parse': return `预加载字幕 ${msg.done}/${msg.total}`;
+        case 'align': return `对轴中 ${msg.done}/${msg.total}`;
+        default: return null;
+    }
+}
+
+function showJobProgress(msg) {
+    if (msg.job === 'warmup') {
+        // 匹配后的后台预热没有对应按钮，显示在剧集列表标题下
+        const status = document.getElementById('warmup-status');
+        const text = msg.stage === 'done' || msg.stage === 'failed' ? '' : jobProgressText(msg);
+        status.textContent = text || '';
+        status.style.display = text ? 'block' : 'none';
+        return;
+    }
+    if (msg.job === 'correct' && msg.stage === 'cue') applyCorrectedCue(msg.cue, msg.text);
+    const btn = jobButtons[msg.job];
+    const text = jobProgressText(msg);
+    if (btn && text) btn.textContent = text;
+}
+
+// 磁盘上的字幕文件变化时，对比服务器版本号判断是否是别处的修改
+async function checkEpisodeVersion() {
+    const index = currentEpisodeIndex;
+    const res = await fetch(apiUrl(`/episode/${index}?primary=${currentPrimary}&limit=0`));
+    if (!res.ok) return;
+    const data = await res.json();
+    if (index === currentEpisodeIndex && data.version !== episodeVersion) {
+        onEpisodeChangedElsewhere();
+    }
+}
+
+async function onEpisodeChangedElsewhere() {
+    if (reloadPrompted) return;
+    reloadPrompted = true;
+    try {
+        const warning = hasUnsavedChanges ? '未保存的修改将丢失。' : '';
+        if (await customConfirm(`本集字幕已在其他地方被修改，是否重新加载？${warning}`, '文件已修改')) {
+            hasUnsavedChanges = false;
+            await loadEpisode(currentEpisodeIndex);
+        }
+    } finally {
+        reloadPrompted = false;
+    }
+}
 let currentEpisodeIndex = -1;
 let allMatches = [];
 let currentBlocks = [];
@@ -60,6 +191,7 @@ document.addEventListener('DOMContentLoaded', () => {
     videoPlayer.addEventListener('loadedmetadata', () => {
         console.log('Video loaded, duration:', videoPlayer.duration);
     });
+    connectSocket();
 });
 
 // File uploads
@@ -73,7 +205,7 @@ document.getElementById('zh-zip').addEventListener('change', async (e) => {
     const formData = new FormData();
     formData.append('file', file);
     try {
-        const res = await fetch(`${API_BASE}/upload/zh`, { method: 'POST', body: formData });
+        const res = await fetch(apiUrl('/upload/zh'), { method: 'POST', body: formData });
         console.log('Upload response:', res.status);
         const data = await res.json();
         console.log('Upload result:', data);
@@ -97,7 +229,7 @@ document.getElementById('en-zip').addEventListener('change', async (e) => {
     const formData = new FormData();
     formData.append('file', file);
     try {
-        const res = await fetch(`${API_BASE}/upload/en`, { method: 'POST', body: formData });
+        const res = await fetch(apiUrl('/upload/en'), { method: 'POST', body: formData });
         console.log('Upload response:', res.status);
         const data = await res.json();
         console.log('Upload result:', data);
@@ -121,10 +253,11 @@ async function matchFiles() {
     const btn = document.querySelector('button[onclick="matchFiles()"]');
     btn.disabled = true;
     btn.textContent = "匹配中...";
+    jobButtons.match = btn;
     
     try {
         console.log('Sending match request with video path:', videoPath);
-        const res = await fetch(`${API_BASE}/match`, {
+        const res = await fetch(apiUrl(`/match?client=${CLIENT_ID}`), {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ video_path: videoPath })
@@ -152,6 +285,7 @@ async function matchFiles() {
         console.error('Match failed:', e);
         await customAlert('匹配失败: ' + e.message, '错误');
     } finally {
+        delete jobButtons.match;
         btn.disabled = false;
         btn.textContent = "匹配文件";
     }
@@ -166,10 +300,11 @@ async function rematchVideos() {
     const btn = event.target;
     btn.disabled = true;
     btn.textContent = "🔄 重新匹配中...";
+    jobButtons.match = btn;
     
     try {
         console.log('Sending rematch videos request...');
-        const res = await fetch(`${API_BASE}/rematch-videos`, {
+        const res = await fetch(apiUrl(`/rematch-videos?client=${CLIENT_ID}`), {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' }
         });
@@ -191,8 +326,7 @@ async function rematchVideos() {
         if (currentEpisodeIndex >= 0 && currentEpisodeIndex < matches.length) {
             const match = matches[currentEpisodeIndex];
             if (match.video) {
-                const videoPath = `/video/stream?file=${encodeURIComponent(match.video)}`;
-                videoPlayer.src = videoPath;
+                videoPlayer.src = videoUrl(match.video);
                 console.log('Updated video for current episode:', match.video);
             }
         }
@@ -202,6 +336,7 @@ async function rematchVideos() {
         console.error('Rematch failed:', e);
         await customAlert('重新匹配失败: ' + e.message, '错误');
     } finally {
+        delete jobButtons.match;
         btn.disabled = false;
         btn.textContent = "刷新视频";
     }
@@ -251,17 +386,30 @@ async function loadEpisode(index) {
     }
     
     currentEpisodeIndex = index;
+    const token = ++episodeLoadToken;
     try {
-        const res = await fetch(`${API_BASE}/episode/${index}?primary=${currentPrimary}`);
+        // 先只取首屏的字幕，剩余部分在后台加载
+        const episodeQuery = `/episode/${index}?primary=${currentPrimary}`;
+        const res = await fetch(apiUrl(`${episodeQuery}&offset=0&limit=${FIRST_PAGE_SIZE}`));
         if (!res.ok) throw new Error('Failed to load episode');
         const data = await res.json();
         
         currentBlocks = data.blocks || [];
+        episodeVersion = data.version;
+        pendingEdits = new Set();
+        activeBlockIndex = -1;
         renderBlocks(currentBlocks);
         
+        if (data.total > currentBlocks.length) {
+            blocksReady = loadRemainingBlocks(episodeQuery, currentBlocks.length, token);
+            blocksReady.catch(e => console.error('Failed to load remaining blocks:', e));
+        } else {
+            blocksReady = Promise.resolve();
+        }
+        
         // Update info and show primary switch
         const info = document.getElementById('current-episode-info');
-        info.textContent = `第${allMatches[index].episode}集 - 共 ${currentBlocks.length} 条字幕`;
+        info.textContent = `第${allMatches[index].episode}集 - 共 ${data.total} 条字幕`;
         
         document.getElementById('primary-switch').style.display = 'flex';
         document.getElementById('primary-lang').value = currentPrimary;
@@ -269,7 +417,7 @@ async function loadEpisode(index) {
         // Load video
         const placeholder = document.getElementById('video-placeholder');
         if (data.video_path) {
-            videoPlayer.src = `http://localhost:8000/video/stream?path=${encodeURIComponent(data.video_path)}`;
+            videoPlayer.src = videoUrl(data.video_path);
             placeholder.style.display = 'none';
         } else {
             videoPlayer.removeAttribute('src');
@@ -280,11 +428,23 @@ async function loadEpisode(index) {
         document.querySelectorAll('.episode-item').forEach((el, i) => {
             el.classList.toggle('active', i === index);
         });
+        
+        warmNextVideo(index);
     } catch (e) {
         await customAlert('加载失败: ' + e, '错误');
     }
 }
 
+// 请求下一集视频的开头，服务器会把文件开头读入内存，切换剧集时首帧直接从内存返回
+// （下一集的字幕由服务器在返回本集时自动预取）
+function warmNextVideo(index) {
+    const next = allMatches[index + 1];
+    if (!next || !next.video) return;
+    fetch(videoUrl(next.video), { headers: { 'Range': 'bytes=0-65535' } })
+        .then(res => res.arrayBuffer())
+        .catch(e => console.warn('Video prefetch failed:', e));
+}
+
 async function switchPrimary() {
     const select = document.getElementById('primary-lang');
     currentPrimary = select.value;
@@ -296,79 +456,243 @@ async function switchPrimary() {
     }
 }
 
-function renderBlocks(blocks) {
+// 剩余字幕加载完成前，整集保存/修正需要等待它，避免只保存首屏
+async function loadRemainingBlocks(episodeQuery, offset, token) {
+    const res = await fetch(apiUrl(`${episodeQuery}&offset=${offset}`));
+    if (!res.ok) throw new Error('Failed to load episode');
+    const data = await res.json();
+    if (token !== episodeLoadToken) return;  // 已切换到其他剧集
+    if (data.version !== episodeVersion) {
+        throw new Error('本集在加载过程中被修改，请重新打开');
+    }
+    currentBlocks.push(...data.blocks);
+    appendVirtualBlocks(data.blocks.length);
+}
+
+// ============= 虚拟列表 =============
+// 只渲染可视区域及上下缓冲区内的字幕，打开长片和滚动的开销与总条数无关
+const FIRST_PAGE_SIZE = 60;          // 首次请求的条数
+const VIRTUAL_BUFFER = 8;            // 可视区上下额外渲染的条数
+const ESTIMATED_BLOCK_HEIGHT = 200;  // 未渲染过的字幕的估计高度（px）
+const BLOCK_GAP = 8;                 // 与 .subtitle-block 的 margin-bottom 一致
+
+let blockHeights = [];     // 每条字幕的高度（已测量或估计）
+let blockOffsets = [0];    // blockOffsets[i] 为第 i 条的顶部位置
+let offsetsDirty = true;
+let renderedEls = new Map();  // index -> element
+let renderedStart = 0;
+let renderedEnd = 0;
+let virtualUpdateScheduled = false;
+let activeBlockIndex = -1;
+let blocksReady = Promise.resolve();
+let episodeLoadToken = 0;
+let episodeVersion = null;     // 服务器上本集的版本号，提交修改时用于检测冲突
+let pendingEdits = new Set();  // 已修改但未保存的字幕索引
+
+function renderBlocks(blocks, keepScroll = false) {
+    const container = document.getElementById('subtitle-blocks');
+    const scrollTop = keepScroll ? container.scrollTop : 0;
+    container.innerHTML = '<div id="virtual-top"></div><div id="virtual-rows"></div><div id="virtual-bottom"></div>';
+    container.onscroll = scheduleVirtualUpdate;
+    
+    renderedEls = new Map();
+    renderedStart = renderedEnd = 0;
+    blockHeights = blocks.map(() => ESTIMATED_BLOCK_HEIGHT);
+    offsetsDirty = true;
+    buildCueIndex(blocks);
+    
+    // 先撑开高度再恢复滚动位置
+    updateVirtualSpacers();
+    container.scrollTop = scrollTop;
+    updateVirtualList();
+}
+
+function appendVirtualBlocks(count) {
+    for (let i = 0; i < count; i++) {
+        blockHeights.push(ESTIMATED_BLOCK_HEIGHT);
+    }
+    buildCueIndex(currentBlocks);
+    offsetsDirty = true;
+    updateVirtualList();
+}
+
+function recomputeOffsets() {
+    blockOffsets = new Array(blockHeights.length + 1);
+    blockOffsets[0] = 0;
+    for (let i = 0; i < blockHeights.length; i++) {
+        blockOffsets[i + 1] = blockOffsets[i] + blockHeights[i];
+    }
+    offsetsDirty = false;
+}
+
+// 顶部位置 <= y 的最后一条字幕
+function blockAtOffset(y) {
+    let lo = 0;
+    let hi = blockHeights.length - 1;
+    while (lo < hi) {
+        const mid = (lo + hi + 1) >> 1;
+        if (blockOffsets[mid] <= y) lo = mid;
+        else hi = mid - 1;
+    }
+    return lo;
+}
+
+function scheduleVirtualUpdate() {
+    if (virtualUpdateScheduled) return;
+    virtualUpdateScheduled = true;
+    requestAnimationFrame(() => {
+        virtualUpdateScheduled = false;
+        updateVirtualList();
+    });
+}
+
+function updateVirtualSpacers() {
+    if (offsetsDirty) recomputeOffsets();
+    const total = blockOffsets[blockHeights.length];
+    document.getElementById('virtual-top').style.height = blockOffsets[renderedStart] + 'px';
+    document.getElementById('virtual-bottom').style.height = (total - blockOffsets[renderedEnd]) + 'px';
+}
+
+function updateVirtualList() {
     const container = document.getElementById('subtitle-blocks');
-    container.innerHTML = '';
+    const rows = document.getElementById('virtual-rows');
+    if (!rows) return;
+    if (offsetsDirty) recomputeOffsets();
+    
+    const count = currentBlocks.length;
+    const first = blockAtOffset(container.scrollTop);
+    const last = blockAtOffset(container.scrollTop + container.clientHeight);
+    const start = count ? Math.max(0, first - VIRTUAL_BUFFER) : 0;
+    const end = Math.min(count, last + 1 + VIRTUAL_BUFFER);
+    
+    // 移除离开范围的字幕，保留仍在范围内的元素（不打断正在编辑的输入框）
+    for (const [i, el] of renderedEls) {
+        if (i < start || i >= end) {
+            el.remove();
+            renderedEls.delete(i);
+        }
+    }
     
-    blocks.forEach((block, index) => {
-        const blockDiv = document.createElement('div');
-        blockDiv.className = 'subtitle-block';
-        blockDiv.id = `block-${index}`;
-        
-        // Calculate duration and chars per second
-        const duration = calculateDuration(block.start, block.end);
-        const zhChars = block.zh_text ? block.zh_text.length : 0;
-        const enChars = block.en_text ? block.en_text.length : 0;
-        const zhLines = block.zh_text ? block.zh_text.split('\n').length : 0;
-        const enLines = block.en_text ? block.en_text.split('\n').length : 0;
-        const zhCps = duration > 0 ? (zhChars / duration) : 0;
-        const enCps = duration > 0 ? (enChars / duration) : 0;
-        
-        // Check for long lines
-        const zhHasLongLine = block.zh_text ? block.zh_text.split('\n').some(line => line.length > 40) : false;
-        const enHasLongLine = block.en_text ? block.en_text.split('\n').some(line => line.length > 40) : false;
-        
-        // Get CPS colors
-        const zhCpsColor = getCpsColor(zhCps);
-        const enCpsColor = getCpsColor(enCps);
-        const zhLineColor = zhHasLongLine ? '#ff0000' : '#666';
-        const enLineColor = enHasLongLine ? '#ff0000' : '#666';
-        
-        blockDiv.innerHTML = `
-            <div class="block-header">
-                <div class="block-index">${block.index}</div>
-                <div class="block-info">
-                    <div class="block-time">${block.start} - ${block.end}</div>
-                </div>
-                <div class="block-controls">
-                    <button onclick="jumpToTime('${block.start}')" title="跳转">⏱</button>
-                    <button onclick="playBlock('${block.start}', '${block.end}')" title="播放">▶</button>
-                    <button onclick="openSplitModal(${index})" title="手动分轴">✂</button>
-                    <button onclick="deleteBlock(${index})" title="删除" class="btn-delete">🗑</button>
-                </div>
+    const created = [];
+    if (renderedEls.size === 0) {
+        for (let i = start; i < end; i++) {
+            const el = createBlockElement(currentBlocks[i], i);
+            rows.appendChild(el);
+            created.push(i);
+        }
+    } else {
+        const keptStart = Math.max(renderedStart, start);
+        const keptEnd = Math.min(renderedEnd, end);
+        for (let i = keptStart - 1; i >= start; i--) {
+            const el = createBlockElement(currentBlocks[i], i);
+            rows.insertBefore(el, rows.firstChild);
+            created.push(i);
+        }
+        for (let i = keptEnd; i < end; i++) {
+            const el = createBlockElement(currentBlocks[i], i);
+            rows.appendChild(el);
+            created.push(i);
+        }
+    }
+    renderedStart = start;
+    renderedEnd = end;
+    
+    created.forEach(measureBlock);
+    updateVirtualSpacers();
+}
+
+// 根据实际渲染高度更新估计值
+function measureBlock(index) {
+    const el = renderedEls.get(index);
+    if (!el) return;
+    el.querySelectorAll('textarea').forEach(autoResizeTextarea);
+    const height = el.offsetHeight + BLOCK_GAP;
+    if (height !== blockHeights[index]) {
+        blockHeights[index] = height;
+        offsetsDirty = true;
+    }
+}
+
+function isBlockVisible(index) {
+    const container = document.getElementById('subtitle-blocks');
+    if (offsetsDirty) recomputeOffsets();
+    return blockOffsets[index] >= container.scrollTop &&
+        blockOffsets[index + 1] <= container.scrollTop + container.clientHeight;
+}
+
+function scrollToBlock(index) {
+    const container = document.getElementById('subtitle-blocks');
+    if (offsetsDirty) recomputeOffsets();
+    const top = blockOffsets[index] - (container.clientHeight - blockHeights[index]) / 2;
+    container.scrollTo({ top: Math.max(0, top), behavior: 'smooth' });
+}
+
+function createBlockElement(block, index) {
+    const blockDiv = document.createElement('div');
+    blockDiv.className = 'subtitle-block';
+    blockDiv.id = `block-${index}`;
+    
+    // Calculate duration and chars per second
+    const duration = calculateDuration(block.start, block.end);
+    const zhChars = block.zh_text ? block.zh_text.length : 0;
+    const enChars = block.en_text ? block.en_text.length : 0;
+    const zhLines = block.zh_text ? block.zh_text.split('\n').length : 0;
+    const enLines = block.en_text ? block.en_text.split('\n').length : 0;
+    const zhCps = duration > 0 ? (zhChars / duration) : 0;
+    const enCps = duration > 0 ? (enChars / duration) : 0;
+    
+    // Check for long lines
+    const zhHasLongLine = block.zh_text ? block.zh_text.split('\n').some(line => line.length > 40) : false;
+    const enHasLongLine = block.en_text ? block.en_text.split('\n').some(line => line.length > 40) : false;
+    
+    // Get CPS colors
+    const zhCpsColor = getCpsColor(zhCps);
+    const enCpsColor = getCpsColor(enCps);
+    const zhLineColor = zhHasLongLine ? '#ff0000' : '#666';
+    const enLineColor = enHasLongLine ? '#ff0000' : '#666';
+    
+    blockDiv.innerHTML = `
+        <div class="block-header">
+            <div class="block-index">${block.index}</div>
+            <div class="block-info">
+                <div class="block-time">${block.start} - ${block.end}</div>
             </div>
-            <div class="subtitle-input zh">
-                <div class="subtitle-header">
-                    <label>中文字幕</label>
-                    <div class="subtitle-stats">
-                        <span class="char-count">${zhChars} 字符</span>
-                        <span class="line-count" style="color: ${zhLineColor}">${zhLines} 行</span>
-                        <span class="cps-count" style="color: ${zhCpsColor}">CPS: ${zhCps.toFixed(1)}</span>
-                    </div>
+            <div class="block-controls">
+                <button onclick="jumpToTime('${block.start}')" title="跳转">⏱</button>
+                <button onclick="playBlock('${block.start}', '${block.end}')" title="播放">▶</button>
+                <button onclick="openSplitModal(${index})" title="手动分轴">✂</button>
+                <button onclick="deleteBlock(${index})" title="删除" class="btn-delete">🗑</button>
+            </div>
+        </div>
+        <div class="subtitle-input zh">
+            <div class="subtitle-header">
+                <label>中文字幕</label>
+                <div class="subtitle-stats">
+                    <span class="char-count">${zhChars} 字符</span>
+                    <span class="line-count" style="color: ${zhLineColor}">${zhLines} 行</span>
+                    <span class="cps-count" style="color: ${zhCpsColor}">CPS: ${zhCps.toFixed(1)}</span>
                 </div>
-                <textarea readonly>${escapeHtml(block.zh_text)}</textarea>
             </div>
-            <div class="subtitle-input en">
-                <div class="subtitle-header">
-                    <label>外语字幕</label>
-                    <div class="subtitle-stats">
-                        <span class="char-count">${enChars} 字符</span>
-                        <span class="line-count" style="color: ${enLineColor}">${enLines} 行</span>
-                        <span class="cps-count" style="color: ${enCpsColor}">CPS: ${enCps.toFixed(1)}</span>
-                    </div>
+            <textarea readonly>${escapeHtml(block.zh_text)}</textarea>
+        </div>
+        <div class="subtitle-input en">
+            <div class="subtitle-header">
+                <label>外语字幕</label>
+                <div class="subtitle-stats">
+                    <span class="char-count">${enChars} 字符</span>
+                    <span class="line-count" style="color: ${enLineColor}">${enLines} 行</span>
+                    <span class="cps-count" style="color: ${enCpsColor}">CPS: ${enCps.toFixed(1)}</span>
                 </div>
-                <textarea id="en-${index}" oninput="onBlockEdit(${index})">${escapeHtml(block.en_text)}</textarea>
             </div>
-        `;
-        
-        container.appendChild(blockDiv);
-        
-        // Auto-resize textareas
-        const zhTextarea = blockDiv.querySelector('.subtitle-input.zh textarea');
-        const enTextarea = blockDiv.querySelector('.subtitle-input.en textarea');
-        autoResizeTextarea(zhTextarea);
-        autoResizeTextarea(enTextarea);
-    });
+            <textarea id="en-${index}" oninput="onBlockEdit(${index})">${escapeHtml(block.en_text)}</textarea>
+        </div>
+    `;
+    
+    if (index === activeBlockIndex) {
+        blockDiv.classList.add('active');
+    }
+    renderedEls.set(index, blockDiv);
+    return blockDiv;
 }
 
 function calculateDuration(start, end) {
@@ -415,6 +739,8 @@ function jumpToTime(timeStr) {
     }
 }
 
+let playBlockTimer = null;
+
 function playBlock(startStr, endStr) {
     if (!videoPlayer.src) return;
     
@@ -424,38 +750,83 @@ function playBlock(startStr, endStr) {
     videoPlayer.currentTime = start;
     videoPlayer.play();
     
-    // Stop at end time
-    const checkTime = setInterval(() => {
-        if (videoPlayer.currentTime >= end) {
-            videoPlayer.pause();
-            clearInterval(checkTime);
+    // Stop at end time（连续点击时只保留最后一个定时器）
+    clearInterval(playBlockTimer);
+    playBlockTimer = setInterval(() => {
+        if (videoPlayer.currentTime >= end || videoPlayer.paused) {
+            if (videoPlayer.currentTime >= end) videoPlayer.pause();
+            clearInterval(playBlockTimer);
+            playBlockTimer = null;
         }
     }, 100);
 }
 
+// ============= 字幕时间查找 =============
+// 加载时把时间转换成秒存入数组，播放时二分查找；顺序播放时从上次的位置直接前进
+let cueStarts = [];
+let cueEnds = [];
+let cueMaxDuration = 0;
+let cueCursor = -1;        // 最后一条开始时间 <= 当前时间的字幕
+let overlayIndex = -2;     // 字幕层当前显示的字幕（-2 表示未初始化）
+
+function buildCueIndex(blocks) {
+    cueStarts = new Array(blocks.length);
+    cueEnds = new Array(blocks.length);
+    cueMaxDuration = 0;
+    for (let i = 0; i < blocks.length; i++) {
+        cueStarts[i] = timeToSeconds(blocks[i].start);
+        cueEnds[i] = timeToSeconds(blocks[i].end);
+        cueMaxDuration = Math.max(cueMaxDuration, cueEnds[i] - cueStarts[i]);
+    }
+    cueCursor = -1;
+    overlayIndex = -2;
+}
+
+// 最后一条开始时间 <= t 的字幕索引，没有时为 -1
+function cueCursorAt(t) {
+    const n = cueStarts.length;
+    const c = cueCursor;
+    // 顺序播放：仍在当前或下一条
+    if (c >= -1 && c < n) {
+        const fitsFrom = c < 0 || cueStarts[c] <= t;
+        if (fitsFrom && (c + 1 >= n || cueStarts[c + 1] > t)) return c;
+        if (c + 1 < n && cueStarts[c + 1] <= t && (c + 2 >= n || cueStarts[c + 2] > t)) return c + 1;
+    }
+    let lo = 0;
+    let hi = n;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (cueStarts[mid] <= t) lo = mid + 1;
+        else hi = mid;
+    }
+    return lo - 1;
+}
+
+// 覆盖时间 t 的第一条字幕，没有时为 -1
+function findCueAt(t) {
+    cueCursor = cueCursorAt(t);
+    let found = -1;
+    // 只需回看开始时间在 cueMaxDuration 之内的字幕
+    for (let i = cueCursor; i >= 0 && cueStarts[i] >= t - cueMaxDuration; i--) {
+        if (cueEnds[i] >= t) found = i;
+    }
+    return found;
+}
+
 function onVideoTimeUpdate() {
     currentTime = videoPlayer.currentTime;
-    highlightCurrentBlock();
-    updateSubtitleOverlay();
+    const index = findCueAt(currentTime);
+    highlightCurrentBlock(index);
+    updateSubtitleOverlay(index);
 }
 
-function updateSubtitleOverlay() {
+function updateSubtitleOverlay(index = findCueAt(currentTime), force = false) {
     const overlay = document.getElementById('subtitle-overlay');
     if (!overlay) return;
+    if (index === overlayIndex && !force) return;
+    overlayIndex = index;
     
-    // Find current subtitle block
-    let currentBlock = null;
-    for (let i = 0; i < currentBlocks.length; i++) {
-        const block = currentBlocks[i];
-        const start = timeToSeconds(block.start);
-        const end = timeToSeconds(block.end);
-        
-        if (currentTime >= start && currentTime <= end) {
-            currentBlock = block;
-            break;
-        }
-    }
-    
+    const currentBlock = index >= 0 ? currentBlocks[index] : null;
     if (currentBlock && currentBlock.en_text) {
         overlay.textContent = currentBlock.en_text;
         overlay.style.display = 'block';
@@ -464,34 +835,20 @@ function updateSubtitleOverlay() {
     }
 }
 
-function highlightCurrentBlock() {
-    currentBlocks.forEach((block, index) => {
-        const start = timeToSeconds(block.start);
-        const end = timeToSeconds(block.end);
-        const blockEl = document.getElementById(`block-${index}`);
-        
-        if (blockEl) {
-            if (currentTime >= start && currentTime <= end) {
-                blockEl.classList.add('active');
-                // Scroll into view
-                if (!isInViewport(blockEl)) {
-                    blockEl.scrollIntoView({ behavior: 'smooth', block: 'center' });
-                }
-            } else {
-                blockEl.classList.remove('active');
-            }
-        }
-    });
-}
-
-function isInViewport(element) {
-    const rect = element.getBoundingClientRect();
-    const container = document.getElementById('subtitle-blocks');
-    const containerRect = container.getBoundingClientRect();
-    return (
-        rect.top >= containerRect.top &&
-        rect.bottom <= containerRect.bottom
-    );
+function highlightCurrentBlock(index = findCueAt(currentTime)) {
+    if (index === activeBlockIndex) return;
+    
+    const previousEl = renderedEls.get(activeBlockIndex);
+    if (previousEl) previousEl.classList.remove('active');
+    activeBlockIndex = index;
+    if (index < 0) return;
+    
+    const blockEl = renderedEls.get(index);
+    if (blockEl) blockEl.classList.add('active');
+    // Scroll into view（未渲染的字幕按计算出的位置滚动）
+    if (!isBlockVisible(index)) {
+        scrollToBlock(index);
+    }
 }
 
 let saveTimeout = null;
@@ -503,18 +860,23 @@ function onBlockEdit(index) {
     
     // Update local data
     currentBlocks[index].en_text = newText;
+    pendingEdits.add(index);
     
     // Mark as having unsaved changes
     hasUnsavedChanges = true;
     
     // Auto-resize textarea
     autoResizeTextarea(textarea);
+    measureBlock(index);
+    if (offsetsDirty) updateVirtualSpacers();
     
     // Update stats
     updateBlockStats(index, 'en');
     
     // Update video subtitle overlay if this is the current playing block
-    updateSubtitleOverlay();
+    if (index === overlayIndex) {
+        updateSubtitleOverlay(index, true);
+    }
     
     // Note: Auto-save removed - user must click "保存当前集" to save changes
     // This ensures we save complete subtitle files, not partial updates
@@ -583,24 +945,67 @@ async function saveBlock(index) {
     
     try {
         const block = currentBlocks[index];
-        await fetch(`${API_BASE}/update-block`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                episode_index: currentEpisodeIndex,
-                block_index: index,
-                text: block.en_text,
-                type: 'en',
-                start: block.start,
-                end: block.end
-            })
-        });
+        await sendPatch([
+            { op: 'edit', index: index, en_text: block.en_text },
+            { op: 'retime', index: index, start: block.start, end: block.end }
+        ]);
+        pendingEdits.delete(index);
         // Silent save
     } catch (e) {
         console.error('自动保存失败:', e);
     }
 }
 
+// 未保存的文本修改转换成 edit 操作（按索引顺序）
+function takeEditOps() {
+    const ops = [...pendingEdits].sort((a, b) => a - b)
+        .filter(i => i < currentBlocks.length)
+        .map(i => ({ op: 'edit', index: i, en_text: currentBlocks[i].en_text }));
+    pendingEdits = new Set();
+    return ops;
+}
+
+// 提交有序的修改操作；服务器只重写受影响语言的文件
+// 优先通过 WebSocket 发送并等待确认，连接不可用时改用 HTTP
+async function sendPatch(ops, langs = null) {
+    let status = null, data = null, error = null;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+        try {
+            const ack = await socketRequest({
+                type: 'patch', episode: currentEpisodeIndex, primary: currentPrimary,
+                base_version: episodeVersion, ops: ops, langs: langs
+            });
+            status = ack.ok ? 200 : ack.status;
+            data = ack;
+            error = ack.error;
+        } catch (e) {
+            // 连接中断：用 HTTP 重新提交；若已应用过，版本号不符会返回 409
+            console.warn('WebSocket patch failed, retrying over HTTP:', e);
+        }
+    }
+    if (status === null) {
+        const res = await fetch(apiUrl(`/episode/${currentEpisodeIndex}/patch?primary=${currentPrimary}&client=${CLIENT_ID}`), {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ base_version: episodeVersion, ops: ops, langs: langs })
+        });
+        status = res.status;
+        if (res.ok) data = await res.json();
+        else error = await res.text();
+    }
+    if (status === 409) {
+        hasUnsavedChanges = false;
+        await customAlert('本集已在其他地方被修改，将重新加载', '版本冲突');
+        await loadEpisode(currentEpisodeIndex);
+        throw new Error('Episode version conflict');
+    }
+    if (status !== 200) {
+        throw new Error(`HTTP ${status}: ${typeof error === 'string' ? error : JSON.stringify(error)}`);
+    }
+    episodeVersion = data.version;
+    return data;
+}
+
 async function saveAll() {
     if (currentEpisodeIndex === -1) return;
     
@@ -609,41 +1014,13 @@ async function saveAll() {
     btn.textContent = "保存中...";
     
     try {
-        // Collect all blocks with updated content from textarea
-        const updatedBlocks = currentBlocks.map((block, index) => {
-            const textarea = document.getElementById(`en-${index}`);
-            if (textarea) {
-                block.en_text = textarea.value;
-            }
-            return block;
-        });
+        // 等待剩余字幕加载完成，避免只保存已加载的部分
+        await blocksReady;
         
-        // Save Chinese subtitles (extract only Chinese blocks)
-        const zhBlocks = updatedBlocks.filter(b => b.zh_text && b.zh_text.trim());
-        if (zhBlocks.length > 0) {
-            await fetch(`${API_BASE}/save-all-blocks`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    episode_index: currentEpisodeIndex,
-                    blocks: zhBlocks,
-                    type: 'zh'
-                })
-            });
-        }
-        
-        // Save Foreign subtitles (extract only Foreign blocks)
-        const enBlocks = updatedBlocks.filter(b => b.en_text && b.en_text.trim());
-        if (enBlocks.length > 0) {
-            await fetch(`${API_BASE}/save-all-blocks`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    episode_index: currentEpisodeIndex,
-                    blocks: enBlocks,
-                    type: 'en'
-                })
-            });
+        // 只提交修改过的字幕
+        const ops = takeEditOps();
+        if (ops.length > 0) {
+            await sendPatch(ops);
         }
         
         hasUnsavedChanges = false;
@@ -658,6 +1035,29 @@ async function saveAll() {
     }
 }
 
+// 流式 AI 修正：序号 -> 块位置，以及修正前的译文（失败时恢复）
+let correctionTargets = null;
+
+function setBlockEnText(blockIndex, text) {
+    if (currentBlocks[blockIndex].en_text !== text) {
+        pendingEdits.add(blockIndex);
+        hasUnsavedChanges = true;
+    }
+    currentBlocks[blockIndex].en_text = text;
+    const textarea = document.getElementById(`en-${blockIndex}`);
+    if (textarea) {
+        textarea.value = text;
+        const charCountEl = textarea.parentElement.querySelector('.char-count');
+        charCountEl.textContent = `${text.length} 字符 | ${text.split('\n').length} 行`;
+    }
+}
+
+function applyCorrectedCue(number, text) {
+    if (!correctionTargets) return;
+    const blockIndex = correctionTargets.positions.get(number);
+    if (blockIndex !== undefined) setBlockEnText(blockIndex, text);
+}
+
 async function correctCurrent() {
     if (currentEpisodeIndex === -1) return;
     
@@ -672,7 +1072,9 @@ async function correctCurrent() {
             await saveAll();
         }
         
+        await blocksReady;
         btn.textContent = "AI修正中...";
+        jobButtons.correct = btn;
         
         // Reconstruct full SRT
         let srtContent = '';
@@ -680,11 +1082,20 @@ async function correctCurrent() {
             srtContent += `${block.index}\n${block.start} --> ${block.end}\n${block.en_text}\n\n`;
         });
         
+        // 修正结果逐块通过 /ws 推送，到达后立即显示；最终结果仍以响应为准
+        correctionTargets = {
+            positions: new Map(currentBlocks.map((b, i) => [b.index, i])),
+            original: currentBlocks.map(b => b.en_text),
+            edits: new Set(pendingEdits),
+            unsaved: hasUnsavedChanges,
+        };
+        
         // Send empty rules - backend will auto-load from rules.txt
-        const res = await fetch(`${API_BASE}/correct`, {
+        const res = await fetch(apiUrl(`/correct?client=${CLIENT_ID}`), {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ content: srtContent, rules: '' })
+            // 附上每块的中文原文：翻译记忆中已确认译文的块不会发送给模型
+            body: JSON.stringify({ content: srtContent, rules: '', sources: currentBlocks.map(b => b.zh_text || ''), stream: true })
         });
         
         if (!res.ok) throw new Error('Correction failed');
@@ -712,33 +1123,108 @@ async function correctCurrent() {
                 }
                 
                 if (blockIndex < currentBlocks.length) {
-                    currentBlocks[blockIndex].en_text = text;
-                    const textarea = document.getElementById(`en-${blockIndex}`);
-                    if (textarea) {
-                        textarea.value = text;
-                        // Update char count
-                        const charCountEl = textarea.parentElement.querySelector('.char-count');
-                        const chars = text.length;
-                        const textLines = text.split('\n').length;
-                        charCountEl.textContent = `${chars} 字符 | ${textLines} 行`;
-                    }
+                    setBlockEnText(blockIndex, text);
                     blockIndex++;
                 }
             }
             i++;
         }
+        // 刷新字数统计和行高
+        renderBlocks(currentBlocks, true);
         
+        correctionTargets = null;
         await customAlert('AI修正完成！已应用"rules.txt"中的规则，请检查并保存');
     } catch (e) {
+        // 已推送的部分结果未通过最终校验，恢复修正前的译文
+        const targets = correctionTargets;
+        correctionTargets = null;
+        if (targets && targets.original.length === currentBlocks.length) {
+            targets.original.forEach((text, i) => setBlockEnText(i, text));
+            pendingEdits = targets.edits;
+            hasUnsavedChanges = targets.unsaved;
+        }
         await customAlert('修正失败: ' + e, '错误');
     } finally {
+        correctionTargets = null;
+        delete jobButtons.correct;
         btn.disabled = false;
         btn.textContent = "AI修正当前集";
     }
 }
 
 function exportEn() {
-    window.open(`${API_BASE}/export/en`, '_blank');
+    // 未选格式时导出上传的原始外语文件，否则按所选格式重新生成整季
+    const format = document.getElementById('export-format').value;
+    if (!format) {
+        window.open(apiUrl('/export/en'), '_blank');
+        return;
+    }
+    window.open(apiUrl(`/export/season?format=${format}&lang=en&primary=${currentPrimary}`), '_blank');
+}
+
+// ============= 全季搜索 =============
+function openSearch() {
+    document.getElementById('search-modal').classList.add('active');
+    document.getElementById('search-input').focus();
+}
+
+function closeSearch() {
+    document.getElementById('search-modal').classList.remove('active');
+}
+
+document.getElementById('search-input').addEventListener('keydown', (e) => {
+    if (e.key === 'Enter') runSearch();
+});
+
+async function runSearch() {
+    const q = document.getElementById('search-input').value.trim();
+    if (!q) return;
+    const params = new URLSearchParams({
+        q,
+        lang: document.getElementById('search-lang').value,
+        mode: document.getElementById('search-regex').checked ? 'regex' : 'text',
+    });
+    const summary = document.getElementById('search-summary');
+    const list = document.getElementById('search-results');
+    summary.textContent = '搜索中...';
+    try {
+        const res = await fetch(apiUrl(`/search?${params}`));
+        const data = await res.json();
+        if (!res.ok) throw new Error(data.detail || res.status);
+        summary.textContent = data.truncated
+            ? `共 ${data.count} 条，显示前 ${data.results.length} 条`
+            : `共 ${data.count} 条`;
+        list.innerHTML = '';
+        data.results.forEach(r => {
+            const div = document.createElement('div');
+            div.className = 'search-result';
+            div.innerHTML = `
+                <div class="search-result-meta">第${escapeHtml(r.episode || String(r.episode_index + 1))}集 · ${secondsToTime(r.start_ms / 1000)} · ${r.lang === 'zh' ? '中文' : '外语'} #${r.index}</div>
+                <div class="search-result-text">${escapeHtml(r.text)}</div>
+            `;
+            div.onclick = () => { closeSearch(); openCue(r); };
+            list.appendChild(div);
+        });
+    } catch (e) {
+        summary.textContent = '搜索失败: ' + e.message;
+        list.innerHTML = '';
+    }
+}
+
+// 打开搜索结果或质检问题所在的剧集，滚动到对应字幕并把视频定位到该时间
+async function openCue(r) {
+    if (!allMatches[r.episode_index]) {
+        await customAlert('请先匹配剧集', '提示');
+        return;
+    }
+    if (currentEpisodeIndex !== r.episode_index) {
+        await loadEpisode(r.episode_index);
+        if (currentEpisodeIndex !== r.episode_index) return;
+    }
+    await blocksReady;
+    const index = currentBlocks.findIndex(b => timeToSeconds(b.end) * 1000 > r.start_ms);
+    if (index !== -1) scrollToBlock(index);
+    if (videoPlayer.src) videoPlayer.currentTime = r.start_ms / 1000;
 }
 
 // ============= 手动分轴功能 =============
@@ -816,6 +1302,10 @@ function closeSplitModal() {
     };
 }
 
+// 分段在分割点变化时重建（renderSplitSegments），播放时只在分段切换时更新字幕显示
+let splitSegmentsCache = [];
+let splitSegmentIndex = -2;
+
 function updateSplitProgress() {
     if (!splitVideoPlayer) return;
     
@@ -843,19 +1333,29 @@ function updateSplitProgress() {
 }
 
 function updateSplitSubtitleDisplay(relativeTime) {
-    const segments = getSplitSegments();
-    const display = document.getElementById('split-subtitle-display');
-    
-    for (let i = 0; i < segments.length; i++) {
-        const seg = segments[i];
-        if (relativeTime >= seg.start && relativeTime < seg.end) {
-            display.textContent = seg.text;
-            display.style.display = 'block';
-            return;
-        }
+    const segments = splitSegmentsCache;
+    let index = -1;
+    // 分割点已排序，二分查找 start <= relativeTime 的最后一段
+    let lo = 0;
+    let hi = segments.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (segments[mid].start <= relativeTime) lo = mid + 1;
+        else hi = mid;
+    }
+    if (lo > 0 && relativeTime < segments[lo - 1].end) {
+        index = lo - 1;
     }
+    if (index === splitSegmentIndex) return;
+    splitSegmentIndex = index;
     
-    display.style.display = 'none';
+    const display = document.getElementById('split-subtitle-display');
+    if (index >= 0) {
+        display.textContent = segments[index].text;
+        display.style.display = 'block';
+    } else {
+        display.style.display = 'none';
+    }
 }
 
 function seekSplitVideo(e) {
@@ -912,6 +1412,8 @@ function getSplitSegments() {
 
 function renderSplitSegments() {
     const segments = getSplitSegments();
+    splitSegmentsCache = segments;
+    splitSegmentIndex = -2;
     
     // Render markers
     const markersDiv = document.getElementById('split-markers');
@@ -974,12 +1476,22 @@ async function deleteBlock(blockIndex) {
     if (currentEpisodeIndex === -1) return;
     if (blockIndex < 0 || blockIndex >= currentBlocks.length) return;
     
+    try {
+        await blocksReady;
+    } catch (e) {
+        await customAlert('字幕尚未加载完整，请重新打开本集: ' + e, '错误');
+        return;
+    }
+    
     const block = currentBlocks[blockIndex];
     const confirmed = await customConfirm(`确定要删除第 ${block.index} 条字幕吗？\n${block.start} - ${block.end}`, '确认删除');
     if (!confirmed) {
         return;
     }
     
+    // 未保存的修改和删除一起提交（先于删除执行，索引仍然有效）
+    const ops = [...takeEditOps(), { op: 'delete', index: blockIndex }];
+    
     // Remove block
     currentBlocks.splice(blockIndex, 1);
     
@@ -989,19 +1501,12 @@ async function deleteBlock(blockIndex) {
     });
     
     // Re-render
-    renderBlocks(currentBlocks);
+    renderBlocks(currentBlocks, true);
     
-    // Save to backend using batch save API
+    // 只写外语字幕文件，中文字幕保持不变
     try {
-        await fetch(`${API_BASE}/save-all-blocks`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                episode_index: currentEpisodeIndex,
-                blocks: currentBlocks,
-                type: 'en'
-            })
-        });
+        await sendPatch(ops, ['en']);
+        hasUnsavedChanges = false;
         console.log('Block deleted and saved');
     } catch (e) {
         console.error('Failed to save after delete:', e);
@@ -1029,6 +1534,13 @@ async function saveSplit() {
     
     console.log('Saving split segments:', segments);
     
+    try {
+        await blocksReady;
+    } catch (e) {
+        await customAlert('字幕尚未加载完整，请重新打开本集: ' + e, '错误');
+        return;
+    }
+    
     // Create new blocks
     const originalBlock = currentBlocks[splitModalData.blockIndex];
     const newBlocks = [];
@@ -1056,29 +1568,31 @@ async function saveSplit() {
         });
     });
     
+    const splitIndex = splitModalData.blockIndex;
+    const ops = [...takeEditOps(), newBlocks.length > 0
+        ? {
+            op: 'split',
+            index: splitIndex,
+            parts: newBlocks.map(b => ({ start: b.start, end: b.end, zh_text: b.zh_text, en_text: b.en_text }))
+        }
+        : { op: 'delete', index: splitIndex }];
+    
     // Replace in current blocks
-    currentBlocks.splice(splitModalData.blockIndex, 1, ...newBlocks);
+    currentBlocks.splice(splitIndex, 1, ...newBlocks);
     
     // Reindex
     currentBlocks.forEach((block, i) => {
         block.index = i + 1;
     });
     
-    // Save all blocks to backend using the new batch save API
+    // 只写外语字幕文件，中文字幕保持不变
     try {
-        await fetch(`${API_BASE}/save-all-blocks`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                episode_index: currentEpisodeIndex,
-                blocks: currentBlocks,
-                type: 'en'
-            })
-        });
+        await sendPatch(ops, ['en']);
+        hasUnsavedChanges = false;
         
         await customAlert('分割保存成功！');
         closeSplitModal();
-        renderBlocks(currentBlocks);
+        renderBlocks(currentBlocks, true);
     } catch (e) {
         await customAlert('保存失败: ' + e, '错误');
     }
@@ -1094,3 +1608,243 @@ function closeAbout() {
     const modal = document.getElementById('about-modal');
     modal.classList.remove('active');
 }
+
+// ============= 批量调轴 =============
+function openRetime() {
+    document.getElementById('retime-modal').classList.add('active');
+    showRetimeFields();
+}
+
+function closeRetime() {
+    document.getElementById('retime-modal').classList.remove('active');
+}
+
+function showRetimeFields() {
+    const op = document.getElementById('retime-op').value;
+    document.querySelectorAll('.retime-fields').forEach(el => {
+        el.style.display = el.dataset.op === op ? 'flex' : 'none';
+    });
+}
+
+function retimeAnchor(id) {
+    const value = document.getElementById(id).value.trim();
+    if (!/^\d{2}:\d{2}:\d{2},\d{3}$/.test(value)) throw new Error(`时间格式应为 00:00:00,000：${value || '(空)'}`);
+    return Math.round(timeToSeconds(value) * 1000);
+}
+
+function retimeOp() {
+    const op = document.getElementById('retime-op').value;
+    switch (op) {
+        case 'shift': return { op, ms: Number(document.getElementById('retime-shift').value) || 0 };
+        case 'scale': return {
+            op,
+            from: [retimeAnchor('retime-a-from'), retimeAnchor('retime-b-from')],
+            to: [retimeAnchor('retime-a-to'), retimeAnchor('retime-b-to')],
+        };
+        case 'fps': return {
+            op,
+            from: document.getElementById('retime-fps-from').value,
+            to: document.getElementById('retime-fps-to').value,
+        };
+        default: return { op, ms: Number(document.getElementById('retime-gap').value) || 0 };
+    }
+}
+
+async function applyRetime() {
+    const scope = document.getElementById('retime-scope').value;
+    if (scope === 'current' && currentEpisodeIndex === -1) {
+        await customAlert('请先打开一集', '提示');
+        return;
+    }
+    let body;
+    try {
+        body = {
+            ops: [retimeOp()],
+            episodes: scope === 'current' ? [currentEpisodeIndex] : null,
+            langs: document.getElementById('retime-langs').value.split(','),
+        };
+    } catch (e) {
+        await customAlert(e.message, '提示');
+        return;
+    }
+    const what = scope === 'current' ? '当前剧集' : `整季 ${allMatches.length} 集`;
+    const warning = hasUnsavedChanges ? '当前剧集未保存的修改将丢失。' : '';
+    if (!await customConfirm(`将修改${what}的字幕文件时间轴，是否继续？${warning}`, '批量调轴')) return;
+
+    closeRetime();
+    try {
+        const res = await fetch(apiUrl(`/retime?client=${CLIENT_ID}`), {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body),
+        });
+        const data = await res.json();
+        if (!res.ok) throw new Error(data.detail || res.status);
+        if (currentEpisodeIndex !== -1 && data.episodes.some(e => e.index === currentEpisodeIndex && e.langs.length)) {
+            hasUnsavedChanges = false;
+            await loadEpisode(currentEpisodeIndex);
+        }
+        await customAlert(`已调整 ${data.episodes.filter(e => e.langs.length).length} 集、${data.cues} 条字幕`);
+    } catch (e) {
+        await customAlert('调轴失败: ' + e.message, '错误');
+    }
+}
+
+// ============= 翻译记忆 =============
+async function fillFromMemory() {
+    if (currentEpisodeIndex === -1) return;
+    const btn = event.target;
+    const original = btn.textContent;
+    btn.disabled = true;
+    btn.textContent = '填充中...';
+    try {
+        await blocksReady;
+        // 先提交未保存的修改，填充基于最新版本
+        const ops = takeEditOps();
+        if (ops.length > 0) await sendPatch(ops);
+        hasUnsavedChanges = false;
+
+        const res = await fetch(apiUrl(`/tm/fill?primary=${currentPrimary}&client=${CLIENT_ID}`), {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ episode_index: currentEpisodeIndex, base_version: episodeVersion }),
+        });
+        const data = await res.json();
+        if (!res.ok) throw new Error(typeof data.detail === 'string' ? data.detail : JSON.stringify(data.detail));
+        if (!data.filled) {
+            await customAlert('翻译记忆中没有与未翻译字幕相同的原文', '提示');
+            return;
+        }
+        await loadEpisode(currentEpisodeIndex);
+        await customAlert(`已从翻译记忆填充 ${data.filled} 条字幕，请检查后保存确认`);
+    } catch (e) {
+        await customAlert('填充失败: ' + e.message, '错误');
+    } finally {
+        btn.disabled = false;
+        btn.textContent = original;
+    }
+}
+
+// ============= 整季对轴 =============
+function alignmentText(a) {
+    const offset = (a.offset_ms >= 0 ? '+' : '') + (a.offset_ms / 1000).toFixed(2) + 's';
+    return a.drift_ppm ? `${offset}，漂移 ${(a.drift_ppm / 10000).toFixed(2)}%` : offset;
+}
+
+async function alignSeason() {
+    const btn = event.target;
+    const original = btn.textContent;
+    btn.disabled = true;
+    jobButtons.align = btn;
+    const request = async (write) => {
+        const res = await fetch(apiUrl(`/align?client=${CLIENT_ID}`), {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ write: write }),
+        });
+        const data = await res.json();
+        if (!res.ok) throw new Error(data.detail || res.status);
+        return data;
+    };
+    try {
+        const data = await request(false);
+        const found = data.episodes.filter(e => e.alignment && e.alignment.apply);
+        if (!found.length) {
+            await customAlert('所有剧集的外语字幕与中文时间轴一致，无需对齐');
+            return;
+        }
+        const list = found.slice(0, 10).map(e => `第${e.episode || e.index + 1}集：${alignmentText(e.alignment)}`).join('\n');
+        const more = found.length > 10 ? `\n……共 ${found.length} 集` : '';
+        const warning = hasUnsavedChanges ? '当前剧集未保存的修改将丢失。' : '';
+        const message = `检测到外语字幕整体偏移或漂移（编辑器中已自动对齐显示）：\n${list}${more}\n\n是否把对齐后的时间写入外语字幕文件？${warning}`;
+        if (!await customConfirm(message, '整季对轴')) return;
+        const written = await request(true);
+        if (currentEpisodeIndex !== -1 && written.episodes.some(e => e.index === currentEpisodeIndex && e.written)) {
+            hasUnsavedChanges = false;
+            await loadEpisode(currentEpisodeIndex);
+        }
+        await customAlert(`已对齐 ${written.written} 集外语字幕`);
+    } catch (e) {
+        await customAlert('对轴失败: ' + e.message, '错误');
+    } finally {
+        delete jobButtons.align;
+        btn.disabled = false;
+        btn.textContent = original;
+    }
+}
+
+// ============= 整季质检 =============
+const LINT_CHECK_NAMES = {
+    cps: '阅读速度', line_length: '行过长', overlap: '时间重叠', zero_length: '零时长',
+    gap: '间隔过短', untranslated: '未翻译', profanity: '脏话',
+};
+const LINT_RENDER_LIMIT = 500;  // 列表最多显示的条数
+let lintReport = null;
+
+async function runLint() {
+    const btn = event.target;
+    const original = btn.textContent;
+    btn.disabled = true;
+    btn.textContent = '质检中...';
+    jobButtons.lint = btn;
+    try {
+        const res = await fetch(apiUrl(`/lint?client=${CLIENT_ID}`));
+        const data = await res.json();
+        if (!res.ok) throw new Error(data.detail || res.status);
+        lintReport = data;
+        const filter = document.getElementById('lint-filter');
+        filter.innerHTML = `<option value="">全部问题（${data.issues.length}）</option>` +
+            Object.entries(data.summary).map(([check, n]) =>
+                `<option value="${check}">${LINT_CHECK_NAMES[check] || check}（错误 ${n.error} / 提示 ${n.warning}）</option>`
+            ).join('');
+        document.getElementById('lint-summary').textContent =
+            `${data.episodes} 集，重新检查 ${data.checked} 集，缓存 ${data.cached} 集`;
+        renderLintIssues();
+        document.getElementById('lint-modal').classList.add('active');
+    } catch (e) {
+        await customAlert('质检失败: ' + e.message, '错误');
+    } finally {
+        delete jobButtons.lint;
+        btn.disabled = false;
+        btn.textContent = original;
+    }
+}
+
+function lintDetailText(issue) {
+    switch (issue.check) {
+        case 'cps': return `CPS ${issue.detail}`;
+        case 'line_length': return `最长 ${issue.detail} 字符`;
+        case 'overlap': return `重叠 ${issue.detail}ms`;
+        case 'gap': return `间隔 ${issue.detail}ms`;
+        case 'profanity': return issue.detail;
+        default: return '';
+    }
+}
+
+function renderLintIssues() {
+    if (!lintReport) return;
+    const check = document.getElementById('lint-filter').value;
+    const issues = lintReport.issues.filter(i => !check || i.check === check);
+    const list = document.getElementById('lint-results');
+    list.innerHTML = '';
+    issues.slice(0, LINT_RENDER_LIMIT).forEach(issue => {
+        const div = document.createElement('div');
+        div.className = 'search-result' + (issue.severity === 'error' ? ' lint-error' : '');
+        div.innerHTML = `
+            <div class="search-result-meta">第${escapeHtml(issue.episode || String(issue.episode_index + 1))}集 · ${secondsToTime(issue.start_ms / 1000)} · ${issue.lang === 'zh' ? '中文' : '外语'} #${issue.index} · ${LINT_CHECK_NAMES[issue.check] || issue.check} ${escapeHtml(lintDetailText(issue))}</div>
+            <div class="search-result-text">${escapeHtml(issue.text)}</div>
+        `;
+        div.onclick = () => { closeLint(); openCue(issue); };
+        list.appendChild(div);
+    });
+    if (issues.length > LINT_RENDER_LIMIT) {
+        const more = document.createElement('div');
+        more.className = 'search-result-meta';
+        more.textContent = `仅显示前 ${LINT_RENDER_LIMIT} 条，共 ${issues.length} 条`;
+        list.appendChild(more);
+    }
+}
+
+function closeLint() {
+    document.getElementById('lint-modal').classList.remove('active');
+}